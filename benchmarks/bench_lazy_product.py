@@ -1,6 +1,11 @@
+from functools import partial
 import itertools
 import pytest
 
+from dp.area import AreaOfStudy
+from dp.constants import Constants
+from dp.context import RequirementContext
+from dp.data.course import course_from_str
 from dp.lazy_product import lazy_product
 
 
@@ -30,3 +35,44 @@ def test_lazy_large(benchmark):
     lazy_input = [lambda: range(10_000_000) for _ in range(10)]
     p = benchmark(lazy_product, *lazy_input)
     next(p)
+
+
+def rule_tree_factors():
+    """
+    The solutions of four requirements that are each a query over the same
+    transcript, which is what the top-level rule of an area multiplies.
+    """
+    area = AreaOfStudy.load(c=Constants(matriculation_year=2000), specification={
+        "result": {"all": [{"requirement": name} for name in ["A", "B", "C", "D"]]},
+        "requirements": {
+            "A": {"result": {"from": "courses", "where": {"subject": {"$eq": "AAA"}}, "assert": {"count(courses)": {"$gte": 2}}}},
+            "B": {"result": {"from": "courses", "where": {"level": {"$eq": 200}}, "assert": {"count(courses)": {"$gte": 1}}}},
+            "C": {"result": {"from": "courses", "limit": [{"at_most": 1, "where": {"level": {"$eq": 300}}}], "assert": {"sum(credits)": {"$gte": 2}}}},
+            "D": {"result": {"count": 1, "of": [{"course": "AAA 101"}, {"course": "BBB 201"}]}},
+        },
+    })
+
+    transcript = [
+        course_from_str(f"{subject} {number}", clbid=f"{subject}{number}")
+        for subject in ["AAA", "BBB"]
+        for number in [101, 201, 301, 302]
+    ]
+
+    ctx = RequirementContext().with_transcript(transcript)
+
+    return [partial(r.solutions, ctx=ctx) for r in area.result.items]
+
+
+def consume_rule_tree(factors, cache_limit):
+    for _ in lazy_product(*factors, cache_limit=cache_limit):
+        pass
+
+
+@pytest.mark.benchmark(group="rule tree")
+def test_rule_tree_regenerated(benchmark):
+    benchmark(consume_rule_tree, rule_tree_factors(), 0)
+
+
+@pytest.mark.benchmark(group="rule tree")
+def test_rule_tree_cached(benchmark):
+    benchmark(consume_rule_tree, rule_tree_factors(), None)
@@ -1,12 +1,11 @@
 import pytest
-from collections import defaultdict
 
 from dp.context import RequirementContext
 from dp.data.course import course_from_str
 
 
 def do_claim(*, course, path, context, allow_claimed):
-    context.claims = defaultdict(list)
+    context.reset_claims()
     claim = context.make_claim(course=course, path=path, allow_claimed=allow_claimed)
     assert claim.failed is False
 
@@ -14,6 +14,7 @@ from .ms import pretty_ms
 from .stringify_v3 import summarize
 # from .stringify_csv import to_csv
 from .audit import EstimateMsg, ResultMsg, NoAuditsCompletedMsg, ProgressMsg, Arguments
+from .solve import SolutionOrder
 
 logger = logging.getLogger(__name__)
 
@@ -32,8 +33,13 @@ def main(sys_args: Optional[List[str]] = None) -> int:  # noqa: C901
     parser.add_argument("--print-all", action='store_true', help="print every result, not just the best one")
     parser.add_argument("--print-only", action='store', nargs='?', type=str, help="print result for the specified iterations")
     parser.add_argument("--stop-after", action='store', type=int, metavar="N", help="stop checking results after N results have been checked")
+    parser.add_argument("--time-limit", action='store', type=float, metavar="SECONDS", help="stop checking results after SECONDS, and report the best one so far")
+    parser.add_argument("--max-iterations", action='store', type=int, metavar="N", help="stop checking results after N possibilities, and report the best one so far")
     parser.add_argument("--progress-every", action='store', type=int, metavar="N", default=1_000, help="print a status message every N checks")
     parser.add_argument("--audit-each", action='store', type=int, default=1, metavar="N", help="only check every Nth result")
+    parser.add_argument("--workers", action='store', type=int, default=1, metavar="N", help="check possibilities across N processes; each process still generates every possibility, without pruning, so this only helps when checking them is the slow part")
+    parser.add_argument("--order", dest='solution_order', choices=[o.value for o in SolutionOrder], default=SolutionOrder.Path.value, help="try possibilities in specification order, or the most promising ones first")
+    parser.add_argument("--no-prune", dest='prune', action='store_false', help="check every possibility, even ones that cannot beat the best result")
     parser.add_argument("--estimate", action='store_true', help="only estimate the number of checkable possibilities")
     parser.add_argument("--transcript", action='store_true', help="only print the transcript; do not audit")
     parser.add_argument("--gpa", action='store_true', help="only compute the GPA; do not audit")
@@ -66,6 +72,11 @@ def main(sys_args: Optional[List[str]] = None) -> int:  # noqa: C901
         audit_each=cli_args.audit_each,
         transcript_only=cli_args.transcript,
         estimate_only=cli_args.estimate,
+        prune=cli_args.prune,
+        solution_order=SolutionOrder(cli_args.solution_order),
+        workers=cli_args.workers,
+        time_limit=cli_args.time_limit,
+        max_iterations=cli_args.max_iterations,
     )
 
     student = load_student(cli_args.student_file)
@@ -94,6 +105,9 @@ def main(sys_args: Optional[List[str]] = None) -> int:  # noqa: C901
                 print(f"{msg.iters:,} checked{addendum} at {avg_iter_time} per check (best: #{msg.best_i} at {msg.best_rank})", file=sys.stderr)
 
         elif isinstance(msg, ResultMsg):
+            if msg.truncated and not cli_args.quiet:
+                print(f"stopped early after {msg.total_iters:,} possibilities; this is the best result so far", file=sys.stderr)
+
             if not cli_args.quiet:
                 print(result_str(
                     msg,
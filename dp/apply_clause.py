@@ -1,4 +1,4 @@
-from typing import Any, Sequence, Iterable, Tuple, Set, Dict, Mapping, Callable, Collection, Union, TYPE_CHECKING
+from typing import Any, Sequence, Iterable, Tuple, Set, Dict, Mapping, Callable, Collection, Union, Optional, TYPE_CHECKING
 from collections import Counter, defaultdict
 from decimal import Decimal
 
@@ -12,6 +12,11 @@ from .lib import grade_point_average_items, grade_point_average
 if TYPE_CHECKING:  # pragma: no cover
     from .assertion_clause import Assertion
 
+# the number of course aggregations to remember for each transcript
+CLAUSE_CACHE_SIZE = 4096
+
+ClauseCache = Dict[Tuple[str, Tuple[CourseInstance, ...]], 'AppliedClauseResult']
+
 
 @attr.s(slots=True, kw_only=True, auto_attribs=True)
 class AppliedClauseResult:
@@ -268,10 +273,37 @@ other_actions: Mapping[str, Callable[[Iterable[Any]], AppliedClauseResult]] = {
 }
 
 
-def apply_clause_to_assertion_with_courses(clause: 'Assertion', value: Iterable[CourseInstance]) -> AppliedClauseResult:
+def apply_clause_to_assertion_with_courses(
+    clause: 'Assertion',
+    value: Iterable[CourseInstance],
+    *,
+    cache: Optional[ClauseCache] = None,
+) -> AppliedClauseResult:
     action = course_actions.get(clause.key, None)
     assert action is not None, KeyError(f'got {clause.key}; expected one of {sorted(course_actions.keys())}')
-    return action(value)
+
+    if cache is None:
+        return action(value)
+
+    # Every aggregation is a function of just the clause and the (ordered)
+    # courses, and many solutions end up with the same set of courses, so we
+    # only need to compute each one once per transcript.
+    courses = tuple(value)
+    key = (clause.key, courses)
+
+    result = cache.get(key, None)
+    if result is not None:
+        return result
+
+    result = action(courses)
+
+    if len(cache) >= CLAUSE_CACHE_SIZE:
+        # dicts are ordered, so this evicts the oldest entry
+        del cache[next(iter(cache))]
+
+    cache[key] = result
+
+    return result
 
 
 def apply_clause_to_assertion_with_areas(clause: 'Assertion', value: Iterable[AreaPointer]) -> AppliedClauseResult:
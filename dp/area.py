@@ -15,10 +15,11 @@ from .data.student import Student
 from .exception import RuleException, InsertionException, BlockException
 from .limit import LimitSet
 from .load_rule import load_rule
+from .rule.count import find_contested_clbids
 from .result.count import CountResult
 from .result.requirement import RequirementResult
 from .lib import grade_point_average
-from .solve import find_best_solution
+from .solve import find_best_solution, SearchBound, SolutionOrder
 from .status import ResultStatus, WAIVED_AND_DONE
 from .claim import Claim
 
@@ -164,7 +165,13 @@ class AreaOfStudy(Base):
             )),
         )
 
-    def solutions(self, *, student: Student, exceptions: List[RuleException]) -> Iterator['AreaSolution']:
+    def solutions(
+        self, *,
+        student: Student,
+        exceptions: List[RuleException],
+        bound: Optional[SearchBound] = None,
+        order: SolutionOrder = SolutionOrder.Path,
+    ) -> Iterator['AreaSolution']:
         logger.debug("evaluating area.result")
 
         forced_clbids = set(e.clbid for e in exceptions if isinstance(e, InsertionException) and e.forced is True)
@@ -183,8 +190,15 @@ class AreaOfStudy(Base):
             exceptions=group_exceptions(exceptions),
             multicountable=self.multicountable,
             templates=student.templates_as_dict(),
+            search_bound=bound,
+            solution_order=order,
         )
 
+        # Majors have their common requirements appended after the audit,
+        # so the bound needs to allow for them to pass in full.
+        if bound is not None and self.kind == 'major':
+            bound.extra_rank = 1 + sum((r.optimistic_rank(ctx=ctx)[0] for r in self.common_rules), decimal.Decimal(0))
+
         for i, _c in enumerate(student.courses):
             logger.debug("initial transcript [%d]: %r", i, _c)
 
@@ -198,6 +212,9 @@ class AreaOfStudy(Base):
                 forced=forced_courses,
                 including_failed=student.courses_with_failed,
             )
+            ctx.contested_clbids = self.contested_clbids(ctx=ctx)
+
+            checkpoint = ctx.checkpoint()
 
             for i, sol in enumerate(self.result.solutions(ctx=ctx, depth=1)):
                 logger.debug('beginning solution #%d', i + 1)
@@ -208,22 +225,24 @@ class AreaOfStudy(Base):
                     if len(all_claims) != len(set(all_claims)):
                         continue
 
-                # be sure to start with an empty claims list - without
-                # clearing it here, these calls only work if you process the
-                # `.audit()` calls in sequence directly from the generator;
-                # generating a full list of all solutions and then iterating
-                # over that will accidentally share state.
-
                 yield AreaSolution.from_area(solution=sol, area=self, ctx=ctx)
 
                 # We need to clear the list of claims at the end of the loop,
-                # or else we accidentally clear the independently-solved claims
-                ctx = ctx.with_empty_claims()
+                # or else we accidentally clear the independently-solved claims.
+                # Rolling back only undoes the claims that were made since the
+                # checkpoint, instead of allocating a new context every time.
+                ctx.rollback(checkpoint)
 
                 logger.debug('completed solution #%d', i + 1)
 
         logger.debug("all solutions generated")
 
+    def contested_clbids(self, *, ctx: RequirementContext) -> Optional[FrozenSet[str]]:
+        # Majors audit their common requirements against the claimed courses,
+        # so those rules contest the courses that they match, too.
+        rules = [self.result, *self.common_rules] if self.kind == 'major' else [self.result]
+        return find_contested_clbids(rules, ctx=ctx)
+
     def estimate(self, *, student: Student, exceptions: List[RuleException]) -> int:
         forced_clbids = set(e.clbid for e in exceptions if isinstance(e, InsertionException) and e.forced is True)
         forced_courses = {c.clbid: c for c in student.courses if c.clbid in forced_clbids}
@@ -247,6 +266,7 @@ class AreaOfStudy(Base):
                 forced=forced_courses,
                 including_failed=student.courses_with_failed,
             )
+            ctx.contested_clbids = self.contested_clbids(ctx=ctx)
 
             acc += self.result.estimate(ctx=ctx.with_empty_claims(), depth=1)
 
@@ -279,7 +299,15 @@ class AreaSolution(AreaOfStudy):
 
     def audit(self) -> 'AreaResult':
         logger.debug("auditing area solution")
-        result = self.solution.audit(ctx=self.context)
+
+        # Every solution from a transcript shares the same context, so we
+        # undo our claims afterwards; this keeps the audits independent of
+        # the order that they're run in.
+        checkpoint = self.context.checkpoint()
+        try:
+            result = self.solution.audit(ctx=self.context)
+        finally:
+            self.context.rollback(checkpoint)
 
         # Append the "common" major requirements, if we've audited a major.
         if self.kind == 'major':
@@ -0,0 +1,112 @@
+from typing import Dict, Iterator, List, Optional
+import bisect
+import pathlib
+import logging
+import time
+
+import attr
+
+logger = logging.getLogger(__name__)
+
+
+@attr.s(slots=True, kw_only=True, auto_attribs=True)
+class AreaIndex:
+    """
+    An in-memory index of the area specifications beneath a root directory,
+    laid out as `{root}/{catalog}/{code}.yaml`. Building the index lists each
+    catalog folder once, so that looking up an area doesn't need to glob the
+    whole tree.
+
+    The index is rebuilt when the root or any catalog folder has been
+    modified, which is checked at most once every `max_age` seconds.
+    """
+
+    root: pathlib.Path
+    max_age: float = 60.0
+
+    # area code -> the sorted names of the catalog folders that have it
+    catalogs: Dict[str, List[str]] = attr.ib(factory=dict)
+    mtimes: Dict[pathlib.Path, float] = attr.ib(factory=dict)
+    checked_at: Optional[float] = None
+
+    @staticmethod
+    def build(root: pathlib.Path, *, max_age: float = 60.0) -> 'AreaIndex':
+        index = AreaIndex(root=root, max_age=max_age)
+        index.refresh()
+        return index
+
+    def refresh(self) -> None:
+        catalogs: Dict[str, List[str]] = {}
+        mtimes: Dict[pathlib.Path, float] = {self.root: self.root.stat().st_mtime}
+
+        for folder in sorted(self.root.glob('*-*')):
+            if not folder.is_dir():
+                continue
+
+            mtimes[folder] = folder.stat().st_mtime
+
+            for file in folder.glob('*.yaml'):
+                catalogs.setdefault(file.stem, []).append(folder.name)
+
+        # the folders were listed in order, so each list is already sorted
+        self.catalogs = catalogs
+        self.mtimes = mtimes
+        self.checked_at = time.monotonic()
+
+        logger.debug('indexed %d area codes in %d folders beneath %s', len(catalogs), len(mtimes) - 1, self.root)
+
+    def is_stale(self) -> bool:
+        for folder, mtime in self.mtimes.items():
+            try:
+                if folder.stat().st_mtime != mtime:
+                    return True
+            except FileNotFoundError:
+                return True
+
+        return False
+
+    def refresh_if_stale(self) -> None:
+        now = time.monotonic()
+        if self.checked_at is not None and now - self.checked_at < self.max_age:
+            return
+
+        self.checked_at = now
+
+        if self.is_stale():
+            logger.debug('area index for %s is stale; rebuilding', self.root)
+            self.refresh()
+
+    def find(self, *, area_catalog: int, area_code: str) -> Optional[pathlib.Path]:
+        """
+        Returns the newest specification of the area from a catalog folder at
+        or before the given catalog year, like `dp.run.find_area`.
+        """
+        self.refresh_if_stale()
+
+        folders = self.catalogs.get(area_code, None)
+        if not folders:
+            return None
+
+        max_folder = f"{area_catalog}-{str(area_catalog+1)[2:]}"
+        i = bisect.bisect_right(folders, max_folder)
+        if i == 0:
+            return None
+
+        return self.root / folders[i - 1] / f"{area_code}.yaml"
+
+    def has(self, *, catalog: str, code: str) -> bool:
+        self.refresh_if_stale()
+
+        folders = self.catalogs.get(code, [])
+        i = bisect.bisect_left(folders, catalog)
+        return i < len(folders) and folders[i] == catalog
+
+    def files(self, *, since: Optional[str] = None) -> Iterator[pathlib.Path]:
+        """
+        Lists every indexed specification, optionally only from the catalog
+        folders at or after `since`.
+        """
+        for code, folders in sorted(self.catalogs.items()):
+            for folder in folders:
+                if since is None or folder >= since:
+                    yield self.root / folder / f"{code}.yaml"
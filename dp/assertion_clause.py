@@ -7,7 +7,7 @@ import enum
 import attr
 
 from .apply_clause import apply_clause_to_assertion_with_areas, apply_clause_to_assertion_with_data, \
-    apply_clause_to_assertion_with_courses, area_actions, course_actions, other_actions, AppliedClauseResult
+    apply_clause_to_assertion_with_courses, area_actions, course_actions, other_actions, AppliedClauseResult, ClauseCache
 from .constants import Constants
 from .data_type import DataType
 from .op import Operator, apply_operator
@@ -29,6 +29,24 @@ CACHE_SIZE = 2048
 ONE_POINT_OH = Decimal(1)
 ZERO_POINT_OH = Decimal(0)
 
+# The clauses whose computed value can only grow as more items are given to
+# them; see Assertion.optimistic_rank
+MONOTONIC_KEYS = frozenset({
+    'count(courses)',
+    'count(distinct_courses)',
+    'count(math_perspectives)',
+    'count(religion_traditions)',
+    'count(intlr_regions)',
+    'count(subjects)',
+    'count(terms)',
+    'count(years)',
+    'sum(credits)',
+    'count(areas)',
+    'count(items)',
+    'count(performances)',
+    'count(recitals)',
+})
+
 SomeAssertion = Union['Assertion', 'ConditionalAssertion']
 AnyAssertion = Union[SomeAssertion, 'DynamicConditionalAssertion']
 
@@ -193,7 +211,7 @@ class Assertion:
             return self
 
         if self.where:
-            filtered_output = [item for item in data if self.where.apply(item)]
+            filtered_output = ctx.filter_matching(self.where, data)
         else:
             filtered_output = list(data)
 
@@ -220,7 +238,7 @@ class Assertion:
             except ValueError:
                 pass
 
-        result_status, calculated_result = self.evaluate(filtered_output)
+        result_status, calculated_result = self.evaluate(filtered_output, cache=ctx.clause_cache)
 
         return attr.evolve(
             self,
@@ -232,9 +250,9 @@ class Assertion:
             inserted_clbids=tuple(inserted_clbids),
         )
 
-    def evaluate(self, value: Sequence['Clausable']) -> Tuple[ResultStatus, AppliedClauseResult]:
+    def evaluate(self, value: Sequence['Clausable'], *, cache: Optional[ClauseCache] = None) -> Tuple[ResultStatus, AppliedClauseResult]:
         if self.data_type is DataType.Course:
-            return evaluate_with_courses(self, cast(Sequence['CourseInstance'], value))
+            return evaluate_with_courses(self, cast(Sequence['CourseInstance'], value), cache=cache)
 
         elif self.data_type is DataType.Area:
             return evaluate_with_areas(self, cast(Sequence['AreaPointer'], value))
@@ -271,6 +289,28 @@ class Assertion:
 
         return ZERO_POINT_OH, ONE_POINT_OH
 
+    def optimistic_rank(self, data: Sequence['Clausable'] = tuple(), *, ctx: 'RequirementContext') -> Tuple[Decimal, bool]:
+        """
+        Returns an upper bound on the rank of this assertion when it is
+        audited against any subset of `data`, and whether it could pass.
+
+        Only the "at least"-style assertions over monotonic clauses can be
+        bounded; everything else is assumed to be able to pass.
+        """
+        if self.overridden:
+            return ONE_POINT_OH, True
+
+        if self.key not in MONOTONIC_KEYS or self.expected == ZERO_POINT_OH:
+            return ONE_POINT_OH, True
+
+        if self.operator not in (Operator.GreaterThanOrEqualTo, Operator.GreaterThan, Operator.EqualTo):
+            return ONE_POINT_OH, True
+
+        rank, _max_rank = self.audit_and_resolve(data, ctx=ctx).rank()
+
+        # a passing assertion always has a rank of 1
+        return rank, rank >= ONE_POINT_OH
+
     def is_simple_count_clause(self) -> bool:
         return self.key in ('count(courses)', 'count(terms)')
 
@@ -365,6 +405,16 @@ class ConditionalAssertion:
         else:
             return (ZERO_POINT_OH, ONE_POINT_OH)
 
+    def optimistic_rank(self, data: Sequence['Clausable'] = tuple(), *, ctx: 'RequirementContext') -> Tuple[Decimal, bool]:
+        evaluated_condition = self.condition.evaluate(ctx=ctx)
+
+        if evaluated_condition.result is True:
+            return self.when_true.optimistic_rank(data, ctx=ctx)
+        elif evaluated_condition.result is False and self.when_false:
+            return self.when_false.optimistic_rank(data, ctx=ctx)
+        else:
+            return ONE_POINT_OH, True
+
     def max_expected(self) -> Decimal:
         if self.when_false:
             return max(self.when_true.expected, self.when_false.expected)
@@ -464,6 +514,11 @@ class DynamicConditionalAssertion:
             # default to .Done variant if condition hasn't been evaluated
             return (ONE_POINT_OH, ONE_POINT_OH)
 
+    def optimistic_rank(self, data: Sequence['Clausable'] = tuple(), *, ctx: 'RequirementContext') -> Tuple[Decimal, bool]:
+        # the condition is evaluated against the audited data, so a subset of
+        # the data may flip it either way
+        return ONE_POINT_OH, True
+
     def max_expected(self) -> Decimal:
         return self.when_true.expected
 
@@ -537,8 +592,13 @@ def evaluate_with_items(assertion: Assertion, value: Sequence[Any]) -> Tuple[Res
     return (result, calculated_result)
 
 
-def evaluate_with_courses(assertion: Assertion, value: Sequence['CourseInstance']) -> Tuple[ResultStatus, AppliedClauseResult]:
-    calculated_result = apply_clause_to_assertion_with_courses(assertion, value)
+def evaluate_with_courses(
+    assertion: Assertion,
+    value: Sequence['CourseInstance'],
+    *,
+    cache: Optional[ClauseCache] = None,
+) -> Tuple[ResultStatus, AppliedClauseResult]:
+    calculated_result = apply_clause_to_assertion_with_courses(assertion, value, cache=cache)
     operator_result = apply_operator(lhs=calculated_result.value, op=assertion.operator, rhs=assertion.expected)
 
     if operator_result is True:
@@ -547,7 +607,7 @@ def evaluate_with_courses(assertion: Assertion, value: Sequence['CourseInstance'
         if has_ip_courses:
             # does the clause still pass if it's given only non-IP courses?
             non_ip_courses = (c for c in value if not c.is_in_progress)
-            calculated_result_no_ip = apply_clause_to_assertion_with_courses(assertion, non_ip_courses)
+            calculated_result_no_ip = apply_clause_to_assertion_with_courses(assertion, non_ip_courses, cache=cache)
             operator_result_no_ip = apply_operator(lhs=calculated_result_no_ip.value, op=assertion.operator, rhs=assertion.expected)
         else:
             # we don't need to check if there are no IP courses in the input
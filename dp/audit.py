@@ -8,6 +8,8 @@ from .exception import RuleException
 from .area import AreaOfStudy, AreaResult
 from .data.course import CourseInstance
 from .data.student import Student
+from .parallel import audit_in_parallel, reduce_shards
+from .solve import SearchBound, SolutionOrder
 from .status import WAIVED_AND_DONE
 
 
@@ -23,6 +25,20 @@ class Arguments:
     progress_every: int = 1_000
     audit_each: int = 1
 
+    # skip solutions which provably cannot beat the best result so far
+    prune: bool = True
+
+    # audit the solutions across this many processes
+    workers: int = 1
+
+    # the order in which to try the solutions of each rule
+    solution_order: SolutionOrder = SolutionOrder.Path
+
+    # stop searching after this many seconds, or after this many solutions,
+    # and report the best result so far, flagged as truncated
+    time_limit: Optional[float] = None
+    max_iterations: Optional[int] = None
+
 
 @attr.s(slots=True, kw_only=True, auto_attribs=True)
 class ResultMsg:
@@ -35,6 +51,9 @@ class ResultMsg:
     elapsed_ms: float
     version: int
 
+    # the search ran out of time or iterations before it finished
+    truncated: bool = False
+
 
 @attr.s(slots=True, kw_only=True, auto_attribs=True)
 class NoAuditsCompletedMsg:
@@ -72,6 +91,11 @@ def audit(*, area: AreaOfStudy, student: Student, args: Optional[Arguments] = No
     total_count = 0
     audit_count = 0
 
+    deadline: Optional[float] = None
+    if args.time_limit is not None:
+        deadline = start + args.time_limit
+    truncated = False
+
     best_sol: Optional[AreaResult] = None
     best_rank: Decimal = Decimal(0)
     best_i: Optional[int] = None
@@ -83,11 +107,39 @@ def audit(*, area: AreaOfStudy, student: Student, args: Optional[Arguments] = No
     if args.estimate_only:
         return
 
-    for sol in area.solutions(student=student, exceptions=exceptions or []):
+    # Every worker has to generate the same sequence of solutions, so the
+    # workers don't prune, and we can only use them when we're looking for
+    # the single best result. Each worker still generates every solution and
+    # only audits its share, so on a large area where pruning would skip
+    # most of the solutions, the workers can be slower than one process.
+    if args.workers > 1 and not args.print_all and not args.print_only and args.audit_each == 1 and args.stop_after is None:
+        yield from audit_with_workers(
+            area=area,
+            student=student,
+            exceptions=exceptions or [],
+            workers=args.workers,
+            time_limit=args.time_limit,
+            max_iterations=args.max_iterations,
+            order=args.solution_order,
+        )
+        return
+
+    # Pruning changes which solutions get generated, so we can't use it when
+    # we've been asked about specific iterations.
+    bound: Optional[SearchBound] = None
+    if args.prune and not args.print_all and not args.print_only and args.audit_each == 1:
+        bound = SearchBound()
+
+    for sol in area.solutions(student=student, exceptions=exceptions or [], bound=bound, order=args.solution_order):
         if total_count == 0:
             # ignore startup time
             start = time.perf_counter()
 
+        # if we're out of time or iterations, stop with what we have so far
+        if (args.max_iterations is not None and total_count >= args.max_iterations) or (deadline is not None and time.perf_counter() >= deadline):
+            truncated = True
+            break
+
         total_count += 1
 
         if args.print_only and total_count not in args.print_only:
@@ -102,6 +154,9 @@ def audit(*, area: AreaOfStudy, student: Student, args: Optional[Arguments] = No
         result_rank, _result_max = result.rank()
         status = result.status()
 
+        if bound is not None:
+            bound.record(result_rank)
+
         # if this is the first solution, store it, because it's the best so far
         if best_sol is None:
             best_sol, best_rank, best_i = result, result_rank, total_count
@@ -163,6 +218,51 @@ def audit(*, area: AreaOfStudy, student: Student, args: Optional[Arguments] = No
         avg_iter_ms=elapsed_ms / audit_count,
         elapsed_ms=elapsed_ms,
         version=best_sol.version,
+        truncated=truncated,
+    )
+
+
+def audit_with_workers(
+    *,
+    area: AreaOfStudy,
+    student: Student,
+    exceptions: List[RuleException],
+    workers: int,
+    time_limit: Optional[float] = None,
+    max_iterations: Optional[int] = None,
+    order: SolutionOrder = SolutionOrder.Path,
+) -> Iterator[Message]:
+    start = time.perf_counter()
+
+    shards = audit_in_parallel(
+        area=area,
+        student=student,
+        exceptions=exceptions,
+        workers=workers,
+        time_limit=time_limit,
+        max_iterations=max_iterations,
+        order=order,
+    )
+    best = reduce_shards(shards)
+
+    if best is None or best.result is None:
+        yield NoAuditsCompletedMsg()
+        return
+
+    audit_count = sum(s.iters for s in shards)
+    elapsed_ms = ms_since(start)
+
+    yield ResultMsg(
+        result=best.result,
+        best_i=best.best_i,
+        transcript=student.courses_with_failed,
+        iters=audit_count,
+        total_iters=max(s.total_iters for s in shards),
+        avg_iter_ms=elapsed_ms / audit_count,
+        elapsed_ms=elapsed_ms,
+        version=best.result.version,
+        # a passing result is final, even if some other shard ran out of time
+        truncated=not best.passed and any(s.truncated for s in shards),
     )
 
 
@@ -1,6 +1,6 @@
 # flake8: noqa
 
-from .bases import Base, Rule, Result, Solution, ResultStatus, RuleState, sort_by_path
+from .bases import Base, Rule, Result, Solution, ResultStatus, RuleState, sort_by_path, optimistic_rank_of_item
 from .course import BaseCourseRule
 from .count import BaseCountRule
 from .query import BaseQueryRule
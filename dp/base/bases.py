@@ -1,5 +1,5 @@
 import abc
-from typing import Iterator, Dict, Set, Any, List, Tuple, Collection, Optional, TYPE_CHECKING
+from typing import Iterator, Dict, Set, FrozenSet, Any, List, Tuple, Collection, Optional, TYPE_CHECKING
 from decimal import Decimal
 import enum
 import attr
@@ -106,6 +106,20 @@ class Base(abc.ABC):
     def all_courses(self, ctx: 'RequirementContext') -> List['CourseInstance']:
         return []
 
+    def optimistic_rank(self, *, ctx: 'RequirementContext') -> Tuple[Decimal, bool]:
+        """
+        Returns an upper bound on the rank that auditing this item could
+        reach, and whether the audit could possibly end up passing.
+
+        Used to skip over solutions which cannot beat the best result found
+        so far; it must never under-estimate.
+        """
+        if self.is_waived():
+            return Decimal(1), True
+
+        _rank, max_rank = self.rank()
+        return max_rank, True
+
 
 class Result(Base, abc.ABC):
     __slots__ = ()
@@ -113,6 +127,11 @@ class Result(Base, abc.ABC):
     def state(self) -> RuleState:
         return RuleState.Result
 
+    def optimistic_rank(self, *, ctx: 'RequirementContext') -> Tuple[Decimal, bool]:
+        # results have already been audited, so we know exactly how they rank
+        rank, _max_rank = self.rank()
+        return rank, self.status() in PassingStatuses
+
 
 class Solution(Base):
     __slots__ = ()
@@ -124,6 +143,14 @@ class Solution(Base):
     def audit(self, *, ctx: 'RequirementContext') -> Result:
         raise NotImplementedError('must define an audit() method')
 
+    def claimable_clbids(self) -> Optional[FrozenSet[str]]:
+        """
+        Returns the clbids of every course that auditing this solution could
+        claim or check the claims of, or None if that isn't known ahead of
+        time. Used to key the audit cache in RequirementContext.
+        """
+        return None
+
 
 class Rule(Base):
     __slots__ = ()
@@ -177,6 +204,18 @@ def compare_path_tuples(a: Base, b: Base) -> int:
 sort_by_path = cmp_to_key(compare_path_tuples)
 
 
+def optimistic_rank_of_item(item: Base, *, ctx: 'RequirementContext') -> Tuple[Decimal, bool]:
+    """
+    Rules that are held inside of a Solution are carried through the audit
+    unchanged, so they will rank exactly as they do now.
+    """
+    if isinstance(item, Rule):
+        rank, _max_rank = item.rank()
+        return rank, item.status() in PassingStatuses
+
+    return item.optimistic_rank(ctx=ctx)
+
+
 @lru_cache(2048)
 def compare_path_tuples__lt(path_a: Tuple[str, ...], path_b: Tuple[str, ...]) -> bool:
     """
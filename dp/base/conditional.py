@@ -45,6 +45,14 @@ class BaseConditionalRule(Base):
         else:
             return Decimal(1), Decimal(1)
 
+    def optimistic_rank(self, *, ctx: 'RequirementContext') -> Tuple[Decimal, bool]:
+        if self.condition.result is True:
+            return self.when_true.optimistic_rank(ctx=ctx)
+        elif self.condition.result is False and self.when_false:
+            return self.when_false.optimistic_rank(ctx=ctx)
+        else:
+            return Decimal(1), True
+
     def is_in_gpa(self) -> bool:
         if self.condition.result is True:
             return self.when_true.is_in_gpa()
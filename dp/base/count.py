@@ -69,6 +69,21 @@ class BaseCountRule(Base):
 
         return item_rank + audit_rank, item_max_rank + audit_max_rank
 
+    def optimistic_rank(self, *, ctx: 'RequirementContext') -> Tuple[Decimal, bool]:
+        if self.is_waived():
+            return Decimal(1), True
+
+        return self.optimistic_rank_from(item_bounds=[r.optimistic_rank(ctx=ctx) for r in self.items])
+
+    def optimistic_rank_from(self, *, item_bounds: Sequence[Tuple[Decimal, bool]]) -> Tuple[Decimal, bool]:
+        # each audit clause can contribute at most 1 to the rank
+        rank = cast(Decimal, sum(r for r, _ in item_bounds)) + len(self.audits())
+
+        # to pass, at least `count` children must pass
+        may_pass = sum(1 for _, p in item_bounds if p) >= self.count
+
+        return rank, may_pass
+
     def status(self) -> ResultStatus:
         if self.is_waived():
             return ResultStatus.Waived
@@ -73,6 +73,18 @@ class BaseRequirementRule(Base):
 
         return child_rank + boost if boost else child_rank, child_max + boost if boost else child_max
 
+    def optimistic_rank(self, *, ctx: 'RequirementContext') -> Tuple[Decimal, bool]:
+        if self.is_waived():
+            return Decimal(1), True
+
+        if self.is_audited or self.result is None:
+            return Decimal(0), False
+
+        child_rank, may_pass = self.result.optimistic_rank(ctx=ctx)
+
+        # the boost is only given to children which pass
+        return child_rank + 1 if may_pass else child_rank, may_pass
+
     def is_always_disjoint(self) -> bool:
         if self.disjoint is True:
             return True
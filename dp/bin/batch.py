@@ -1,5 +1,6 @@
 # mypy: warn_unreachable = False
 
+from typing import Dict, Optional, Tuple
 import pathlib
 import argparse
 import json
@@ -8,6 +9,8 @@ import os
 
 from dp.ms import pretty_ms
 from dp.run import run, load_student, find_area, load_area
+from dp.area_index import AreaIndex
+from dp.data.student import ParsedStudent
 from dp.stringify_v3 import summarize
 from dp.audit import ResultMsg, EstimateMsg, NoAuditsCompletedMsg, ProgressMsg, Arguments
 
@@ -19,6 +22,7 @@ def main() -> int:  # noqa: C901
     parser.add_argument('-w', '--workers', help="the number of worker processes to spawn", default=os.cpu_count())
     parser.add_argument('--dir', default=DEFAULT_DIR)
     parser.add_argument('--areas-dir', default=os.path.expanduser('~/Projects/degreepath-areas'))
+    parser.add_argument('--area-cache', default=os.getenv('AREA_CACHE_DIR'), help="a directory in which to cache the parsed area specs")
     parser.add_argument("--transcript", action='store_true')
     parser.add_argument("--invocation", action='store_true')
     parser.add_argument("-q", "--quiet", action='store_true')
@@ -41,11 +45,17 @@ def main() -> int:  # noqa: C901
     if cli_args.table:
         print('stnum,catalog,area_code,gpa,rank,max', flush=True)
 
+    area_index = AreaIndex.build(pathlib.Path(cli_args.areas_dir))
+
+    # the input is sorted by student, so we only need to remember the most
+    # recently-parsed student to parse each one once
+    last_student: Optional[Tuple[str, Dict, ParsedStudent]] = None
+
     for stnum, catalog, area_code in data:
         student_file = os.path.join(cli_args.dir, f"{stnum}.json")
 
         args = Arguments(print_all=False, transcript_only=cli_args.transcript)
-        area_file = find_area(root=pathlib.Path(cli_args.areas_dir), area_catalog=int(catalog.split('-')[0]), area_code=area_code)
+        area_file = find_area(root=pathlib.Path(cli_args.areas_dir), area_catalog=int(catalog.split('-')[0]), area_code=area_code, index=area_index)
 
         if not area_file:
             print('could not find area spec for %s at or below catalog %s, under %s', area_code, catalog, cli_args.areas_dir)
@@ -55,14 +65,19 @@ def main() -> int:  # noqa: C901
             print(f"python3 dp.py --student '{student_file}' --area '{area_file}'")
             continue
 
-        student = load_student(student_file)
-        area_spec = load_area(area_file)
+        if last_student is not None and last_student[0] == student_file:
+            _, student, parsed_student = last_student
+        else:
+            student = load_student(student_file)
+            parsed_student = ParsedStudent.parse(student)
+            last_student = (student_file, student, parsed_student)
+        area_spec = load_area(area_file, cache_dir=pathlib.Path(cli_args.area_cache) if cli_args.area_cache else None)
 
         if not cli_args.quiet and not cli_args.table:
             print(f"auditing #{student['stnum']} against {area_file}", file=sys.stderr)
 
         try:
-            for msg in run(args, area_spec=area_spec, student=student):
+            for msg in run(args, area_spec=area_spec, student=student, parsed_student=parsed_student):
                 if isinstance(msg, NoAuditsCompletedMsg):
                     print('no audits completed', file=sys.stderr)
                     return 2
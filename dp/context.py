@@ -1,7 +1,7 @@
 import attr
-from typing import List, Optional, Mapping, Tuple, Dict, Sequence, Iterable, Iterator
+from typing import Any, FrozenSet, List, Optional, Mapping, Tuple, Dict, Sequence, Iterable, Iterator, TypeVar, TYPE_CHECKING
 from collections import defaultdict
-from contextlib import contextmanager
+import itertools
 import logging
 
 from .status import ResultStatus
@@ -11,13 +11,26 @@ from .data.area_pointer import AreaPointer
 from .data.music import MusicPerformance, MusicAttendance, MusicProficiencies
 from .data.student import TemplateCourse, course_filter, SUB_TYPE_LOOKUP
 from .claim import Claim
+from .apply_clause import ClauseCache
+from .solve import SolutionOrder
 from .exception import RuleException, OverrideException, InsertionException, ValueException, BlockException
 
+if TYPE_CHECKING:  # pragma: no cover
+    from .base import Solution, Result
+    from .solve import SearchBound
+    from .data.clausable import Clausable  # noqa: F401
+    from .predicate_clause import SomePredicate
+
+    T = TypeVar('T', bound='Clausable')
+
 logger = logging.getLogger(__name__)
 debug: Optional[bool] = None
 
 ExceptionsDict = Mapping[Tuple[str, ...], List[RuleException]]
 
+# the number of child audits to remember for each transcript
+AUDIT_CACHE_SIZE = 4096
+
 
 class MissingClassLabIdException(Exception):
     pass
@@ -43,6 +56,16 @@ class RequirementContext:
     multicountable: Dict[str, List[Tuple[str, ...]]] = attr.ib(factory=dict)
     claims: Dict[str, List[Claim]] = attr.ib(factory=lambda: defaultdict(list))
 
+    # the clbid of every recorded claim, in order; see checkpoint/rollback
+    claim_log: List[str] = attr.ib(factory=list)
+
+    # Each course gets a bit in `claimed_mask`, which is set while the course
+    # has any recorded claims, so that we can check for conflicts across a
+    # set of courses with a single AND. The bits are assigned in transcript
+    # order.
+    clbid_bit_: Dict[str, int] = attr.ib(factory=dict)
+    claimed_mask: int = 0
+
     exceptions: ExceptionsDict = attr.ib(factory=dict)
     exceptions_path_lookup_cache: Dict[Tuple[str, ...], bool] = attr.ib(factory=dict)
 
@@ -53,6 +76,27 @@ class RequirementContext:
 
     templates: Mapping[str, Tuple[TemplateCourse, ...]] = attr.ib(factory=dict)
 
+    search_bound: Optional['SearchBound'] = None
+    solution_order: SolutionOrder = SolutionOrder.Path
+
+    # The paths of the count rules whose courses no rule outside of them can
+    # match, so that they may be solved by matching; see CountRule.solutions
+    uncontested_paths: FrozenSet[Tuple[str, ...]] = frozenset()
+
+    # The courses that more than one rule in the area could claim, or None if
+    # that isn't known; see find_contested_clbids and iterate_item_set
+    contested_clbids: Optional[FrozenSet[str]] = None
+
+    # Shared between every context with the same transcript; see audit_with_cache
+    audit_cache: Dict[Any, Tuple['Result', Dict[str, List[Claim]]]] = attr.ib(factory=dict)
+
+    # The set of transcript courses that each predicate matches, as a mask of
+    # `clbid_bit_` bits. Shared like `audit_cache`; see predicate_mask.
+    predicate_masks: Dict['SomePredicate', int] = attr.ib(factory=dict)
+
+    # Shared like `audit_cache`; see apply_clause_to_assertion_with_courses
+    clause_cache: ClauseCache = attr.ib(factory=dict)
+
     def with_transcript(
         self,
         transcript: Iterable[CourseInstance],
@@ -63,6 +107,16 @@ class RequirementContext:
     ) -> 'RequirementContext':
         transcript = list(transcript)
         clbid_lookup_map = {c.clbid: c for c in transcript}
+        forced = forced or {}
+
+        clbid_bit: Dict[str, int] = {}
+        for clbid in itertools.chain(clbid_lookup_map.keys(), forced.keys(), self.claims.keys()):
+            clbid_bit.setdefault(clbid, 1 << len(clbid_bit))
+
+        claimed_mask = 0
+        for clbid, claims in self.claims.items():
+            if claims:
+                claimed_mask |= clbid_bit[clbid]
 
         return attr.evolve(
             self,
@@ -70,7 +124,12 @@ class RequirementContext:
             transcript_with_failed_=list(including_failed),
             transcript_with_excluded_=list(full),
             clbid_lookup_map_=clbid_lookup_map,
-            forced_clbid_lookup_map_=forced or {},
+            forced_clbid_lookup_map_=forced,
+            clbid_bit_=clbid_bit,
+            claimed_mask=claimed_mask,
+            audit_cache={},
+            predicate_masks={},
+            clause_cache={},
         )
 
     def transcript(self) -> List[CourseInstance]:
@@ -83,7 +142,55 @@ class RequirementContext:
         return [self.clbid_lookup_map_[clbid] for clbid in self.claims.keys()]
 
     def has_claim(self, *, clbid: str) -> bool:
-        return clbid in self.claims and len(self.claims[clbid]) > 0
+        return self.claimed_mask & self.clbid_bit_.get(clbid, 0) != 0
+
+    def clbid_mask(self, clbids: Iterable[str]) -> int:
+        """
+        Returns the bitmask for the given courses. Courses which have never
+        been claimed might not have a bit yet, and are left out.
+        """
+        mask = 0
+        for clbid in clbids:
+            mask |= self.clbid_bit_.get(clbid, 0)
+        return mask
+
+    def predicate_mask(self, predicate: 'SomePredicate') -> int:
+        """
+        Returns the bitmask of the transcript courses that match the
+        predicate. Each predicate is only applied to the transcript once.
+        """
+        mask = self.predicate_masks.get(predicate, None)
+        if mask is not None:
+            return mask
+
+        mask = 0
+        for clbid, course in self.clbid_lookup_map_.items():
+            if predicate.apply(course):
+                mask |= self.clbid_bit_[clbid]
+
+        self.predicate_masks[predicate] = mask
+        return mask
+
+    def filter_matching(self, predicate: 'SomePredicate', items: Iterable['T']) -> List['T']:
+        """
+        Returns the items which match the predicate, in order. Transcript
+        courses are checked against the predicate's mask; anything else (like
+        areas, forced courses, or failed courses) falls back to applying the
+        predicate directly.
+        """
+        mask = self.predicate_mask(predicate)
+        lookup = self.clbid_lookup_map_
+        bits = self.clbid_bit_
+
+        matched = []
+        for item in items:
+            if isinstance(item, CourseInstance) and lookup.get(item.clbid, None) is item:
+                if mask & bits[item.clbid]:
+                    matched.append(item)
+            elif predicate.apply(item):
+                matched.append(item)
+
+        return matched
 
     def find_courses(self, *, rule: BaseCourseRule, from_claimed: bool = False) -> Iterator[CourseInstance]:
         if rule.clbid:
@@ -211,24 +318,97 @@ class RequirementContext:
 
         return None
 
-    @contextmanager
-    def fresh_claims(self) -> Iterator[None]:
-        claims = self.claims
-        self.reset_claims()
-
-        try:
-            yield
-        finally:
-            self.set_claims(claims)
-
-    def set_claims(self, claims: Dict[str, List[Claim]]) -> None:
-        self.claims = defaultdict(list, {k: list(v) for k, v in claims.items()})
-
     def reset_claims(self) -> None:
         self.claims = defaultdict(list)
+        self.claim_log = []
+        self.claimed_mask = 0
 
     def with_empty_claims(self) -> 'RequirementContext':
-        return attr.evolve(self, claims=defaultdict(list))
+        return attr.evolve(self, claims=defaultdict(list), claim_log=[], claimed_mask=0)
+
+    def checkpoint(self) -> int:
+        """
+        Returns a marker for the current set of claims, which can later be
+        passed to `rollback` to undo every claim made after this point.
+        """
+        return len(self.claim_log)
+
+    def rollback(self, checkpoint: int) -> None:
+        """
+        Undoes every claim that was recorded after the checkpoint was taken.
+        This only touches the claims that were made since then, instead of
+        copying every claim.
+        """
+        while len(self.claim_log) > checkpoint:
+            clbid = self.claim_log.pop()
+            claims = self.claims[clbid]
+            claims.pop()
+
+            # `all_claimed` looks at the keys themselves
+            if not claims:
+                del self.claims[clbid]
+                self.claimed_mask &= ~self.clbid_bit_[clbid]
+
+    def record_claim(self, claim: Claim) -> None:
+        clbid = claim.course.clbid
+
+        bit = self.clbid_bit_.get(clbid, None)
+        if bit is None:
+            bit = self.clbid_bit_[clbid] = 1 << len(self.clbid_bit_)
+
+        self.claims[clbid].append(claim)
+        self.claim_log.append(clbid)
+        self.claimed_mask |= bit
+
+    def audit_with_cache(self, solution: 'Solution') -> 'Result':
+        """
+        Audits the solution, re-using the result of a previous audit of an
+        identical solution if the claims on every course that it could touch
+        are the same as they were then.
+
+        The claims that the audit made are recorded alongside the result, and
+        are re-applied when the result is re-used.
+        """
+
+        clbids = solution.claimable_clbids()
+        if clbids is None:
+            return solution.audit(ctx=self)
+
+        prior_claims: Tuple[Tuple[str, Tuple[Tuple[str, ...], ...]], ...] = tuple()
+        if self.claimed_mask & self.clbid_mask(clbids):
+            prior_claims = tuple(
+                (clbid, tuple(claim.claimed_by for claim in self.claims[clbid]))
+                for clbid in sorted(clbids)
+                if self.has_claim(clbid=clbid)
+            )
+
+        key = (solution, prior_claims)
+
+        cached = self.audit_cache.get(key, None)
+        if cached is not None:
+            result, new_claims = cached
+            for claims in new_claims.values():
+                for claim in claims:
+                    self.record_claim(claim)
+            return result
+
+        prior_counts = {clbid: len(claimed_by) for clbid, claimed_by in prior_claims}
+
+        result = solution.audit(ctx=self)
+
+        new_claims = {
+            clbid: self.claims[clbid][prior_counts.get(clbid, 0):]
+            for clbid in clbids
+            if len(self.claims.get(clbid, ())) > prior_counts.get(clbid, 0)
+        }
+
+        if len(self.audit_cache) >= AUDIT_CACHE_SIZE:
+            # drop the oldest entry
+            del self.audit_cache[next(iter(self.audit_cache))]
+
+        self.audit_cache[key] = (result, new_claims)
+
+        return result
 
     def make_claim(self, *, course: CourseInstance, path: Tuple[str, ...], allow_claimed: bool = False) -> Claim:
         """
@@ -253,10 +433,10 @@ class RequirementContext:
             return Claim(course=course, claimed_by=path, failed=False)
 
         # If there are no prior claims, the claim is automatically allowed.
-        if course.clbid not in self.claims:
+        if not self.claimed_mask & self.clbid_bit_.get(course.clbid, 0):
             if debug: logger.debug('claim approved; no prior claims')
             claim = Claim(course=course, claimed_by=path, failed=False)
-            self.claims[course.clbid].append(claim)
+            self.record_claim(claim)
             return claim
 
         prior_claims = self.claims[course.clbid]
@@ -278,7 +458,7 @@ class RequirementContext:
         # If there are no prior claims, it is automatically successful.
         if debug: logger.debug('claim approved; no multicountable reqpaths; no conflicts')
         claim = Claim(course=course, claimed_by=path, failed=False)
-        self.claims[course.clbid].append(claim)
+        self.record_claim(claim)
         return claim
 
     def _make_multicountable_claim(self, *, course: CourseInstance, path: Tuple[str, ...], allow_claimed: bool) -> Claim:
@@ -329,7 +509,7 @@ class RequirementContext:
             else:
                 if debug: logger.debug('no applicable multicountable reqpath was found for %r; the claim has no conflicts', course)
                 claim = Claim(course=course, claimed_by=path, failed=False)
-                self.claims[course.clbid].append(claim)
+                self.record_claim(claim)
                 return claim
 
         # now limit to just the clauses in the reqpath which have not been used
@@ -345,10 +525,10 @@ class RequirementContext:
                 return Claim(course=course, claimed_by=path, failed=True)
             else:
                 claim = Claim(course=course, claimed_by=path, failed=False)
-                self.claims[course.clbid].append(claim)
+                self.record_claim(claim)
                 return claim
 
         if debug: logger.debug('there was an applicable multicountable reqpath for %r: %s', course, available_reqpaths)
         claim = Claim(course=course, claimed_by=path, failed=False)
-        self.claims[course.clbid].append(claim)
+        self.record_claim(claim)
         return claim
@@ -84,24 +84,66 @@ class Student:
         overrides: Sequence[CourseOverrideException] = tuple(),
         credits_overrides: Optional[Dict[str, str]] = None,
     ) -> 'Student':
-        if not credits_overrides:
-            credits_overrides = {}
+        return ParsedStudent.parse(data).for_area(code=code, overrides=overrides, credits_overrides=credits_overrides)
+
+    def constants(self) -> Constants:
+        terms_since_declaring_major: int = 0
+
+        try:
+            current_area = next(a for a in self.areas if a.code == self.current_area_code)
+            terms_since_declaring_major = current_area.terms_since_declaration or 0
+        except StopIteration:
+            terms_since_declaring_major = 0
+
+        return Constants(
+            matriculation_year=self.matriculation,
+            primary_performing_medium=self.music_mediums.ppm,
+            current_area_code=self.current_area_code,
+            terms_since_declaring_major=terms_since_declaring_major,
+        )
+
+    def templates_as_dict(self) -> Mapping[str, Tuple[TemplateCourse, ...]]:
+        result: Dict[str, List[TemplateCourse]] = dict()
+        for key, course in self.templates:
+            result.setdefault(key, []).append(course)
+
+        return {key: tuple(courses) for key, courses in result.items()}
+
+
+@attr.s(slots=True, kw_only=True, frozen=True, auto_attribs=True, eq=False)
+class ParsedStudent:
+    """
+    The parts of a student's data that are the same for every area, so that
+    a student with several areas to audit only needs to be parsed once.
+
+    The courses are loaded without any overrides; `for_area` only reloads
+    the courses that the area's overrides actually touch.
+    """
+
+    data: Dict
+    current_term: Optional[str]
+
+    # every row of the transcript, in order, with duplicate clbids made unique
+    all_courses: Tuple[CourseInstance, ...]
+
+    areas: Tuple[AreaPointer, ...]
+    music_performances: Tuple[MusicPerformance, ...]
+    music_recital_slips: Tuple[MusicAttendance, ...]
+    music_mediums: MusicMediums
+    music_proficiencies: MusicProficiencies
 
-        overrides = list(overrides)
+    stnum: str
+    curriculum: int
+    catalog: int
+    matriculation: int
 
+    @staticmethod
+    def parse(data: Dict) -> 'ParsedStudent':
         area_pointers = [AreaPointer.from_dict(a) for a in data.get('areas', [])]
-        # pretend that they've dropped any what-if-dropped areas
-        area_pointers = [a for a in area_pointers if a.status is not AreaStatus.WhatIfDrop or a.code == code]
 
         current_term = data.get('current_term', None)
 
-        data_courses = data.get('courses', [])
-        load_transcript_args = dict(current_term=current_term, overrides=overrides, credits_overrides=credits_overrides)
-        courses = [c for c in load_transcript(data_courses, **load_transcript_args)]
-        courses = sorted(courses, key=lambda c: c.sort_order())
-
-        courses_with_failed = [c for c in load_transcript(data_courses, include_failed=True, **load_transcript_args)]
-        courses_with_failed = sorted(courses_with_failed, key=lambda c: c.sort_order())
+        all_courses = dedupe_clbids(load_course(row, current_term=current_term) for row in data.get('courses', []))
 
         music_performances = [MusicPerformance.from_dict(d) for d in data.get('performances', [])]
         music_performances = sorted(music_performances, key=lambda p: p.sort_order())
@@ -118,14 +160,6 @@ class Student:
         else:
             matriculation = int(data.get('matriculation', '0'))
 
-        templates_set = set(
-            (key, parse_template_course_rule(course, transcript=courses))
-            for key, course_items in data.get('templates', {}).items()
-            for course in course_items
-        )
-        # exclude the None items from the parsing
-        templates = tuple(sorted((key, parsed) for key, parsed in templates_set if parsed))
-
         curriculum_s: str = data.get('curriculum', 'None')
         if curriculum_s == 'None':
             curriculum_s = '0'
@@ -137,44 +171,93 @@ class Student:
         except ValueError:
             catalog = 0
 
-        return Student(
+        return ParsedStudent(
+            data=data,
+            current_term=current_term,
+            all_courses=tuple(all_courses),
+            areas=tuple(area_pointers),
+            music_performances=tuple(music_performances),
+            music_recital_slips=tuple(music_recital_slips),
+            music_mediums=music_mediums,
+            music_proficiencies=music_proficiencies,
             stnum=data.get('stnum', '000000'),
             curriculum=curriculum,
             catalog=catalog,
-            current_area_code=code,
             matriculation=matriculation,
+        )
+
+    def for_area(
+        self,
+        *,
+        code: str = '000',
+        overrides: Sequence[CourseOverrideException] = tuple(),
+        credits_overrides: Optional[Dict[str, str]] = None,
+    ) -> Student:
+        if not credits_overrides:
+            credits_overrides = {}
+
+        # pretend that they've dropped any what-if-dropped areas
+        area_pointers = [a for a in self.areas if a.status is not AreaStatus.WhatIfDrop or a.code == code]
+
+        all_courses = self.courses_with_overrides(overrides=overrides, credits_overrides=credits_overrides)
+
+        courses = sorted(filter_transcript(all_courses), key=lambda c: c.sort_order())
+        courses_with_failed = sorted(filter_transcript(all_courses, include_failed=True), key=lambda c: c.sort_order())
+
+        templates_set = set(
+            (key, parse_template_course_rule(course, transcript=courses))
+            for key, course_items in self.data.get('templates', {}).items()
+            for course in course_items
+        )
+        # exclude the None items from the parsing
+        templates = tuple(sorted((key, parsed) for key, parsed in templates_set if parsed))
+
+        return Student(
+            stnum=self.stnum,
+            curriculum=self.curriculum,
+            catalog=self.catalog,
+            current_area_code=code,
+            matriculation=self.matriculation,
             areas=tuple(area_pointers),
             courses=tuple(courses),
             courses_with_failed=tuple(courses_with_failed),
-            music_performances=tuple(music_performances),
-            music_recital_slips=tuple(music_recital_slips),
-            music_proficiencies=music_proficiencies,
-            music_mediums=music_mediums,
+            music_performances=self.music_performances,
+            music_recital_slips=self.music_recital_slips,
+            music_proficiencies=self.music_proficiencies,
+            music_mediums=self.music_mediums,
             templates=templates,
         )
 
-    def constants(self) -> Constants:
-        terms_since_declaring_major: int = 0
+    def courses_with_overrides(
+        self,
+        *,
+        overrides: Sequence[CourseOverrideException],
+        credits_overrides: Dict[str, str],
+    ) -> Tuple[CourseInstance, ...]:
+        if not overrides and not credits_overrides:
+            return self.all_courses
+
+        overridden_clbids = set(o.clbid for o in overrides)
+
+        result = []
+        for row, course in zip(self.data.get('courses', []), self.all_courses):
+            if isinstance(row, CourseInstance):
+                result.append(course)
+                continue
 
-        try:
-            current_area = next(a for a in self.areas if a.code == self.current_area_code)
-            terms_since_declaring_major = current_area.terms_since_declaration or 0
-        except StopIteration:
-            terms_since_declaring_major = 0
+            if row['clbid'] not in overridden_clbids and f"name={row['name']}" not in credits_overrides:
+                result.append(course)
+                continue
 
-        return Constants(
-            matriculation_year=self.matriculation,
-            primary_performing_medium=self.music_mediums.ppm,
-            current_area_code=self.current_area_code,
-            terms_since_declaring_major=terms_since_declaring_major,
-        )
+            overridden = load_course(row, current_term=self.current_term, overrides=overrides, credits_overrides=credits_overrides)
 
-    def templates_as_dict(self) -> Mapping[str, Tuple[TemplateCourse, ...]]:
-        result: Dict[str, List[TemplateCourse]] = dict()
-        for key, course in self.templates:
-            result.setdefault(key, []).append(course)
+            # keep the unique clbid that we gave to any duplicate rows
+            if overridden.clbid != course.clbid:
+                overridden = overridden.unique_clbid_via_schedid()
 
-        return {key: tuple(courses) for key, courses in result.items()}
+            result.append(overridden)
+
+        return tuple(result)
 
 
 DEPTNUM_REGEX = re.compile(r"""
@@ -296,24 +379,21 @@ def load_transcript(
     overrides: List[CourseOverrideException],
     credits_overrides: Dict[str, str],
 ) -> Iterator[CourseInstance]:
-    skip_grades = {
-        GradeCode._N,  # NoPass
-        GradeCode._U,  # Unsuccessful
-        GradeCode._AU,  # Audit
-        GradeCode._UA,  # Unsuccessful Audit
-        GradeCode._WF,  # WithdrawnFail
-        GradeCode._WP,  # WithdrawnPass
-        GradeCode._W,  # Withdrawn
-    }
+    loaded = (
+        load_course(row, current_term=current_term, overrides=overrides, credits_overrides=credits_overrides)
+        for row in courses
+    )
+
+    yield from filter_transcript(dedupe_clbids(loaded), include_failed=include_failed)
 
+
+def dedupe_clbids(courses: Iterable[CourseInstance]) -> Iterator[CourseInstance]:
     # If someone has managed to be enrolled in the same CLBID twice, we prefer
     # the first one, such that the first one retains the actual CLBID, and the
     # second gets a generated ID of the form "clbid:schedid" instead.
     clbids: Set[str] = set()
 
-    for row in courses:
-        c = load_course(row, current_term=current_term, overrides=overrides, credits_overrides=credits_overrides)
-
+    for c in courses:
         if c.clbid in clbids:
             old_clbid = c.clbid
             c = c.unique_clbid_via_schedid()
@@ -324,6 +404,21 @@ def load_transcript(
         else:
             clbids.add(c.clbid)
 
+        yield c
+
+
+def filter_transcript(courses: Iterable[CourseInstance], *, include_failed: bool = False) -> Iterator[CourseInstance]:
+    skip_grades = {
+        GradeCode._N,  # NoPass
+        GradeCode._U,  # Unsuccessful
+        GradeCode._AU,  # Audit
+        GradeCode._UA,  # Unsuccessful Audit
+        GradeCode._WF,  # WithdrawnFail
+        GradeCode._WP,  # WithdrawnPass
+        GradeCode._W,  # Withdrawn
+    }
+
+    for c in courses:
         # excluded Audited courses
         if c.grade_option is GradeOption.Audit:
             continue
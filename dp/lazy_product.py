@@ -1,9 +1,67 @@
 # adapted from https://gist.github.com/jeffdonahue/12ff1b8e90bed6ed22221cbd9ba49578
 
-from typing import Iterable, Iterator, Callable
+from typing import Any, Callable, Iterable, Iterator, List, Optional
+import os
 
+# The most items of each factor that lazy_product will remember, so that it
+# doesn't have to call the factor's function again when it wraps around.
+CACHE_LIMIT = int(os.getenv('DP_PRODUCT_CACHE', default='10000'))
 
-def lazy_product(*iter_funcs: Callable[[], Iterable], repeat: int = 1) -> Iterator:
+
+class CachedIterable:
+    """
+    Wraps a function that returns an iterable, so that the items from the
+    first complete pass over it are remembered, and later passes replay them
+    instead of calling the function again. If a pass yields more than `limit`
+    items, they are forgotten, and every later pass calls the function again.
+
+    The function must return the same items each time, as for lazy_product.
+
+    >>> calls = []
+    >>> def numbers():
+    ...     calls.append(1)
+    ...     return range(3)
+    >>> cached = CachedIterable(numbers)
+    >>> list(cached()), list(cached()), len(calls)
+    ([0, 1, 2], [0, 1, 2], 1)
+    """
+
+    __slots__ = ('func', 'limit', 'items', 'complete', 'overflowed')
+
+    def __init__(self, func: Callable[[], Iterable], *, limit: Optional[int] = None) -> None:
+        self.func = func
+        self.limit = CACHE_LIMIT if limit is None else limit
+        self.items: List[Any] = []
+        self.complete = False
+        self.overflowed = False
+
+    def __call__(self) -> Iterable:
+        if self.complete:
+            return self.items
+
+        if self.overflowed:
+            return self.func()
+
+        return self.record()
+
+    def record(self) -> Iterator:
+        # a pass that was abandoned part-way through is started over
+        self.items = []
+
+        for item in self.func():
+            if not self.overflowed:
+                if len(self.items) < self.limit:
+                    self.items.append(item)
+                else:
+                    self.overflowed = True
+                    self.items = []
+            yield item
+
+        if not self.overflowed:
+            self.complete = True
+
+
+def lazy_product(*iter_funcs: Callable[[], Iterable], repeat: int = 1, cache_limit: Optional[int] = None) -> Iterator:
     """
     If f1, f2, ..., are functions which have no (required) arguments and
     return iterables, then
@@ -59,18 +117,40 @@ def lazy_product(*iter_funcs: Callable[[], Iterable], repeat: int = 1) -> Iterat
         an iterator over the Cartesian product of the iterables returned
         by the elements of iter_funcs -- equivalent to:
             return itertools.product(*(f() for f in iter_funcs), **kwargs)
+
+    Every factor but the first is walked more than once, so the items from
+    its first pass are cached (up to `cache_limit` items each; see
+    CachedIterable) instead of calling its function again.
     """
-    iterables = [iter(f()) for _ in range(repeat) for f in iter_funcs]
-    values = [next(i) for i in iterables]
+    funcs: List[Callable[[], Iterable]] = [
+        f if i == 0 else CachedIterable(f, limit=cache_limit)
+        for i, f in enumerate(f for _ in range(repeat) for f in iter_funcs)
+    ]
+
+    iterables = [iter(f()) for f in funcs]
+    values = []
+    for iterable in iterables:
+        for value in iterable:
+            values.append(value)
+            break
+        else:
+            # one of the factors is empty, so the product is too
+            return
 
     while True:
         yield tuple(values)
         for index in reversed(range(len(iterables))):
             try:
                 values[index] = next(iterables[index])
-                break
             except StopIteration:
-                iterables[index] = iter(iter_funcs[index % len(iter_funcs)]())
-                values[index] = next(iterables[index])
+                continue
+
+            # only start the later factors over once we know that there is
+            # another tuple, so that we never walk them for nothing
+            for later in range(index + 1, len(iterables)):
+                iterables[later] = iter(funcs[later]())
+                values[later] = next(iterables[later])
+
+            break
         else:
             return
@@ -1,8 +1,7 @@
 from typing import Dict, Tuple, Collection, Optional, Iterator, Any, List, Set, FrozenSet, TYPE_CHECKING
 from collections import defaultdict
-from functools import partial
 from operator import methodcaller
-import itertools
+import heapq
 import logging
 import decimal
 import enum
@@ -11,9 +10,8 @@ import attr
 
 from .predicate_clause import SomePredicate, load_predicate
 from .data_type import DataType
-from .lazy_product import lazy_product
 from .constants import Constants
-from .ncr import ncr
+from .ncr import ncr, mult, count_subsets_within
 
 from .data.course import CourseInstance
 
@@ -77,39 +75,41 @@ class Limit:
 
         return Limit(at_most=at_most, at_most_what=at_most_what, where=clause, message=data.get('message', None))
 
-    def iterate(self, courses: Collection[CourseInstance]) -> Iterator[Tuple[CourseInstance, ...]]:
-        # Be sure to sort the input, so that the output from the iterator is
-        # sorted the same way each time. We need this because our input may
-        # be a set, in which case there is no inherent ordering.
-        courses = sorted(courses, key=lambda item: item.sort_order())
-
-        # logger.debug("limit/loop/start: limit=%s, matched=%s", self, courses)
-
+    def is_binding(self, courses: Collection[CourseInstance], *, contested: Optional[FrozenSet[str]] = None) -> bool:
+        """
+        Checks if the transcripts need to try leaving out any of the given
+        courses. That is the case if they don't all fit within this limit.
+
+        If they do all fit, leaving one out can still help another rule, by
+        leaving it free for that rule to claim. So a course limit keeps all
+        of its courses only when none of them are `contested` by another
+        rule; if we don't know which courses are contested, it tries every
+        subset. A credit limit keeps all of its courses whenever they fit.
+
+        Keeping them can change which courses a passing rule claims, though
+        not how well it does: the rule no longer sees the smaller transcripts
+        first, so it may claim a different one of the courses that fit.
+        """
         if self.at_most_what is AtMostWhat.Courses:
-            yield from self.iterate_courses(courses)
-        elif self.at_most_what is AtMostWhat.Credits:
-            yield from self.iterate_credits(courses)
-
-    def iterate_courses(self, courses: Collection[CourseInstance]) -> Iterator[Tuple[CourseInstance, ...]]:
-        for n in range(0, int(self.at_most) + 1):
-            # logger.debug("limit/loop(%s..<%s): n=%s applying %s", 0, self.at_most + 1, n, self.where)
-            for combo in itertools.combinations(courses, n):
-                # logger.debug("limit/loop(%s..<%s)/combo: n=%s combo=%s", 0, self.at_most + 1, n, combo)
-                yield combo
-
-    def iterate_credits(self, courses: Collection[CourseInstance]) -> Iterator[Tuple[CourseInstance, ...]]:
-        if sum(c.credits for c in courses) <= self.at_most:
-            yield tuple(courses)
-            return
+            if len(courses) > self.at_most:
+                return True
+            return contested is None or any(c.clbid in contested for c in courses)
+        else:
+            return sum(c.credits for c in courses) > self.at_most
+
+    def weight(self, course: CourseInstance) -> decimal.Decimal:
+        """How much of this limit the course uses up."""
+        if self.at_most_what is AtMostWhat.Courses:
+            return decimal.Decimal(1)
+        else:
+            return course.credits
 
-        for n in range(0, len(courses) + 1):
-            # logger.debug("limit/loop(%s..<%s): n=%s applying %s", 0, self.at_most + 1, n, self.where)
-            for combo in itertools.combinations(courses, n):
-                if sum(c.credits for c in combo) <= self.at_most:
-                    # logger.debug("limit/loop(%s..<%s)/combo: n=%s combo=%s", 0, self.at_most + 1, n, combo)
-                    yield combo
+    def estimate(self, courses: Collection[CourseInstance], *, contested: Optional[FrozenSet[str]] = None) -> int:
+        # limited_transcripts keeps every course of a limit that doesn't bind,
+        # and tries every subset (including the empty one) that fits otherwise
+        if not self.is_binding(courses, contested=contested):
+            return 1
 
-    def estimate(self, courses: Collection[CourseInstance]) -> int:
         acc = 0
 
         if self.at_most_what is AtMostWhat.Courses:
@@ -117,8 +117,7 @@ class Limit:
                 acc += ncr(len(courses), n)
 
         elif self.at_most_what is AtMostWhat.Credits:
-            for n in range(1, len(courses) + 1):
-                acc += ncr(len(courses), n)
+            acc += count_subsets_within([c.credits for c in courses], self.at_most)
 
         return acc
 
@@ -163,12 +162,20 @@ class LimitSet:
                 logger.debug("limit/allow: %r", c)
                 yield c
 
-    def check(self, courses: Collection[CourseInstance]) -> bool:
+    def check(self, courses: Collection[CourseInstance], *, matched_items: Optional[Dict[Limit, Set[CourseInstance]]] = None) -> bool:
+        """
+        Checks that the courses do not exceed any limit. If the courses that
+        each limit matches are already known, pass them as `matched_items` to
+        avoid re-applying the predicates.
+        """
         clause_counters: Dict = defaultdict(decimal.Decimal)
 
         for c in courses:
             for limit in self.limits:
-                if not limit.where.apply(c):
+                if matched_items is not None:
+                    if c not in matched_items.get(limit, ()):
+                        continue
+                elif not limit.where.apply(c):
                     continue
 
                 if clause_counters[limit] >= limit.at_most:
@@ -187,6 +194,8 @@ class LimitSet:
         courses: Collection[CourseInstance],
         *,
         forced_clbids: Tuple[str, ...] = tuple(),
+        ctx: Optional['RequirementContext'] = None,
+        contested: Optional[FrozenSet[str]] = None,
     ) -> Iterator[Tuple[CourseInstance, ...]]:
         """
         We need to iterate over each combination of limited courses.
@@ -195,11 +204,10 @@ class LimitSet:
         then we need to generate three transcripts - one with each of them.
 
         - capture the things that match each limit
-        - make a list of the things that matched no limit clause
-        - for each set of things that matched…
-            - for N in range(0,at_most)…
-                - add the result of combinations(matched_things, N) to the unmatched set
-                - yield this combined set
+        - keep the things that matched no limit clause, or only limits that don't bind (see Limit.is_binding)
+        - for each subset of the remaining things, smallest first…
+            - if it fits within every limit, add it to the kept things
+            - yield this combined set
         """
         # skip _everything_ in here if there are no limits to apply
         if not self.limits:
@@ -209,55 +217,121 @@ class LimitSet:
 
         logger.debug("applying limits")
 
-        all_courses: Set[CourseInstance] = set(courses)
+        # Sort the courses once; each transcript is built from positions in
+        # this list, so it comes out sorted without sorting it again.
+        ordered: List[CourseInstance] = sorted(set(courses), key=methodcaller('sort_order'))
 
         # step 0: figure out which courses have been force-inserted and will thus bypass the limit check
-        forced_items: Collection[str] = {c.clbid for c in all_courses if c.clbid in forced_clbids}
+        forced_items: Collection[str] = {c.clbid for c in ordered if c.clbid in forced_clbids}
         logger.debug("limit: forced items: %r", forced_items)
 
-        # step 1: find the number of extra iterations we will need for each limiting clause
-        matched_items: Dict[Limit, Set[CourseInstance]] = defaultdict(set)
-        for limit in self.limits:
-            logger.debug("limit/probe: checking against %s", limit)
-            for c in courses:
-                if c.clbid in forced_items:
-                    logger.debug("limit/probe: skipping check of %r as it has been forced", c)
+        # step 1: find the courses that each limit matches, applying each predicate just once
+        matched_items = self.match_limits(ordered, forced_items=forced_items, ctx=ctx)
+
+        # step 2: only the binding limits need to drop any of their courses.
+        # Leaving out a course that no such limit matches would only give us
+        # a smaller transcript that no other rule benefits from, so those
+        # are always kept.
+        binding_limits = [limit for limit, match_set in matched_items.items() if limit.is_binding(match_set, contested=contested)]
+
+        fixed: List[int] = []
+        free: List[int] = []
+        usages: List[Tuple[Tuple[int, decimal.Decimal], ...]] = []
+        for i, course in enumerate(ordered):
+            usage = tuple((j, limit.weight(course)) for j, limit in enumerate(binding_limits) if course in matched_items[limit])
+            if usage:
+                free.append(i)
+                usages.append(usage)
+            else:
+                fixed.append(i)
+
+        logger.debug("limit: %d courses are kept, and %d are limited by %d limits", len(fixed), len(free), len(binding_limits))
+
+        at_most = [limit.at_most for limit in binding_limits]
+
+        # step 3: pick each subset of the limited courses that fits within
+        # every limit, smallest first, by adding courses in order and undoing
+        # them as we go. Every subset is built exactly once, so we don't have
+        # to remember which ones we have already emitted.
+        def pick(size: int, start: int, chosen: List[int], used: List[decimal.Decimal]) -> Iterator[Tuple[CourseInstance, ...]]:
+            if len(chosen) == size:
+                yield tuple(ordered[i] for i in heapq.merge(fixed, chosen))
+                return
+
+            for n in range(start, len(free) - (size - len(chosen)) + 1):
+                usage = usages[n]
+                if any(used[j] + weight > at_most[j] for j, weight in usage):
                     continue
-                logger.debug("limit/probe: checking %r")
-                if limit.where.apply(c):
-                    matched_items[limit].add(c)
 
-        all_matched_items: Set[CourseInstance] = set(item for match_set in matched_items.values() for item in match_set)
-        unmatched_items: Collection[CourseInstance] = list(all_courses.difference(all_matched_items))
+                for j, weight in usage:
+                    used[j] += weight
+                chosen.append(free[n])
+
+                yield from pick(size, n + 1, chosen, used)
 
-        logger.debug("limit: unmatched items: %r", unmatched_items)
+                chosen.pop()
+                for j, weight in usage:
+                    used[j] -= weight
 
-        # we need to attach _a_ combo from each limit clause
-        clause_iterators = [
-            partial(limit.iterate, match_set)
-            for limit, match_set in matched_items.items()
-        ]
+        for size in range(0, len(free) + 1):
+            found = False
+            for transcript in pick(size, 0, [], [decimal.Decimal(0)] * len(binding_limits)):
+                found = True
+                logger.debug("limit: emitting: %r", transcript)
+                yield transcript
 
-        emitted_solutions: Set[FrozenSet[CourseInstance]] = set()
-        for results in lazy_product(*clause_iterators):
-            these_items: FrozenSet[CourseInstance] = frozenset(item for group in results for item in group)
+            # every subset of a transcript that fits also fits, so if nothing
+            # of this size fits, nothing larger will
+            if not found:
+                break
 
-            if not self.check(these_items):
-                logger.debug("limit: invalid collection: %r", unmatched_items)
-                continue
+    def match_limits(
+        self,
+        courses: Collection[CourseInstance],
+        *,
+        forced_items: Collection[str],
+        ctx: Optional['RequirementContext'] = None,
+    ) -> Dict[Limit, Set[CourseInstance]]:
+        # if we have a context, we can use its precomputed predicate masks
+        # instead of applying each predicate to each course
+        unforced_courses = [c for c in courses if c.clbid not in forced_items]
 
-            if these_items in emitted_solutions:
-                logger.debug("limit: duplicate collection: %r", unmatched_items)
-                continue
+        matched_items: Dict[Limit, Set[CourseInstance]] = defaultdict(set)
+        for limit in self.limits:
+            logger.debug("limit/probe: checking against %s", limit)
+            if ctx is not None:
+                matches = ctx.filter_matching(limit.where, unforced_courses)
             else:
-                emitted_solutions.add(these_items)
+                matches = [c for c in unforced_courses if limit.where.apply(c)]
+
+            if matches:
+                matched_items[limit].update(matches)
+
+        return matched_items
+
+    def estimate(
+        self,
+        courses: Collection[CourseInstance],
+        *,
+        forced_clbids: Tuple[str, ...] = tuple(),
+        contested: Optional[FrozenSet[str]] = None,
+    ) -> int:
+        """
+        Counts the transcripts that `limited_transcripts` would yield.
+
+        When no course matches more than one limit, each limit picks its
+        courses independently, so the count is the product of the number of
+        combinations for each limit. Otherwise, the combinations interact, so
+        we fall back to building them.
+        """
+        if not self.limits:
+            return 1
 
-            this_combo: List[CourseInstance] = [*unmatched_items, *these_items]
-            this_combo.sort(key=methodcaller('sort_order'))
+        forced_items = {c.clbid for c in courses if c.clbid in forced_clbids}
+        matched_items = self.match_limits(courses, forced_items=forced_items)
 
-            logger.debug("limit: emitting: %r", this_combo)
-            yield tuple(this_combo)
+        total_matches = sum(len(match_set) for match_set in matched_items.values())
+        if len(set(item for match_set in matched_items.values() for item in match_set)) != total_matches:
+            return sum(1 for _ in self.limited_transcripts(courses, forced_clbids=forced_clbids, contested=contested))
 
-    def estimate(self, courses: Collection[CourseInstance]) -> int:
-        # TODO: optimize this so that it doesn't need to actually build the results
-        return sum(1 for _ in self.limited_transcripts(courses))
+        return mult(limit.estimate(match_set, contested=contested) for limit, match_set in matched_items.items())
@@ -0,0 +1,110 @@
+from typing import Dict, Hashable, List, Optional, Sequence, Set, TypeVar
+import collections
+
+H = TypeVar('H', bound=Hashable)
+
+
+def max_matching(candidates: Sequence[Sequence[H]]) -> Dict[int, H]:
+    """
+    Finds a maximum matching between slots and items with Hopcroft–Karp,
+    where `candidates[i]` lists the items that can fill slot `i`. Returns a
+    mapping of slot index to item for each slot that was filled.
+
+    >>> sorted(max_matching([['a', 'b'], ['a'], ['b', 'c']]).items())
+    [(0, 'b'), (1, 'a'), (2, 'c')]
+    >>> len(max_matching([['a'], ['a'], ['a']]))
+    1
+    """
+
+    unreached = len(candidates) + 1
+
+    slot_to_item: Dict[int, H] = {}
+    item_to_slot: Dict[H, int] = {}
+    distance: List[int] = [unreached] * len(candidates)
+
+    def find_layers() -> bool:
+        queue: collections.deque = collections.deque()
+        for slot in range(len(candidates)):
+            if slot in slot_to_item:
+                distance[slot] = unreached
+            else:
+                distance[slot] = 0
+                queue.append(slot)
+
+        found_free_item = False
+        while queue:
+            slot = queue.popleft()
+            for item in candidates[slot]:
+                owner = item_to_slot.get(item, None)
+                if owner is None:
+                    found_free_item = True
+                elif distance[owner] == unreached:
+                    distance[owner] = distance[slot] + 1
+                    queue.append(owner)
+
+        return found_free_item
+
+    def augment(slot: int) -> bool:
+        for item in candidates[slot]:
+            owner = item_to_slot.get(item, None)
+            if owner is None or (distance[owner] == distance[slot] + 1 and augment(owner)):
+                slot_to_item[slot] = item
+                item_to_slot[item] = slot
+                return True
+
+        distance[slot] = unreached
+        return False
+
+    while find_layers():
+        for slot in range(len(candidates)):
+            if slot not in slot_to_item:
+                augment(slot)
+
+    return slot_to_item
+
+
+def first_matching(candidates: Sequence[Sequence[H]], *, limit: Optional[int] = None) -> Dict[int, H]:
+    """
+    Finds the matching that enumerating the combinations of slots in order,
+    and then the product of their candidates in order, would reach first.
+
+    The slots are chosen greedily: each slot is kept if it can be matched
+    alongside the slots before it, until `limit` slots have been kept. The
+    matchable sets of slots form a matroid, so this picks the earliest
+    combination of the largest size that can be matched. Each kept slot then
+    takes its earliest candidate that still leaves the later slots matchable.
+
+    >>> sorted(first_matching([['a', 'b'], ['a'], ['b', 'c']]).items())
+    [(0, 'b'), (1, 'a'), (2, 'c')]
+    >>> sorted(first_matching([['a', 'b'], ['a'], ['b', 'c']], limit=2).items())
+    [(0, 'b'), (1, 'a')]
+    >>> sorted(first_matching([['a'], ['a'], ['b']]).items())
+    [(0, 'a'), (2, 'b')]
+    """
+
+    chosen: List[int] = []
+    for slot in range(len(candidates)):
+        if limit is not None and len(chosen) >= limit:
+            break
+
+        trial = [*chosen, slot]
+        if len(max_matching([candidates[i] for i in trial])) == len(trial):
+            chosen = trial
+
+    matching: Dict[int, H] = {}
+    taken: Set[H] = set()
+    for position, slot in enumerate(chosen):
+        later = chosen[position + 1:]
+
+        for item in candidates[slot]:
+            if item in taken:
+                continue
+
+            blocked = taken | {item}
+            remaining = [[c for c in candidates[i] if c not in blocked] for i in later]
+            if len(max_matching(remaining)) == len(later):
+                matching[slot] = item
+                taken.add(item)
+                break
+
+    return matching
@@ -1,6 +1,9 @@
 import operator as op
 from functools import reduce
-from typing import Iterable
+import itertools
+import heapq
+from typing import Iterable, Iterator, List, Sequence, Dict, Tuple
+from decimal import Decimal
 
 
 def ncr(n: int, r: int) -> int:
@@ -12,3 +15,185 @@ def ncr(n: int, r: int) -> int:
 
 def mult(it: Iterable[int]) -> int:
     return reduce(op.mul, it, 1)
+
+
+def count_subsets_below(values: Sequence[Decimal], limit: Decimal, *, inclusive: bool = False) -> Dict[Decimal, int]:
+    """
+    Counts the subsets of `values` (including the empty one) by their sum,
+    for every sum below `limit` (or equal to it, if `inclusive`). The values
+    must not be negative.
+
+    This is the usual subset-sum dynamic program, so it takes time
+    proportional to the number of distinct sums below the limit, instead of
+    to the number of subsets.
+    """
+    below: Dict[Decimal, int] = {}
+    if limit < 0 or (limit == 0 and not inclusive):
+        return below
+
+    below[Decimal(0)] = 1
+    for value in values:
+        # iterate over a copy, so that each value is only used once per subset
+        for total, count in list(below.items()):
+            new_total = total + value
+            if new_total < limit or (inclusive and new_total == limit):
+                below[new_total] = below.get(new_total, 0) + count
+
+    return below
+
+
+def count_subsets_reaching(values: Sequence[Decimal], target: Decimal) -> int:
+    """
+    Counts the non-empty subsets of `values` whose sum is at least `target`.
+    """
+    if target <= 0:
+        return 2 ** len(values) - 1
+
+    return 2 ** len(values) - sum(count_subsets_below(values, target).values())
+
+
+def count_subsets_within(values: Sequence[Decimal], limit: Decimal) -> int:
+    """
+    Counts the subsets of `values` (including the empty one) whose sum is at
+    most `limit`.
+    """
+    return sum(count_subsets_below(values, limit, inclusive=True).values())
+
+
+def is_minimal_subset_reaching(values: Sequence[Decimal], target: Decimal) -> bool:
+    """
+    Checks if the sum of `values` is at least `target`, and would fall below
+    it without any one of them.
+    """
+    total = sum(values, Decimal(0))
+    return total >= target and (not values or total - min(values) < target)
+
+
+def iterate_minimal_subsets_reaching(values: Sequence[Decimal], target: Decimal) -> Iterator[Tuple[int, ...]]:
+    """
+    Yields the indices of each minimal subset of `values` whose sum is at
+    least `target`: that is, the subsets that would fall below `target`
+    without any one of their values. The values must not be negative.
+
+    The subsets are yielded in the same order as `itertools.combinations`
+    over increasing sizes would yield them, but the search is pruned with
+    a table of the largest sums that each suffix of `values` can still add,
+    so it never builds a combination that can't become minimal.
+
+    >>> list(iterate_minimal_subsets_reaching([Decimal(1), Decimal(2), Decimal(1)], Decimal(2)))
+    [(1,), (0, 2)]
+    """
+
+    if target <= 0:
+        yield tuple()
+        return
+
+    # best[i][k] is the largest sum of k values from values[i:]
+    best: List[List[Decimal]] = []
+    for i in range(len(values) + 1):
+        totals = [Decimal(0)]
+        for value in sorted(values[i:], reverse=True):
+            totals.append(totals[-1] + value)
+        best.append(totals)
+
+    def extend(start: int, chosen: List[int], total: Decimal, smallest: Decimal, remaining: int) -> Iterator[Tuple[int, ...]]:
+        for i in range(start, len(values) - remaining + 1):
+            # the largest reachable sum only shrinks as the start moves right
+            if total + best[i][remaining] < target:
+                return
+
+            value = values[i]
+
+            # a zero adds nothing, so it can't be in a minimal subset
+            if value == 0:
+                continue
+
+            new_total = total + value
+            new_smallest = min(smallest, value)
+            if remaining == 1:
+                if new_total >= target and new_total - new_smallest < target:
+                    yield (*chosen, i)
+                continue
+
+            # once the target is reached, every larger subset has a spare value
+            if new_total >= target:
+                continue
+
+            if new_total + best[i + 1][remaining - 1] < target:
+                continue
+
+            chosen.append(i)
+            yield from extend(i + 1, chosen, new_total, new_smallest, remaining - 1)
+            chosen.pop()
+
+    for size in range(1, len(values) + 1):
+        yield from extend(0, [], Decimal(0), Decimal('Infinity'), size)
+
+
+def count_minimal_subsets_reaching(values: Sequence[Decimal], target: Decimal) -> int:
+    """
+    Counts the subsets that `iterate_minimal_subsets_reaching` yields,
+    without building each one.
+
+    Ordered from largest to smallest, each minimal subset is its last value
+    plus a subset of the values before it whose sum is below `target`, but
+    no further below it than that last value.
+    """
+    if target <= 0:
+        return 1
+
+    ordered = sorted(values, reverse=True)
+
+    count = 0
+    for i, value in enumerate(ordered):
+        if value == 0:
+            continue
+
+        for total, n in count_subsets_below(ordered[:i], target).items():
+            if total + value >= target:
+                count += n
+
+    return count
+
+
+def iterate_combinations_collapsing(distinct: Sequence[int], interchangeable: Sequence[int], size: int) -> Iterator[Tuple[int, ...]]:
+    """
+    Yields the combinations of `size` positions, drawn from `distinct` and
+    `interchangeable`, where two combinations that only differ in which
+    interchangeable positions they take count as the same. Each one is
+    represented by the combination that takes the earliest interchangeable
+    positions, which is also the first one that itertools.combinations would
+    reach, and they are yielded in the order that it would reach them.
+
+    Both sequences must be sorted and disjoint.
+
+    >>> list(iterate_combinations_collapsing([0, 3], [1, 2, 4], 2))
+    [(0, 1), (0, 3), (1, 2), (1, 3)]
+    """
+
+    # Each stream takes `k` distinct positions and fills the rest with the
+    # earliest interchangeable ones. Adding the same filler to every
+    # combination doesn't change their order, so each stream is sorted, and
+    # merging them keeps the order of the combinations.
+    def stream(k: int) -> Iterator[Tuple[int, ...]]:
+        filler = tuple(interchangeable[:size - k])
+        for combo in itertools.combinations(distinct, k):
+            yield tuple(sorted((*combo, *filler)))
+
+    streams = [stream(k) for k in range(max(0, size - len(interchangeable)), min(size, len(distinct)) + 1)]
+
+    yield from heapq.merge(*streams)
+
+
+def count_combinations_collapsing(distinct: int, interchangeable: int, size: int) -> int:
+    """
+    Counts the combinations that iterate_combinations_collapsing would yield.
+
+    >>> count_combinations_collapsing(2, 3, 2)
+    4
+    """
+
+    return sum(
+        ncr(distinct, k)
+        for k in range(max(0, size - interchangeable), min(size, distinct) + 1)
+    )
@@ -0,0 +1,165 @@
+import attr
+from typing import List, Optional, Sequence, Any
+from decimal import Decimal
+import multiprocessing
+import logging
+import time
+import sys
+
+from .area import AreaOfStudy, AreaResult
+from .data.student import Student
+from .exception import RuleException
+from .status import WAIVED_AND_DONE
+from .solve import SolutionOrder
+
+logger = logging.getLogger(__name__)
+
+# The index of the earliest passing solution that any shard has found. Set
+# in each worker process by `init_worker`.
+first_done: Any = None
+
+
+@attr.s(slots=True, kw_only=True, auto_attribs=True)
+class ShardResult:
+    shard: int
+    result: Optional[AreaResult]
+    rank: Decimal
+    best_i: Optional[int]
+    passed: bool
+    iters: int
+    total_iters: int
+    truncated: bool = False
+
+
+def init_worker(shared_first_done: Any) -> None:
+    global first_done
+    first_done = shared_first_done
+
+
+def audit_in_parallel(
+    *,
+    area: AreaOfStudy,
+    student: Student,
+    exceptions: List[RuleException],
+    workers: int,
+    time_limit: Optional[float] = None,
+    max_iterations: Optional[int] = None,
+    order: SolutionOrder = SolutionOrder.Path,
+) -> List[ShardResult]:
+    """
+    Splits the solutions of an area into `workers` shards, by taking every
+    Nth solution in the order that they are generated, and audits each shard
+    in its own process.
+
+    Every shard generates the same sequence of solutions, so each solution
+    has the same index in every shard. Once a shard finds a passing solution,
+    it publishes its index, and the other shards stop as soon as they pass
+    that index, because the earliest passing solution always wins.
+
+    The time limit applies to each shard from when it starts, and the
+    iteration limit to the solution index.
+
+    This only divides up the audits, not the generating: each shard still
+    generates every solution, and skips the ones that belong to the others.
+    The shards also can't prune, since that would number their solutions
+    differently. So this pays off when auditing the solutions is what takes
+    the time. When generating them dominates, or when pruning would skip
+    most of them, a single process with pruning is faster. Handing out
+    ranges of the top-level combinations instead would avoid the repeated
+    generating, but one combination often holds nearly all of the work.
+    """
+
+    shared_first_done = multiprocessing.Value('q', sys.maxsize)
+
+    shards = [(area, student, exceptions, shard, workers, time_limit, max_iterations, order) for shard in range(workers)]
+
+    with multiprocessing.Pool(processes=workers, initializer=init_worker, initargs=(shared_first_done,)) as pool:
+        return pool.starmap(audit_shard, shards)
+
+
+def audit_shard(
+    area: AreaOfStudy,
+    student: Student,
+    exceptions: List[RuleException],
+    shard: int,
+    shard_count: int,
+    time_limit: Optional[float] = None,
+    max_iterations: Optional[int] = None,
+    order: SolutionOrder = SolutionOrder.Path,
+) -> ShardResult:
+    logger.debug("shard %d/%d: start", shard + 1, shard_count)
+
+    deadline = time.perf_counter() + time_limit if time_limit is not None else None
+    truncated = False
+
+    best_sol: Optional[AreaResult] = None
+    best_rank: Decimal = Decimal(0)
+    best_i: Optional[int] = None
+    passed = False
+
+    audit_count = 0
+    total_count = 0
+
+    for i, sol in enumerate(area.solutions(student=student, exceptions=exceptions, order=order), start=1):
+        # another shard has already found an earlier passing solution
+        if first_done is not None and i > first_done.value:
+            break
+
+        if (max_iterations is not None and i > max_iterations) or (deadline is not None and time.perf_counter() >= deadline):
+            truncated = True
+            break
+
+        total_count = i
+
+        if (i - 1) % shard_count != shard:
+            continue
+
+        audit_count += 1
+
+        result = sol.audit()
+        result_rank, _result_max = result.rank()
+
+        if best_sol is None or result_rank > best_rank:
+            best_sol, best_rank, best_i = result, result_rank, i
+
+        if result.status() in WAIVED_AND_DONE:
+            best_sol, best_rank, best_i = result, result_rank, i
+            passed = True
+
+            if first_done is not None:
+                with first_done.get_lock():
+                    if i < first_done.value:
+                        first_done.value = i
+
+            break
+
+    logger.debug("shard %d/%d: done after %d audits", shard + 1, shard_count, audit_count)
+
+    return ShardResult(
+        shard=shard,
+        result=best_sol,
+        rank=best_rank,
+        best_i=best_i,
+        passed=passed,
+        iters=audit_count,
+        total_iters=total_count,
+        truncated=truncated,
+    )
+
+
+def reduce_shards(shards: Sequence[ShardResult]) -> Optional[ShardResult]:
+    """
+    Picks the result that a single-process audit would have picked: the
+    earliest passing solution, if there is one; otherwise, the earliest of
+    the highest-ranked solutions.
+    """
+
+    passing = [s for s in shards if s.passed]
+    if passing:
+        return min(passing, key=lambda s: s.best_i or 0)
+
+    completed = [s for s in shards if s.best_i is not None]
+    if not completed:
+        return None
+
+    return max(completed, key=lambda s: (s.rank, -(s.best_i or 0)))
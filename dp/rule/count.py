@@ -1,5 +1,6 @@
 import attr
-from typing import Dict, List, Sequence, Tuple, Iterator, Collection, Set, FrozenSet, Optional, Union, TYPE_CHECKING
+from typing import Dict, List, Sequence, Tuple, Iterator, Iterable, Collection, Set, FrozenSet, Optional, Union, TYPE_CHECKING
+from decimal import Decimal
 import itertools
 from functools import partial
 import logging
@@ -9,23 +10,27 @@ import os
 
 from ..data_type import DataType
 from ..ms import pretty_ms
-from ..base import Rule, BaseCountRule, Result, Solution, sort_by_path
+from ..base import Base, Rule, BaseCountRule, BaseRequirementRule, BaseConditionalRule, BaseQueryRule, Result, Solution, sort_by_path, optimistic_rank_of_item
+from ..base.query import QuerySource
 from ..constants import Constants
 from ..solution.count import CountSolution
+from .course import CourseRule
 from ..ncr import mult
 from ..exception import BlockException
-from ..solve import find_best_solution
-from ..lazy_product import lazy_product
+from ..solve import find_best_solution, order_by_coverage, SolutionOrder
+from ..lazy_product import lazy_product, CachedIterable
 from ..assertion_clause import SomeAssertion, Assertion
+from ..data.course import CourseInstance
 
 if TYPE_CHECKING:  # pragma: no cover
     from ..context import RequirementContext
     from ..data.clausable import Clausable  # noqa: F401
-    from ..data.course import CourseInstance  # noqa: F401
+    from ..solve import SearchBound
 
 logger = logging.getLogger(__name__)
 SHOW_ESTIMATES = False if int(os.getenv('DP_ESTIMATE', default='0')) == 0 else True
 FIND_INDEPENDENTS = True if int(os.getenv('DP_INDEPENDENT', default='1')) == 1 else False
+SOLVE_BY_MATCHING = True if int(os.getenv('DP_MATCHING', default='1')) == 1 else False
 
 
 @attr.s(cache_hash=True, slots=True, kw_only=True, frozen=True, auto_attribs=True)
@@ -230,6 +235,13 @@ class CountRule(Rule, BaseCountRule):
             yield CountSolution.from_rule(rule=self, count=self.count, items=self.items, overridden=True)
             return
 
+        if SOLVE_BY_MATCHING and self.can_solve_by_matching(ctx=ctx):
+            logger.debug('%s solving by matching courses to rules', self.path)
+            items = tuple(sorted(self.items, key=sort_by_path))
+            yield CountSolution.from_rule(rule=self, count=self.count, items=items, by_matching=True)
+            yield CountSolution.from_rule(rule=self, count=self.count, items=items, by_matching=True, match_all=True)
+            return
+
         items = self.items
         count = self.count
 
@@ -258,6 +270,9 @@ class CountRule(Rule, BaseCountRule):
             solved_results__rules = set()
             potential_rules = tuple(sorted(all_potential_rules, key=sort_by_path))
 
+        if ctx.solution_order is SolutionOrder.Promising:
+            potential_rules = order_by_coverage(potential_rules, ctx=ctx)
+
         logger.debug('%s potential rules are %s', self.path, [r.path for r in potential_rules])
         logger.debug('%s solved rules are %s', self.path, [r.path for r in solved_results__rules])
 
@@ -265,22 +280,38 @@ class CountRule(Rule, BaseCountRule):
         all_children = set(items)
         all_but_results = set(all_children - solved_results__rules)
 
+        # Only the top-level rule is pruned, because the audit loop only
+        # knows the rank of the whole area.
+        bound = ctx.search_bound if depth == 1 else None
+
+        # the bound's counter is shared by the whole search, so only count
+        # the solutions that this call skipped
+        skipped_before = bound.skipped if bound is not None else 0
+
         did_yield = False
 
         logger.debug("%s iterating over combinations between %s..<%s", self.path, lo, hi)
         for size in range(lo, hi):
             logger.debug("%s %s..<%s, size=%s", self.path, lo, hi, size)
-            for combo in self.make_combinations(items=potential_rules, results=solved_results, other_children=all_but_results, size=size, count=count, ctx=ctx):
+            for combo in self.make_combinations(items=potential_rules, results=solved_results, other_children=all_but_results, size=size, count=count, ctx=ctx, bound=bound):
                 did_yield = True
                 yield combo
 
+        # A skipped solution still counts as having been yielded; otherwise,
+        # we would fall through to the fallback solutions below.
+        if bound is not None and bound.skipped > skipped_before:
+            did_yield = True
+
         if not did_yield and potential_len > 0:
             # didn't have enough potential children to iterate in range(lo, hi)
             logger.debug("%s only iterating over the %s children with potential", self.path, potential_len)
-            for combo in self.make_combinations(items=potential_rules, results=solved_results, other_children=all_but_results, size=potential_len, count=count, ctx=ctx):
+            for combo in self.make_combinations(items=potential_rules, results=solved_results, other_children=all_but_results, size=potential_len, count=count, ctx=ctx, bound=bound):
                 did_yield = True
                 yield combo
 
+        if bound is not None and bound.skipped > skipped_before:
+            did_yield = True
+
         if not did_yield:
             logger.debug("%s did not iterate", self.path)
             # ensure that we always yield something
@@ -302,6 +333,9 @@ class CountRule(Rule, BaseCountRule):
         if ctx.get_waive_exception(self.path):
             return 1
 
+        if SOLVE_BY_MATCHING and self.can_solve_by_matching(ctx=ctx):
+            return 2
+
         items = self.items
         lo, hi = self.range()
 
@@ -329,6 +363,37 @@ class CountRule(Rule, BaseCountRule):
 
         return acc
 
+    def can_solve_by_matching(self, *, ctx: 'RequirementContext') -> bool:
+        """
+        Checks if every child is a plain course rule, so that solving this rule
+        is just a matter of assigning distinct courses to the children. Any
+        exceptions, audit clauses, or multicountable courses beneath this rule
+        need the full search.
+
+        The matching only finds the best solution for this rule on its own,
+        so it is only used when no other rule can claim the same courses.
+        """
+
+        if self.path not in ctx.uncontested_paths:
+            return False
+
+        if self.audit_clauses or self.at_most or len(self.items) < 2:
+            return False
+
+        for rule in self.items:
+            if not isinstance(rule, CourseRule) or rule.from_claimed or rule.optional:
+                return False
+
+        if ctx.has_exception_beneath(self.path):
+            return False
+
+        if ctx.multicountable:
+            for rule in self.items:
+                if any(c.course() in ctx.multicountable for c in rule.all_matches(ctx=ctx)):
+                    return False
+
+        return True
+
     def make_combinations(
         self, *,
         ctx: 'RequirementContext',
@@ -337,6 +402,7 @@ class CountRule(Rule, BaseCountRule):
         other_children: Set[Rule],
         size: int,
         count: int,
+        bound: Optional['SearchBound'] = None,
     ) -> Iterator[CountSolution]:
         debug = __debug__ and logger.isEnabledFor(logging.DEBUG)
 
@@ -344,14 +410,83 @@ class CountRule(Rule, BaseCountRule):
             if debug: logger.debug("%s, size=%s, combo=%s: generating product(*solutions)", self.path, size, combo_i)
 
             deselected_children: Tuple[Rule, ...] = tuple(other_children.difference(set(selected_children)))
+            fixed: Tuple[Union[Rule, Result], ...] = deselected_children + results
+
+            # Each solution has the same path as its rule, so the items of
+            # every solution set sort the same way; we only sort them once.
+            everything: Tuple[Union[Rule, Result], ...] = selected_children + fixed
+            item_order = sorted(range(len(everything)), key=lambda i: sort_by_path(everything[i]))
 
-            solutions = [partial(r.solutions, ctx=ctx) for r in selected_children]
+            solution_sets: Iterator[Tuple[Union[Rule, Solution, Result], ...]]
+            if bound is None:
+                solutions = [partial(r.solutions, ctx=ctx) for r in selected_children]
+                solution_sets = lazy_product(*solutions)
+            else:
+                solution_sets = self.bounded_product(selected=selected_children, fixed=fixed, ctx=ctx, bound=bound)
 
             solution_set: Tuple[Union[Rule, Solution, Result], ...]
-            for solution_set in lazy_product(*solutions):
-                to_yield = tuple(sorted(solution_set + deselected_children + results, key=sort_by_path))
+            for solution_set in solution_sets:
+                unsorted = solution_set + fixed
+                to_yield = tuple(unsorted[i] for i in item_order)
                 yield CountSolution.from_rule(rule=self, count=count, items=to_yield)
 
+    def bounded_product(
+        self, *,
+        ctx: 'RequirementContext',
+        selected: Tuple[Rule, ...],
+        fixed: Tuple[Union[Rule, Result], ...],
+        bound: 'SearchBound',
+    ) -> Iterator[Tuple[Union[Rule, Solution, Result], ...]]:
+        """
+        Walks the same product as `lazy_product(*solutions)`, in the same
+        order, but skips over any prefix of solutions whose optimistic rank
+        shows that no completion of it could beat the best result so far.
+
+        The children that haven't been chosen yet are bounded by their rules,
+        so a whole branch of the product can be skipped at once.
+        """
+
+        fixed_bounds = [optimistic_rank_of_item(r, ctx=ctx) for r in fixed]
+        rule_bounds = [r.optimistic_rank(ctx=ctx) for r in selected]
+
+        def can_improve(item_bounds: List[Tuple[Decimal, bool]]) -> bool:
+            rank, may_pass = self.optimistic_rank_from(item_bounds=item_bounds)
+            if bound.can_improve(rank=rank, may_pass=may_pass):
+                return True
+
+            bound.skipped += 1
+            return False
+
+        if not can_improve(fixed_bounds + rule_bounds):
+            logger.debug("%s skipping combination %s", self.path, [r.path for r in selected])
+            return
+
+        # every rule after the first is walked once for each prefix, so we
+        # remember their solutions instead of generating them again
+        solutions = [
+            partial(r.solutions, ctx=ctx) if i == 0 else CachedIterable(partial(r.solutions, ctx=ctx))
+            for i, r in enumerate(selected)
+        ]
+
+        def walk(index: int, chosen: Tuple[Union[Rule, Solution, Result], ...], chosen_bounds: List[Tuple[Decimal, bool]]) -> Iterator[Tuple[Union[Rule, Solution, Result], ...]]:
+            if index == len(selected):
+                yield chosen
+                return
+
+            for solution in solutions[index]():
+                # until the first result has been ranked, there's nothing to
+                # compare against, so we stick with the rule's bound
+                if bound.best_rank is None:
+                    this_bound = rule_bounds[index]
+                else:
+                    this_bound = optimistic_rank_of_item(solution, ctx=ctx)
+                    if not can_improve(fixed_bounds + chosen_bounds + [this_bound] + rule_bounds[index + 1:]):
+                        continue
+
+                yield from walk(index + 1, chosen + (solution,), chosen_bounds + [this_bound])
+
+        yield from walk(0, tuple(), [])
+
     def count_combinations(self, *, ctx: 'RequirementContext', items: Tuple[Rule, ...], size: int) -> int:
         acc = 0
 
@@ -443,7 +578,14 @@ class CountRule(Rule, BaseCountRule):
             loop_start = time.perf_counter()
             logger.debug('solving %s independently', child.path)
 
-            best_result = find_best_solution(rule=child, ctx=ctx, merge_claims=True)
+            # Nothing outside of an independent child can claim its courses,
+            # so if it is just a count of course rules, it can be matched.
+            inner: Optional[Base] = child
+            while isinstance(inner, BaseRequirementRule):
+                inner = inner.result
+            uncontested = frozenset([inner.path]) if isinstance(inner, CountRule) else frozenset()
+
+            best_result = find_best_solution(rule=child, ctx=ctx, merge_claims=True, uncontested_paths=uncontested)
             logger.debug("found solution for %s: %s", child.path, best_result)
             independent_rule__results[child] = best_result
 
@@ -477,3 +619,51 @@ class CountRule(Rule, BaseCountRule):
 
     def all_matches(self, *, ctx: 'RequirementContext') -> Collection['Clausable']:
         return [course for rule in self.items for course in rule.all_matches(ctx=ctx)]
+
+
+def find_contested_clbids(rules: Iterable[Base], *, ctx: 'RequirementContext') -> Optional[FrozenSet[str]]:
+    """
+    Finds the courses that more than one rule in the area could claim, from
+    the `all_matches` of each course rule and query. A course that only one
+    rule could claim is of no interest to any other rule, so that rule may
+    treat it as interchangeable with its other uncontested courses.
+
+    A count rule's audit clauses look at every course claimed beneath it, so
+    all of those courses are contested. A query against the claimed courses
+    looks at every claim, so then no course is uncontested, and we return None.
+    """
+
+    seen: Set[str] = set()
+    contested: Set[str] = set()
+
+    def mark(matches: Iterable['Clausable']) -> None:
+        for item in matches:
+            if not isinstance(item, CourseInstance):
+                continue
+            if item.clbid in seen:
+                contested.add(item.clbid)
+            seen.add(item.clbid)
+
+    pending: List[Base] = list(rules)
+    while pending:
+        rule = pending.pop()
+
+        if isinstance(rule, BaseQueryRule) and rule.source is QuerySource.Claimed:
+            return None
+
+        if isinstance(rule, CountRule):
+            if rule.audit_clauses:
+                contested.update(c.clbid for c in rule.all_matches(ctx=ctx) if isinstance(c, CourseInstance))
+            pending.extend(rule.items)
+        elif isinstance(rule, BaseRequirementRule):
+            if rule.result is not None:
+                pending.append(rule.result)
+        elif isinstance(rule, BaseConditionalRule):
+            if rule.condition.result is True:
+                pending.append(rule.when_true)
+            elif rule.condition.result is False and rule.when_false:
+                pending.append(rule.when_false)
+        elif isinstance(rule, Rule):
+            mark(rule.all_matches(ctx=ctx))
+
+    return frozenset(contested)
@@ -1,8 +1,9 @@
 import attr
-from typing import Dict, List, Optional, Sequence, Iterator, Iterable, Collection, Set, Tuple, cast, TYPE_CHECKING
+from typing import Dict, FrozenSet, List, Optional, Sequence, Iterator, Iterable, Collection, Set, Tuple, cast, TYPE_CHECKING
 import itertools
 import logging
 import decimal
+import os
 
 from ..base import Rule, BaseQueryRule
 from ..base.query import QuerySource
@@ -11,16 +12,19 @@ from ..limit import LimitSet
 from ..predicate_clause import load_predicate
 from ..assertion_clause import AnyAssertion, SomeAssertion, Assertion, ConditionalAssertion, DynamicConditionalAssertion
 from ..data.clausable import Clausable
-from ..ncr import ncr
+from ..ncr import ncr, count_subsets_reaching, count_minimal_subsets_reaching, iterate_minimal_subsets_reaching, is_minimal_subset_reaching
+from ..ncr import iterate_combinations_collapsing, count_combinations_collapsing
 from ..solution.query import QuerySolution
 from ..constants import Constants
 from ..data.course import CourseInstance
 from ..exception import BlockException
+from ..solve import SolutionOrder
 
 if TYPE_CHECKING:  # pragma: no cover
     from ..context import RequirementContext
 
 logger = logging.getLogger(__name__)
+COLLAPSE_UNCONTESTED = True if int(os.getenv('DP_COLLAPSE', default='1')) == 1 else False
 
 
 @attr.s(cache_hash=True, slots=True, kw_only=True, frozen=True, auto_attribs=True)
@@ -153,7 +157,7 @@ class QueryRule(Rule, BaseQueryRule):
 
     def get_filtered_data(self, *, ctx: 'RequirementContext') -> Tuple[List[Clausable], Tuple[str, ...], Tuple[str, ...]]:
         if self.where is not None:
-            data = [item for item in self.get_data(ctx=ctx) if self.where.apply(item)]
+            data = ctx.filter_matching(self.where, self.get_data(ctx=ctx))
         else:
             data = list(self.get_data(ctx=ctx))
 
@@ -200,13 +204,15 @@ class QueryRule(Rule, BaseQueryRule):
             all_unique_inserted_clbids: Set[str] = set(inserted_clbids).union(set(force_inserted_clbids))
             has_inserted_clbids = bool(all_unique_inserted_clbids)
 
-            for item_set in self.limit.limited_transcripts(courses, forced_clbids=force_inserted_clbids):
+            contested = self.contested_clbids(ctx=ctx)
+
+            for item_set in self.limit.limited_transcripts(courses, forced_clbids=force_inserted_clbids, ctx=ctx, contested=contested):
                 if self.attempt_claims is False:
                     did_iter = True
                     yield QuerySolution.from_rule(rule=self, output=item_set, inserted=inserted_clbids, force_inserted=force_inserted_clbids)
                     continue
 
-                for item_combo in iterate_item_set(item_set, rule=self):
+                for item_combo in iterate_item_set(item_set, rule=self, order=ctx.solution_order, contested=contested):
                     course_combo: Tuple[CourseInstance, ...] = cast(Tuple[CourseInstance, ...], item_combo)
                     if has_inserted_clbids:
                         # second, remove all already-selected clbids, to avoid adding the same course twice
@@ -223,7 +229,7 @@ class QueryRule(Rule, BaseQueryRule):
                     yield QuerySolution.from_rule(rule=self, output=course_combo, inserted=inserted_clbids, force_inserted=force_inserted_clbids)
 
         else:
-            for item_combo in iterate_item_set(data, rule=self):
+            for item_combo in iterate_item_set(data, rule=self, order=ctx.solution_order):
                 did_iter = True
                 yield QuerySolution.from_rule(rule=self, output=item_combo, inserted=inserted_clbids, force_inserted=force_inserted_clbids)
 
@@ -241,11 +247,13 @@ class QueryRule(Rule, BaseQueryRule):
         acc = 0
         if self.source in (QuerySource.Courses, QuerySource.Claimed):
             courses = cast(Tuple[CourseInstance, ...], data)
-            for item_set in self.limit.limited_transcripts(courses, forced_clbids=force_inserted_clbids):
+            contested = self.contested_clbids(ctx=ctx)
+            for item_set in self.limit.limited_transcripts(courses, forced_clbids=force_inserted_clbids, ctx=ctx, contested=contested):
                 if self.attempt_claims is False:
                     acc += 1
+                    continue
 
-                acc += estimate_item_set(item_set, rule=self)
+                acc += estimate_item_set(item_set, rule=self, contested=contested)
         else:
             acc += estimate_item_set(data, rule=self)
 
@@ -255,6 +263,22 @@ class QueryRule(Rule, BaseQueryRule):
 
         return acc
 
+    def contested_clbids(self, *, ctx: 'RequirementContext') -> Optional[FrozenSet[str]]:
+        """
+        Returns the courses that another rule could also claim, when the rest
+        of this query's courses may be treated as interchangeable; otherwise,
+        returns None. Inserted courses are added to each combination after it
+        is chosen, so any exception beneath this query turns this off.
+        """
+
+        if not COLLAPSE_UNCONTESTED or ctx.contested_clbids is None:
+            return None
+
+        if self.include_failed or ctx.has_exception_beneath(self.path):
+            return None
+
+        return ctx.contested_clbids
+
     def has_potential(self, *, ctx: 'RequirementContext') -> bool:
         if self._has_potential(ctx=ctx):
             logger.debug('%s has potential: yes', self.path)
@@ -281,7 +305,7 @@ class QueryRule(Rule, BaseQueryRule):
                 return True
             return False
 
-        return any(self.where.apply(item) for item in self.get_data(ctx=ctx))
+        return len(ctx.filter_matching(self.where, self.get_data(ctx=ctx))) > 0
 
     def all_matches(self, *, ctx: 'RequirementContext') -> Collection['Clausable']:
         matches, _, _ = self.get_filtered_data(ctx=ctx)
@@ -334,13 +358,61 @@ def flatten_assertions(it: Iterable[AnyAssertion]) -> Iterator[Assertion]:
             raise ValueError('uh oh')
 
 
-def iterate_item_set(item_set: Collection[Clausable], *, rule: QueryRule) -> Iterator[Tuple[Clausable, ...]]:
+def find_interchangeable_positions(items: Sequence[Clausable], *, rule: QueryRule, contested: Optional[FrozenSet[str]]) -> List[int]:
+    """
+    Finds the positions of the courses that no other rule could claim, when
+    the only thing that the query asks is how many courses it has claimed.
+    Any two such courses are interchangeable: swapping one for the other
+    changes neither this query's result nor what the other rules can claim.
+
+    In-progress and incomplete courses change the status of the query, so
+    they are never interchangeable.
+    """
+
+    if contested is None:
+        return []
+
+    assertions = rule.all_assertions()
+    if len(assertions) != 1:
+        return []
+
+    assertion = assertions[0]
+    if not isinstance(assertion, Assertion) or assertion.key != 'count(courses)' or assertion.where is not None:
+        return []
+
+    return [
+        i for i, c in enumerate(cast(Sequence[CourseInstance], items))
+        if c.clbid not in contested and not c.is_in_progress and not c.is_incomplete
+    ]
+
+
+def only_minimal_subsets(items: Collection[Clausable], *, assertions: Sequence[SomeAssertion], contested: Optional[FrozenSet[str]]) -> bool:
+    """
+    A sum(credits) query only needs its minimal combinations when the sum is
+    its only assertion, and when no other rule could claim any of its
+    courses. If another rule might claim part of each minimal combination,
+    a larger combination can still claim the courses that are left.
+    """
+
+    if len(assertions) != 1 or contested is None:
+        return False
+
+    return not any(c.clbid in contested for c in cast(Collection[CourseInstance], items))
+
+
+def iterate_item_set(
+    item_set: Collection[Clausable],
+    *,
+    rule: QueryRule,
+    order: SolutionOrder = SolutionOrder.Path,
+    contested: Optional[FrozenSet[str]] = None,
+) -> Iterator[Tuple[Clausable, ...]]:
     assertions = list(flatten_assertions(rule.all_assertions()))
 
     if rule.source is QuerySource.Courses:
         largest_count_assertion = find_largest_simple_count_assertion(assertions)
         if largest_count_assertion is not None:
-            yield from iterate_item_set__count_shortcut(assertion=largest_count_assertion, items=item_set, rule=rule)
+            yield from iterate_item_set__count_shortcut(assertion=largest_count_assertion, items=item_set, rule=rule, contested=contested)
             return
 
         largest_sum_assertion = find_largest_simple_sum_assertion(assertions)
@@ -349,6 +421,8 @@ def iterate_item_set(item_set: Collection[Clausable], *, rule: QueryRule) -> Ite
                 assertion=largest_sum_assertion,
                 items=cast(Sequence[CourseInstance], item_set),
                 rule=rule,
+                order=order,
+                minimal=only_minimal_subsets(item_set, assertions=assertions, contested=contested),
             )
             return
 
@@ -360,13 +434,41 @@ def iterate_item_set(item_set: Collection[Clausable], *, rule: QueryRule) -> Ite
         yield tuple(item_set)
 
 
-def iterate_item_set__count_shortcut(*, assertion: SomeAssertion, items: Collection[Clausable], rule: QueryRule) -> Iterator[Tuple[Clausable, ...]]:
+def iterate_item_set__count_shortcut(
+    *,
+    assertion: SomeAssertion,
+    items: Collection[Clausable],
+    rule: QueryRule,
+    contested: Optional[FrozenSet[str]] = None,
+) -> Iterator[Tuple[Clausable, ...]]:
     logger.debug("using simple assertion mode with %r (at %s)", assertion, rule.path)
-    for n in assertion.input_size_range(maximum=len(items)):
-        yield from itertools.combinations(items, n)
 
+    item_list = list(items)
+    interchangeable = find_interchangeable_positions(item_list, rule=rule, contested=contested)
+
+    if len(interchangeable) < 2:
+        for n in assertion.input_size_range(maximum=len(item_list)):
+            yield from itertools.combinations(item_list, n)
+        return
 
-def iterate_item_set__sum_shortcut(*, assertion: SomeAssertion, items: Collection[CourseInstance], rule: QueryRule) -> Iterator[Tuple[Clausable, ...]]:
+    # Combinations that only differ in their interchangeable courses all
+    # audit the same way, so we only try the first one of each.
+    logger.debug("%s treating %d uncontested courses as interchangeable", rule.path, len(interchangeable))
+    uncontested = set(interchangeable)
+    distinct = [i for i in range(len(item_list)) if i not in uncontested]
+    for n in assertion.input_size_range(maximum=len(item_list)):
+        for indices in iterate_combinations_collapsing(distinct, interchangeable, n):
+            yield tuple(item_list[i] for i in indices)
+
+
+def iterate_item_set__sum_shortcut(
+    *,
+    assertion: SomeAssertion,
+    items: Collection[CourseInstance],
+    rule: QueryRule,
+    order: SolutionOrder = SolutionOrder.Path,
+    minimal: bool = False,
+) -> Iterator[Tuple[Clausable, ...]]:
     logger.debug("using simple-sum assertion mode with %r (at %s)", assertion, rule.path)
     expected_credits = assertion.max_expected()
 
@@ -378,15 +480,39 @@ def iterate_item_set__sum_shortcut(*, assertion: SomeAssertion, items: Collectio
         yield tuple(items)
         return
 
-    for n in range(1, len(items) + 1):
-        for combo in itertools.combinations(items, n):
+    course_list = list(items)
+
+    # With the "promising" order, try the largest-credit courses first, so
+    # that the combinations which reach the expected credits come early.
+    # Each combination is put back into transcript order, so that it matches
+    # the one that the "path" order would have generated.
+    positions = list(range(len(course_list)))
+    if order is SolutionOrder.Promising:
+        positions.sort(key=lambda i: course_list[i].credits, reverse=True)
+
+    if minimal and expected_credits > 0:
+        # When the sum is the only assertion, a combination with a course to
+        # spare can't out-rank the same combination without it, so we only
+        # need the minimal combinations.
+        credits = [course_list[i].credits for i in positions]
+        for indices in iterate_minimal_subsets_reaching(credits, expected_credits):
+            yield tuple(course_list[i] for i in sorted(positions[j] for j in indices))
+
+        # If other rules have claimed enough courses that none of them pass,
+        # the whole set still claims as many credits as it can.
+        if not is_minimal_subset_reaching(credits, expected_credits):
+            yield tuple(course_list)
+        return
+
+    for n in range(1, len(course_list) + 1):
+        for indices in itertools.combinations(positions, n):
+            combo = tuple(course_list[i] for i in sorted(indices))
             if sum(c.credits for c in combo) >= expected_credits:
                 yield combo
 
 
-def estimate_item_set(item_set: Collection[Clausable], *, rule: QueryRule) -> int:
-    # This is known to over-estimate the number of items, because it doesn't
-    # check the credit sum inside of simple_sum_assertion.
+def estimate_item_set(item_set: Collection[Clausable], *, rule: QueryRule, contested: Optional[FrozenSet[str]] = None) -> int:
+    # This counts exactly the combinations that iterate_item_set will yield.
     total = 0
 
     assertions = list(flatten_assertions(rule.all_assertions()))
@@ -394,8 +520,12 @@ def estimate_item_set(item_set: Collection[Clausable], *, rule: QueryRule) -> in
     if rule.source is QuerySource.Courses:
         largest_count_assertion = find_largest_simple_count_assertion(assertions)
         if largest_count_assertion is not None:
+            interchangeable = len(find_interchangeable_positions(list(item_set), rule=rule, contested=contested))
             for n in largest_count_assertion.input_size_range(maximum=len(item_set)):
-                total += ncr(n=len(item_set), r=n)
+                if interchangeable < 2:
+                    total += ncr(n=len(item_set), r=n)
+                else:
+                    total += count_combinations_collapsing(len(item_set) - interchangeable, interchangeable, n)
             return total
 
         largest_sum_assertion = find_largest_simple_sum_assertion(assertions)
@@ -407,12 +537,18 @@ def estimate_item_set(item_set: Collection[Clausable], *, rule: QueryRule) -> in
             if sum(c.credits for c in item_set_courses) < largest_sum_assertion.max_expected():
                 return total + 1
 
-            for n in range(1, len(item_set_courses) + 1):
-                total += ncr(n=len(item_set_courses), r=n)
-                # for combo in itertools.combinations(item_set_courses, n):
-                #     if sum(c.credits for c in combo) >= largest_sum_assertion.expected:
-                #         total += 1
-            return total
+            # count the combinations that reach the expected credits, without
+            # building each one
+            credits = [c.credits for c in item_set_courses]
+            expected_credits = largest_sum_assertion.max_expected()
+
+            if only_minimal_subsets(item_set, assertions=assertions, contested=contested) and expected_credits > 0:
+                total += count_minimal_subsets_reaching(credits, expected_credits)
+                if not is_minimal_subset_reaching(credits, expected_credits):
+                    total += 1
+                return total
+
+            return total + count_subsets_reaching(credits, expected_credits)
 
         logger.debug("%s not running single assertion mode", rule.path)
         for n in range(1, len(item_set) + 1):
@@ -1,22 +1,27 @@
-from typing import Iterator, Dict, Union, Optional, cast
+from typing import Iterable, Iterator, Dict, Union, Optional, cast
+import tempfile
+import hashlib
 import pathlib
 import logging
+import pickle
 import json
 import csv
+import os
 import sys
 
 import yaml
 
 from .area import AreaOfStudy
+from .area_index import AreaIndex
 from .exception import load_exception, CourseOverrideException, load_migrations
 from .lib import grade_point_average_items, grade_point_average
-from .data.student import Student
+from .data.student import Student, ParsedStudent
 from .audit import audit, Message, Arguments
 
 logger = logging.getLogger(__name__)
 
 
-def run(args: Arguments, *, student: Dict, area_spec: Dict) -> Iterator[Message]:
+def run(args: Arguments, *, student: Dict, area_spec: Dict, parsed_student: Optional[ParsedStudent] = None) -> Iterator[Message]:
     area_code = area_spec['code']
 
     credit_assignments = area_spec.get('credit', {})
@@ -30,7 +35,12 @@ def run(args: Arguments, *, student: Dict, area_spec: Dict) -> Iterator[Message]
     ]
     course_overrides = [e for e in exceptions if isinstance(e, CourseOverrideException)]
 
-    loaded = Student.load(student, code=area_code, overrides=course_overrides, credits_overrides=credit_assignments)
+    # callers which audit several areas for the same student can parse the
+    # student once, and pass it in as `parsed_student`
+    if parsed_student is None:
+        parsed_student = ParsedStudent.parse(student)
+
+    loaded = parsed_student.for_area(code=area_code, overrides=course_overrides, credits_overrides=credit_assignments)
 
     if args.transcript_only:
         writer = csv.writer(sys.stdout)
@@ -66,7 +76,10 @@ def load_student(filename: str) -> Dict:
         return cast(Dict, json.load(infile))
 
 
-def find_area(root: pathlib.Path, area_catalog: int, area_code: str) -> Optional[pathlib.Path]:
+def find_area(root: pathlib.Path, area_catalog: int, area_code: str, *, index: Optional[AreaIndex] = None) -> Optional[pathlib.Path]:
+    if index is not None:
+        return index.find(area_catalog=area_catalog, area_code=area_code)
+
     max_folder = f"{area_catalog}-{str(area_catalog+1)[2:]}"
     logger.debug('looking for files beneath %s that are older than %s', root, max_folder)
 
@@ -84,10 +97,22 @@ def find_area(root: pathlib.Path, area_catalog: int, area_code: str) -> Optional
     return None
 
 
-def load_area(filename: Union[str, pathlib.Path]) -> Dict:
+# The pickled specs that this process has already parsed, keyed by the hash
+# of their source; see load_area
+_parsed_areas: Dict[str, bytes] = {}
+
+
+def load_area(filename: Union[str, pathlib.Path], *, cache_dir: Optional[pathlib.Path] = None) -> Dict:
+    """
+    Parses an area specification. If `cache_dir` is given, the parsed spec
+    is pickled into that directory, keyed by a hash of the file's contents,
+    so that other processes (and later runs) can skip the YAML parser. Specs
+    from `preload_areas` are always used. Each call returns a fresh copy of
+    the spec.
+    """
     try:
-        with open(filename, "r", encoding="utf-8") as infile:
-            return cast(Dict, yaml.load(stream=infile, Loader=yaml.SafeLoader))
+        with open(filename, "rb") as infile:
+            source = infile.read()
 
     except FileNotFoundError:
         filepath = pathlib.Path(filename)
@@ -106,6 +131,76 @@ def load_area(filename: Union[str, pathlib.Path]) -> Dict:
             },
         }
 
+    key = hashlib.sha256(source).hexdigest()
+
+    pickled = _parsed_areas.get(key, None)
+    if pickled is None:
+        if cache_dir is None:
+            return parse_area(source)
+
+        pickled = load_cached_area(cache_dir, key)
+
+        if pickled is None:
+            pickled = pickle.dumps(parse_area(source), protocol=pickle.HIGHEST_PROTOCOL)
+            store_cached_area(cache_dir, key, pickled)
+
+        _parsed_areas[key] = pickled
+
+    return cast(Dict, pickle.loads(pickled))
+
+
+def preload_areas(files: Iterable[pathlib.Path]) -> int:
+    """
+    Parses each of the area specs into this process's in-memory cache, so
+    that `load_area` doesn't need to parse them again, here or in any
+    process that is forked afterwards. Returns the number of specs loaded.
+    """
+    count = 0
+
+    for filename in files:
+        try:
+            with open(filename, "rb") as infile:
+                source = infile.read()
+
+            key = hashlib.sha256(source).hexdigest()
+            if key not in _parsed_areas:
+                _parsed_areas[key] = pickle.dumps(parse_area(source), protocol=pickle.HIGHEST_PROTOCOL)
+
+        except (OSError, yaml.YAMLError) as exc:
+            logger.warning('could not preload %s: %s', filename, exc)
+            continue
+
+        count += 1
+
+    return count
+
+
+def parse_area(source: bytes) -> Dict:
+    return cast(Dict, yaml.load(stream=source.decode("utf-8"), Loader=yaml.SafeLoader))
+
+
+def load_cached_area(cache_dir: pathlib.Path, key: str) -> Optional[bytes]:
+    try:
+        with open(cache_dir / f"{key}.pickle", "rb") as infile:
+            return infile.read()
+    except FileNotFoundError:
+        return None
+
+
+def store_cached_area(cache_dir: pathlib.Path, key: str, pickled: bytes) -> None:
+    try:
+        cache_dir.mkdir(parents=True, exist_ok=True)
+
+        # write to a temporary file, then rename it into place, so that other
+        # processes never see a partially-written file
+        with tempfile.NamedTemporaryFile(dir=cache_dir, suffix=".tmp", delete=False) as outfile:
+            outfile.write(pickled)
+
+        os.replace(outfile.name, cache_dir / f"{key}.pickle")
+
+    except OSError as exc:
+        logger.warning('could not write the area cache to %s: %s', cache_dir, exc)
+
 
 def gpa_only(student: Student) -> None:
     writer = csv.writer(sys.stdout)
@@ -1,8 +1,11 @@
 # mypy: warn_unreachable = False
 
+from typing import List
 import multiprocessing
 import argparse
+import gc
 import pathlib
+import tempfile
 import logging
 import math
 import os
@@ -10,8 +13,14 @@ import os
 import yaml
 
 from dp.dotenv import load as load_dotenv
+from dp.run import preload_areas
+from dp.area_index import AreaIndex
 from dp.server.worker import wrapper
+from dp.server.pool import RecyclePolicy, supervise
+from dp.server.fingerprint import SKIP_UNCHANGED, auditor_version
+from dp.server.costs import AuditBudgets, Lane
 from dp.server.reports_worker import reports_wrapper
+from dp.server.writer import writer_wrapper
 
 logger = logging.getLogger(__name__)
 
@@ -20,10 +29,28 @@ def main() -> None:
     area_root = os.getenv('AREA_ROOT')
     assert area_root is not None, "The AREA_ROOT environment variable is required"
 
+    # optional; where to keep the parsed area specs, so that they can be shared between workers
+    area_cache = os.getenv('AREA_CACHE_DIR')
+
     parser = argparse.ArgumentParser()
     parser.add_argument("--workers", "-w", type=int, help="the number of worker processes to spawn")
+    parser.add_argument("--batch-size", type=int, default=1, help="the number of queued audits for each worker to claim at once")
+    parser.add_argument("--heavy-workers", type=int, default=0, help="the number of workers to dedicate to slow areas")
+    parser.add_argument("--heavy-threshold", type=float, default=60.0, help="the average duration, in seconds, at which an area counts as slow")
+    parser.add_argument("--time-limit", type=float, help="the number of seconds an audit may take before it stores its best result so far")
+    parser.add_argument("--time-limit-for", action='append', default=[], metavar="CODE=SECONDS", help="the time limit for a specific area; may be repeated")
+    parser.add_argument("--result-writer", action='store_true', help="store results from a separate process, in batches, instead of from each worker")
+    parser.add_argument("--writer-batch-size", type=int, default=50, help="the number of results for the writer to store at once")
+    parser.add_argument("--writer-delay", type=float, default=2.0, help="the number of seconds a result may wait before the writer stores it")
+    parser.add_argument("--writer-spool", metavar="PATH", default=os.path.join(tempfile.gettempdir(), 'dp-writer.spool'), help="where the writer keeps the results it has not stored yet, so that they survive it")
+    parser.add_argument("--no-preload", action='store_true', help="don't parse the area specs before starting the workers")
+    parser.add_argument("--preload-since", metavar="CATALOG", help="only preload the area specs from this catalog (like 2015-16) onward")
+    parser.add_argument("--max-jobs", type=int, help="replace each worker after it has processed this many audits")
+    parser.add_argument("--max-rss", type=float, metavar="MB", help="replace each worker once its memory has grown by this many megabytes since it started")
     args = parser.parse_args()
 
+    budgets = AuditBudgets.parse(default=args.time_limit, overrides=args.time_limit_for)
+
     if args.workers:
         worker_count = args.workers
     else:
@@ -37,25 +64,101 @@ def main() -> None:
 
     logger.info(f"spawning {worker_count:,} worker thread{'s' if worker_count != 1 else ''}")
 
-    processes = []
-    for _ in range(worker_count):
-        p = multiprocessing.Process(target=wrapper, kwargs=dict(area_root=area_root))
-        processes.append(p)
+    # the workers are forked from this process, so anything loaded here is
+    # shared between them until one of them changes it
+    context = multiprocessing.get_context('fork') if 'fork' in multiprocessing.get_all_start_methods() else multiprocessing.get_context()
+
+    area_index = AreaIndex.build(pathlib.Path(area_root))
+
+    if not args.no_preload:
+        count = preload_areas(area_index.files(since=args.preload_since))
+        logger.info(f"preloaded {count:,} area specs")
+
+    if SKIP_UNCHANGED:
+        auditor_version()
+
+    # keep the garbage collector from touching the preloaded objects, so
+    # that their pages stay shared
+    if hasattr(gc, 'freeze'):
+        gc.freeze()
+
+    # the workers hand their results to the writer, which stores them in
+    # batches. Note that a worker commits the removal of its queue items
+    # before the writer has stored their results, so the writer keeps the
+    # results it is holding in a spool file until they are stored.
+    results = None
+    if args.result_writer:
+        results = context.Queue()
+
+    worker_specs = []
+    for i in range(worker_count):
+        # if any workers are dedicated to the slow areas, the rest skip them
+        if args.heavy_workers:
+            lane = Lane.Heavy if i < args.heavy_workers else Lane.Light
+        else:
+            lane = Lane.Any
+
+        worker_specs.append(dict(
+            target=wrapper,
+            area_root=area_root,
+            area_cache=area_cache,
+            batch_size=args.batch_size,
+            lane=lane,
+            heavy_threshold=args.heavy_threshold,
+            budgets=budgets,
+            results=results,
+            area_index=area_index,
+        ))
+
+    # the writer is supervised along with the workers, so that if it dies,
+    # a new one picks up the results that are still on the queue, and the
+    # ones that it had taken off the queue from its spool
+    if results is not None:
+        worker_specs.append(dict(
+            target=writer_wrapper,
+            results=results,
+            batch_size=args.writer_batch_size,
+            max_delay=args.writer_delay,
+            spool_path=args.writer_spool,
+        ))
+
+    writer_processes: List[multiprocessing.process.BaseProcess] = []
+
+    def spawn(spec: dict) -> multiprocessing.process.BaseProcess:
+        kwargs = dict(spec)
+        target = kwargs.pop('target')
+
+        if target is wrapper:
+            # each worker gets its own count of the jobs it has processed
+            kwargs['recycle'] = RecyclePolicy(max_jobs=args.max_jobs, max_rss_mb=args.max_rss)
+
+        p = context.Process(target=target, kwargs=kwargs)
         p.start()
 
+        if target is writer_wrapper:
+            writer_processes[:] = [p]
+
+        return p
+
     DP_REPORT_BIN = os.getenv('DP_REPORT_BIN')
     if DP_REPORT_BIN:
         try:
             reports_binary_path = pathlib.Path(DP_REPORT_BIN)
-            p = multiprocessing.Process(target=reports_wrapper, kwargs=dict(binary_path=reports_binary_path))
-            processes.append(p)
+            p = context.Process(target=reports_wrapper, kwargs=dict(binary_path=reports_binary_path))
             p.start()
         except Exception as exc:
             # log the exception
             logger.error('error running reports: %s', exc)
 
-    for p in processes:
-        p.join()
+    try:
+        # replace the workers as they exit, forever
+        supervise(worker_specs, spawn=spawn)
+    finally:
+        # once the workers are done, store whatever they left behind
+        if results is not None:
+            for writer_process in writer_processes:
+                results.put(None)
+                writer_process.join(timeout=30)
 
 
 if __name__ == '__main__':
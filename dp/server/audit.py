@@ -1,13 +1,18 @@
 # mypy: warn_unreachable = False
 
-from typing import Dict, Optional
+from typing import Dict, Optional, TYPE_CHECKING
 import json
 import logging
 
 import psycopg2.extensions  # type: ignore
 
 from dp.run import run
+from dp.data.student import ParsedStudent
 from dp.audit import ResultMsg, NoAuditsCompletedMsg, ProgressMsg, Arguments, EstimateMsg
+from dp.server.writer import ResultRow, result_hash, insert_result, student_columns
+
+if TYPE_CHECKING:  # pragma: no cover
+    import multiprocessing
 
 logger = logging.getLogger(__name__)
 
@@ -18,18 +23,22 @@ def audit(
     area_code: str,
     area_catalog: str,
     student: Dict,
+    parsed_student: Optional[ParsedStudent] = None,
     run_id: int,
     expires_at: Optional[str],
     link_only: bool,
     curs: psycopg2.extensions.cursor,
+    time_limit: Optional[float] = None,
+    results: Optional['multiprocessing.Queue'] = None,
+    input_fingerprint: Optional[str] = None,
 ) -> Optional[int]:
-    args = Arguments()
+    args = Arguments(time_limit=time_limit)
 
     stnum = student['stnum']
 
     logger.info("auditing #%s against %s %s", stnum, area_catalog, area_code)
     try:
-        for msg in run(args, area_spec=area_spec, student=student):
+        for msg in run(args, area_spec=area_spec, student=student, parsed_student=parsed_student):
             if isinstance(msg, NoAuditsCompletedMsg):
                 logger.critical('no audits completed')
 
@@ -40,123 +49,77 @@ def audit(
                 pass
 
             elif isinstance(msg, ResultMsg):
-                result = msg.result.to_dict()
-                result_str = json.dumps(result)
-
-                if not link_only:
-                    # delete any old copies of this exact result
-                    curs.execute("""
-                        DELETE FROM result
-                        WHERE student_id = %(student_id)s
-                            AND catalog = %(area_catalog)s
-                            AND area_code = %(area_code)s
-                            AND result = %(result)s::jsonb
-                    """, {"student_id": stnum, "area_catalog": area_catalog, "area_code": area_code, "result": result_str})
-
-                    # deactivate all existing records
-                    curs.execute("""
-                        UPDATE result
-                        SET is_active = false
-                        WHERE
-                            student_id = %(student_id)s
-                            AND area_code = %(area_code)s
-                            AND is_active = true
-                    """, {"student_id": stnum, "area_code": area_code})
-
-                # we use clock_timestamp() instead of now() here, because
-                # now() is the start time of the transaction, and we instead
-                # want the time when the computation was finished.
-                # see https://stackoverflow.com/a/24169018
-                curs.execute("""
-                    INSERT INTO result (
-                        student_id,
-                        area_code,
-                        catalog,
-                        run,
-                        input_data,
-                        expires_at,
-                        link_only,
-                        result_version,
-                        iterations,
-                        duration,
-                        per_iteration,
-                        rank,
-                        max_rank,
-                        result,
-                        ok,
-                        ts,
-                        gpa,
-                        claimed_courses,
-                        status,
-                        is_active,
-                        revision,
-                        student_classification,
-                        student_class,
-                        student_name,
-                        student_name_sort
-                    )
-                    VALUES (
-                        %(student_id)s,
-                        %(area_code)s,
-                        %(catalog)s,
-                        %(run)s,
-                        %(input_data)s,
-                        %(expires_at)s,
-                        %(link_only)s,
-                        %(result_version)s,
-                        %(total_count)s,
-                        interval %(elapsed)s,
-                        interval %(avg_iter_time)s,
-                        %(rank)s,
-                        %(max_rank)s,
-                        %(result)s::jsonb,
-                        %(ok)s,
-                        clock_timestamp(),
-                        %(gpa)s,
-                        %(claimed_courses)s::jsonb,
-                        %(status)s,
-                        %(is_active)s,
-                        coalesce((SELECT max(revision) FROM result WHERE student_id = %(student_id)s AND area_code = %(area_code)s), 0) + 1,
-                        %(student_classification)s,
-                        %(student_class)s,
-                        nullif(%(student_name)s, ''),
-                        nullif(%(student_name_sort)s, '')
-                    )
-                    RETURNING id
-                """, {
-                    "student_id": stnum,
-                    "area_code": area_code,
-                    "catalog": area_catalog,
-                    "run": run_id,
-                    "input_data": json.dumps(student),
-                    "expires_at": expires_at,
-                    "link_only": link_only,
-                    "is_active": False if link_only else True,
-                    "total_count": msg.iters,
-                    "elapsed": f"{msg.elapsed_ms}ms",
-                    "avg_iter_time": f"{msg.avg_iter_ms}ms",
-                    "result": result_str,
-                    "claimed_courses": json.dumps(msg.result.keyed_claims()),
-                    "rank": result["rank"],
-                    "max_rank": result["max_rank"],
-                    "gpa": result["gpa"],
-                    "ok": result["ok"],
-                    "status": result["status"],
-                    "student_name": student["name"],
-                    "student_name_sort": student["name_sort"],
-                    "student_classification": student["classification"],
-                    "student_class": student["class"] if student["class"] != "None" else None,
-                    "result_version": result["version"],
-                })
-
-                result_id: int = curs.fetchone()[0]
-
-                return result_id
+                row = result_row(
+                    msg,
+                    student=student,
+                    area_code=area_code,
+                    area_catalog=area_catalog,
+                    run_id=run_id,
+                    expires_at=expires_at,
+                    link_only=link_only,
+                    input_fingerprint=input_fingerprint,
+                )
+
+                # hand the result to the writer process, if there is one, so
+                # that we can get on with the next audit
+                if results is not None:
+                    results.put(row)
+                    return None
+
+                return insert_result(curs, row)
 
             else:
                 logger.critical('unknown message %s', msg)
 
+    except psycopg2.Error as ex:
+        # the transaction is now aborted, so the caller needs to roll it back
+        logger.error("database error with student #%s, catalog %s, area %s: %s", stnum, area_catalog, area_code, ex)
+        raise
+
     except Exception as ex:
         logger.error("error with student #%s, catalog %s, area %s: %s", stnum, area_catalog, area_code, ex)
 
     return None
+
+
+def result_row(
+    msg: ResultMsg,
+    *,
+    student: Dict,
+    area_code: str,
+    area_catalog: str,
+    run_id: int,
+    expires_at: Optional[str],
+    link_only: bool,
+    input_fingerprint: Optional[str] = None,
+) -> ResultRow:
+    result = msg.result.to_dict()
+    if msg.truncated:
+        # the search ran out of time; this is only the best result so far
+        logger.warning("audit of #%s against %s %s was cut off after %s iterations", student['stnum'], area_catalog, area_code, msg.iters)
+        result["truncated"] = True
+
+    return ResultRow(
+        student_id=student['stnum'],
+        area_code=area_code,
+        catalog=area_catalog,
+        run=run_id,
+        expires_at=expires_at,
+        link_only=link_only,
+        result_version=result["version"],
+        iterations=msg.iters,
+        duration=f"{msg.elapsed_ms}ms",
+        per_iteration=f"{msg.avg_iter_ms}ms",
+        rank=result["rank"],
+        max_rank=result["max_rank"],
+        result=json.dumps(result),
+        result_hash=result_hash(result),
+        # a cut-off result should be audited again, even from the same inputs
+        input_fingerprint=input_fingerprint if not msg.truncated else None,
+        ok=result["ok"],
+        ts=ResultRow.finished_now(),
+        gpa=result["gpa"],
+        claimed_courses=json.dumps(msg.result.keyed_claims()),
+        status=result["status"],
+        **student_columns(student),
+    )
@@ -1,73 +1,153 @@
 from concurrent.futures import ThreadPoolExecutor, as_completed
-from typing import Optional, Set, Dict, Tuple, cast
+from typing import Callable, Iterable, List, NamedTuple, Optional, Sequence, Set, Dict, Tuple, TYPE_CHECKING, cast
 import argparse
 import json
 import os
 
-import tqdm  # type: ignore
-import urllib3  # type: ignore
-import psycopg2  # type: ignore
-import psycopg2.extras  # type: ignore
-import psycopg2.extensions  # type: ignore
-
 from dp.dotenv import load as load_dotenv
 from dp.bin.expand import expand_student
 
-http = urllib3.PoolManager()
+if TYPE_CHECKING:  # pragma: no cover
+    import psycopg2.extensions  # type: ignore  # noqa: F401
+    import urllib3  # type: ignore  # noqa: F401
+
 BATCH_URL = os.getenv("DP_BATCH_URL")
 SINGLE_URL = os.getenv("DP_SINGLE_URL")
 
 Item = Tuple[str, str]
 
 
-def get_student(student_id: str) -> Tuple[Dict, str]:
-    r = http.request("GET", SINGLE_URL, fields={"stnum": student_id})
+class QueueRow(NamedTuple):
+    student_id: str
+    area_catalog: str
+    area_code: str
+    input_data: str
+
+
+def make_http(*, concurrency: int, retries: int = 5, backoff: float = 0.5) -> 'urllib3.PoolManager':
+    """
+    Makes a connection pool that keeps one connection open for each fetching
+    thread, and retries failed requests with an exponential backoff.
+    """
+    import urllib3
+
+    retry = urllib3.Retry(
+        total=retries,
+        backoff_factor=backoff,
+        status_forcelist=(429, 500, 502, 503, 504),
+        raise_on_status=True,
+    )
+
+    return urllib3.PoolManager(
+        maxsize=concurrency,
+        block=True,
+        retries=retry,
+        timeout=urllib3.Timeout(connect=5.0, read=60.0),
+    )
+
+
+def get_student(http: 'urllib3.PoolManager', student_id: str, *, url: str) -> Tuple[Dict, str]:
+    r = http.request("GET", url, fields={"stnum": student_id})
+    if r.status != 200:
+        raise ValueError(f"fetching {student_id} returned HTTP {r.status}")
+
     text = r.data.decode("utf-8")
     return cast(Dict, json.loads(text)), text
 
 
-def fetch_and_queue(
+def student_rows(
     *,
-    conn: psycopg2.extensions.connection,
-    student_id: str,
-    run: int,
+    student: Dict,
+    unparsed_json: str,
     queued_items: Set[Item],
     blocked_items: Set[Item],
-    area_code_filter: Optional[str] = None
-) -> int:
-    parsed_student, unparsed_json = get_student(student_id)
+    area_code_filter: Optional[str] = None,
+) -> List[QueueRow]:
+    rows = []
+
+    for stnum, catalog, code in expand_student(student=student):
+        # skip already-queued items in this loop to avoid postgres deadlocks
+        if (stnum, code) in queued_items:
+            continue
 
-    count = 0
+        # skip audits that have been blocked
+        if (stnum, code) in blocked_items:
+            continue
+
+        # allow filtering batches of audits
+        if area_code_filter is not None and area_code_filter != code:
+            continue
+
+        rows.append(QueueRow(student_id=stnum, area_catalog=catalog, area_code=code, input_data=unparsed_json))
+
+    return rows
+
+
+def insert_rows(conn: 'psycopg2.extensions.connection', rows: Sequence[QueueRow], *, run: int) -> None:
+    import psycopg2.extras  # type: ignore
 
     with conn.cursor() as curs:
-        for stnum, catalog, code in expand_student(student=parsed_student):
-            # skip already-queued items in this loop to avoid postgres deadlocks
-            if (stnum, code) in queued_items:
-                continue
+        psycopg2.extras.execute_values(
+            curs,
+            "INSERT INTO queue (priority, student_id, area_catalog, area_code, input_data, run) VALUES %s",
+            [(row.student_id, row.area_catalog, row.area_code, row.input_data, run) for row in rows],
+            template="(1, %s, %s, %s, cast(%s as jsonb), %s)",
+            page_size=500,
+        )
 
-            # skip audits that have been blocked
-            if (stnum, code) in blocked_items:
-                continue
+    conn.commit()
 
-            # allow filtering batches of audits
-            if area_code_filter is not None and area_code_filter != code:
-                continue
 
-            count += 1
+def queue_students(
+    student_ids: Iterable[str],
+    *,
+    fetch: Callable[[str], List[QueueRow]],
+    store: Callable[[List[QueueRow]], None],
+    concurrency: int,
+    batch_size: int = 1000,
+    progress: Callable[[Iterable], Iterable] = lambda it: it,
+) -> Tuple[int, List[str]]:
+    """
+    Fetches the students with `concurrency` threads, and stores their queue
+    rows from this thread, `batch_size` rows at a time, so that the database
+    connection is only ever used by one thread.
+
+    Returns the number of rows that were stored, and the ids of the students
+    that could not be fetched.
+    """
 
-            curs.execute("""
-                INSERT INTO queue (priority, student_id, area_catalog, area_code, input_data, run)
-                VALUES (1, %(stnum)s, %(catalog)s, %(code)s, cast(%(data)s as jsonb), %(run)s)
-            """, {"stnum": stnum, "catalog": catalog, "code": code, "data": unparsed_json, "run": run})
+    total_count = 0
+    failed: List[str] = []
+    pending: List[QueueRow] = []
 
-        conn.commit()
+    with ThreadPoolExecutor(max_workers=concurrency) as pool:
+        future_to_student_id = {pool.submit(fetch, student_id): student_id for student_id in student_ids}
 
-    return count
+        for future in progress(as_completed(future_to_student_id)):
+            student_id = future_to_student_id[future]
 
+            try:
+                pending.extend(future.result())
+            except Exception as exc:
+                print(f"> processing {student_id} generated an exception: {exc}")
+                failed.append(student_id)
+                continue
+
+            if len(pending) >= batch_size:
+                store(pending)
+                total_count += len(pending)
+                pending = []
+
+    if pending:
+        store(pending)
+        total_count += len(pending)
+
+    return total_count, failed
 
-def get_student_ids() -> Set[str]:
+
+def get_student_ids(http: 'urllib3.PoolManager', *, url: str) -> Set[str]:
     print("fetching student ids to audit")
-    r = http.request("GET", BATCH_URL)
+    r = http.request("GET", url)
 
     student_ids = set(r.data.decode("utf-8").split())
     student_ids.add("122932")
@@ -75,7 +155,7 @@ def get_student_ids() -> Set[str]:
     return student_ids
 
 
-def fetch_queued_audits(conn: psycopg2.extensions.connection) -> Set[Item]:
+def fetch_queued_audits(conn: 'psycopg2.extensions.connection') -> Set[Item]:
     print("fetching queued audits")
     items: Set[Item] = set()
 
@@ -95,7 +175,7 @@ def fetch_queued_audits(conn: psycopg2.extensions.connection) -> Set[Item]:
     return items
 
 
-def fetch_blocked_audits(conn: psycopg2.extensions.connection) -> Set[Item]:
+def fetch_blocked_audits(conn: 'psycopg2.extensions.connection') -> Set[Item]:
     print("fetching blocked audits")
     items: Set[Item] = set()
 
@@ -116,19 +196,23 @@ def fetch_blocked_audits(conn: psycopg2.extensions.connection) -> Set[Item]:
 
 
 def main() -> None:
+    import psycopg2  # type: ignore
+    import psycopg2.extras  # type: ignore
+    import tqdm  # type: ignore
+
     parser = argparse.ArgumentParser()
     parser.add_argument("--run", type=int, nargs="?")
     parser.add_argument("--code", type=str, nargs="?")
+    parser.add_argument("--concurrency", type=int, default=32, help="the number of students to fetch at once")
+    parser.add_argument("--retries", type=int, default=5, help="the number of times to retry fetching a student")
+    parser.add_argument("--insert-batch-size", type=int, default=1000, help="the number of audits to queue at once")
     args = parser.parse_args()
 
-    try:
-        worker_count = len(os.sched_getaffinity(0))
-    except AttributeError:
-        worker_count = cast(int, os.cpu_count())
-
     assert SINGLE_URL
     assert BATCH_URL
 
+    http = make_http(concurrency=args.concurrency, retries=args.retries)
+
     conn = psycopg2.connect(
         "",  # empty string means "use the environment variables"
         application_name="degreepath-batch",
@@ -142,51 +226,38 @@ def main() -> None:
             row = curs.fetchone()
             run = row[0]
 
-    total_count = 0
-
     queued_items = fetch_queued_audits(conn=conn)
     blocked_items = fetch_blocked_audits(conn=conn)
 
-    student_ids = get_student_ids()
-    remaining_student_ids = list(student_ids)
-
-    print(f"fetching and queueing data for {len(student_ids):,} student ids with {worker_count} threads")
-    with ThreadPoolExecutor(max_workers=worker_count) as pool:
-        future_to_student_id = {
-            pool.submit(
-                fetch_and_queue,
-                conn=conn,
-                student_id=student_id,
-                run=run,
-                queued_items=queued_items,
-                blocked_items=blocked_items,
-                area_code_filter=args.code,
-            ): student_id
-            for student_id in student_ids
-        }
-
-        pbar = tqdm.tqdm(as_completed(future_to_student_id), total=len(future_to_student_id), disable=None)
-
-        for future in pbar:
-            student_id = future_to_student_id[future]
-
-            try:
-                remaining_student_ids.remove(student_id)
-            except ValueError:
-                pass
-            upcoming = remaining_student_ids[:worker_count]
-
-            try:
-                inserted_item_count = future.result()
-                total_count += inserted_item_count
-
-                pbar.set_description(', '.join(upcoming))
-                # print(f"> fetched and queued {inserted_item_count} audits for {student_id}")
-
-            except Exception as exc:
-                print(f"> processing {student_id} generated an exception: {exc}")
+    student_ids = get_student_ids(http, url=BATCH_URL)
+
+    def fetch(student_id: str) -> List[QueueRow]:
+        assert SINGLE_URL
+        student, unparsed_json = get_student(http, student_id, url=SINGLE_URL)
+        return student_rows(
+            student=student,
+            unparsed_json=unparsed_json,
+            queued_items=queued_items,
+            blocked_items=blocked_items,
+            area_code_filter=args.code,
+        )
+
+    def store(rows: List[QueueRow]) -> None:
+        insert_rows(conn, rows, run=run)
+
+    print(f"fetching and queueing data for {len(student_ids):,} student ids with {args.concurrency} threads")
+    total_count, failed = queue_students(
+        student_ids,
+        fetch=fetch,
+        store=store,
+        concurrency=args.concurrency,
+        batch_size=args.insert_batch_size,
+        progress=lambda it: tqdm.tqdm(it, total=len(student_ids), disable=None),
+    )
 
     print(f"queued {total_count:,} audits")
+    if failed:
+        print(f"could not fetch {len(failed):,} students: {', '.join(sorted(failed))}")
 
     conn.close()
 
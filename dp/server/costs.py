@@ -0,0 +1,85 @@
+from typing import Dict, List, Optional, Sequence
+import logging
+import enum
+import time
+
+import attr
+import psycopg2.extensions  # type: ignore
+
+logger = logging.getLogger(__name__)
+
+
+@enum.unique
+class Lane(enum.Enum):
+    """
+    Which queued audits a worker should take. "Light" workers skip the areas
+    that are known to take a long time, so that quick audits never wait
+    behind them; "heavy" workers take those areas first, and anything else
+    once there are none left.
+    """
+
+    Any = "any"
+    Light = "light"
+    Heavy = "heavy"
+
+
+@attr.s(slots=True, kw_only=True, auto_attribs=True)
+class AreaCosts:
+    """
+    The expected duration (in seconds) of an audit of each area, taken from
+    the recent results of that area.
+    """
+
+    max_age: float = 600.0
+    durations: Dict[str, float] = attr.ib(factory=dict)
+    loaded_at: Optional[float] = None
+
+    def load(self, curs: psycopg2.extensions.cursor) -> None:
+        curs.execute('''
+            SELECT area_code, avg(extract(epoch FROM duration))
+            FROM result
+            WHERE ts > now() - interval '30 days'
+            GROUP BY area_code
+        ''')
+
+        self.durations = {area_code: float(seconds) for area_code, seconds in curs.fetchall() if seconds is not None}
+        self.loaded_at = time.monotonic()
+
+        logger.debug('loaded expected durations for %d areas', len(self.durations))
+
+    def refresh_if_stale(self, curs: psycopg2.extensions.cursor) -> None:
+        if self.loaded_at is not None and time.monotonic() - self.loaded_at < self.max_age:
+            return
+
+        self.load(curs)
+
+    def expected(self, area_code: str) -> Optional[float]:
+        return self.durations.get(area_code, None)
+
+    def heavy_codes(self, *, threshold: float) -> List[str]:
+        return sorted(code for code, seconds in self.durations.items() if seconds >= threshold)
+
+
+@attr.s(slots=True, kw_only=True, auto_attribs=True)
+class AuditBudgets:
+    """
+    How long (in seconds) an audit of each area may search before it stops
+    and stores the best result that it has found so far.
+    """
+
+    default: Optional[float] = None
+    per_area: Dict[str, float] = attr.ib(factory=dict)
+
+    @staticmethod
+    def parse(*, default: Optional[float], overrides: Sequence[str]) -> 'AuditBudgets':
+        per_area: Dict[str, float] = {}
+        for item in overrides:
+            area_code, sep, seconds = item.partition('=')
+            if not sep or not area_code:
+                raise ValueError(f'expected an override like "CODE=SECONDS", not {item!r}')
+            per_area[area_code] = float(seconds)
+
+        return AuditBudgets(default=default, per_area=per_area)
+
+    def time_limit(self, area_code: str) -> Optional[float]:
+        return self.per_area.get(area_code, self.default)
@@ -0,0 +1,125 @@
+from typing import Dict, Optional, TYPE_CHECKING
+import functools
+import hashlib
+import logging
+import pathlib
+import json
+import os
+
+from dp.server.writer import student_columns
+
+if TYPE_CHECKING:  # pragma: no cover
+    import psycopg2.extensions  # type: ignore  # noqa: F401
+
+logger = logging.getLogger(__name__)
+
+SKIP_UNCHANGED = True if int(os.getenv('DP_SKIP_UNCHANGED', default='1')) == 1 else False
+
+
+@functools.lru_cache(maxsize=None)
+def auditor_version() -> str:
+    """
+    Identifies the code that produces the results. This is the value of
+    DP_AUDITOR_VERSION, if it is set, and otherwise a hash of the sources of
+    the `dp` package, so that any change to the auditor invalidates the
+    stored fingerprints.
+    """
+    version = os.getenv('DP_AUDITOR_VERSION')
+    if version:
+        return version
+
+    package = pathlib.Path(__file__).parent.parent
+
+    digest = hashlib.sha256()
+    for source in sorted(package.rglob('*.py')):
+        digest.update(str(source.relative_to(package)).encode('utf-8'))
+        digest.update(source.read_bytes())
+
+    return digest.hexdigest()
+
+
+def area_digest(area_file: pathlib.Path) -> str:
+    try:
+        return hashlib.sha256(area_file.read_bytes()).hexdigest()
+    except FileNotFoundError:
+        return ''
+
+
+def input_fingerprint(
+    *,
+    student: Dict,
+    area_catalog: str,
+    area_code: str,
+    area_digest: str,
+    time_limit: Optional[float] = None,
+    version: Optional[str] = None,
+) -> str:
+    """
+    Hashes everything that an audit's result depends on: the student's data
+    (including their exceptions), the area's specification, the time limit,
+    and the auditor itself.
+
+    >>> a = input_fingerprint(student={'stnum': '1', 'courses': []}, area_catalog='2019-20', area_code='140', area_digest='x', version='1')
+    >>> a == input_fingerprint(student={'courses': [], 'stnum': '1'}, area_catalog='2019-20', area_code='140', area_digest='x', version='1')
+    True
+    >>> a == input_fingerprint(student={'stnum': '1', 'courses': []}, area_catalog='2019-20', area_code='140', area_digest='y', version='1')
+    False
+    """
+    inputs = {
+        'student': student,
+        'area_catalog': area_catalog,
+        'area_code': area_code,
+        'area_digest': area_digest,
+        'time_limit': time_limit,
+        'version': version if version is not None else auditor_version(),
+    }
+
+    canonical = json.dumps(inputs, sort_keys=True, separators=(',', ':'))
+    return hashlib.sha256(canonical.encode('utf-8')).hexdigest()
+
+
+def reuse_result(
+    curs: 'psycopg2.extensions.cursor',
+    *,
+    fingerprint: str,
+    student: Dict,
+    student_id: str,
+    area_catalog: str,
+    area_code: str,
+    run_id: int,
+    expires_at: Optional[str],
+) -> Optional[int]:
+    """
+    If the active result for this student and area was audited from the same
+    inputs, moves it into the new run instead of auditing again, and returns
+    its id. The columns that a new audit would take from the student are
+    stored again too, so that the reused row matches a fresh one.
+    """
+    curs.execute("""
+        UPDATE result
+        SET run = %(run)s, ts = clock_timestamp(), expires_at = %(expires_at)s,
+            input_data = %(input_data)s, student_classification = %(student_classification)s,
+            student_class = %(student_class)s, student_name = %(student_name)s,
+            student_name_sort = %(student_name_sort)s
+        WHERE student_id = %(student_id)s
+            AND catalog = %(catalog)s
+            AND area_code = %(area_code)s
+            AND is_active = true
+            AND input_fingerprint = %(fingerprint)s
+        RETURNING id
+    """, {
+        "run": run_id,
+        "expires_at": expires_at,
+        "student_id": student_id,
+        "catalog": area_catalog,
+        "area_code": area_code,
+        "fingerprint": fingerprint,
+        **student_columns(student),
+    })
+
+    row = curs.fetchone()
+    if row is None:
+        return None
+
+    result_id: int = row[0]
+    return result_id
@@ -0,0 +1,133 @@
+from typing import Any, Callable, Dict, List, Optional
+import resource
+import logging
+import time
+import sys
+import os
+
+import attr
+
+logger = logging.getLogger(__name__)
+
+
+def rss_mb() -> float:
+    """
+    The resident memory of this process, in megabytes. Falls back to the
+    peak resident memory where /proc isn't available.
+    """
+    try:
+        with open('/proc/self/statm', 'r') as infile:
+            resident_pages = int(infile.read().split()[1])
+        return resident_pages * os.sysconf('SC_PAGE_SIZE') / (1024 * 1024)
+    except (OSError, ValueError, IndexError):
+        pass
+
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # ru_maxrss is in kilobytes on linux, and bytes on macos
+    return peak / (1024 * 1024) if sys.platform == 'darwin' else peak / 1024
+
+
+@attr.s(slots=True, kw_only=True, auto_attribs=True)
+class RecyclePolicy:
+    """
+    When a worker should exit, so that the master can replace it with a
+    fresh copy of itself: after it has processed `max_jobs` jobs, or once it
+    has grown by `max_rss_mb` megabytes since it started. Either limit may be
+    None.
+
+    The growth is measured from `baseline_mb`, which `start` records in the
+    worker itself, because a forked worker's resident memory includes the
+    pages that it still shares with the master.
+    """
+
+    max_jobs: Optional[int] = None
+    max_rss_mb: Optional[float] = None
+    baseline_mb: float = 0.0
+    jobs: int = 0
+
+    def start(self, *, rss: Callable[[], float] = rss_mb) -> None:
+        self.baseline_mb = rss()
+
+    def record(self, jobs: int) -> None:
+        self.jobs += jobs
+
+    def growth_mb(self, *, rss: Callable[[], float] = rss_mb) -> float:
+        return rss() - self.baseline_mb
+
+    def should_recycle(self, *, rss: Callable[[], float] = rss_mb) -> bool:
+        if self.max_jobs is not None and self.jobs >= self.max_jobs:
+            return True
+
+        if self.max_rss_mb is not None and self.growth_mb(rss=rss) >= self.max_rss_mb:
+            return True
+
+        return False
+
+
+def supervise(
+    specs: List[Dict[str, Any]],
+    *,
+    spawn: Callable[[Dict[str, Any]], Any],
+    interval: float = 1.0,
+    rounds: Optional[int] = None,
+    min_uptime: float = 10.0,
+    backoff: float = 1.0,
+    max_backoff: float = 60.0,
+    clock: Callable[[], float] = time.monotonic,
+) -> List[Any]:
+    """
+    Starts a process for each of `specs` with `spawn`, and replaces each one
+    whenever it exits, either because it recycled itself or because it died.
+    Checks the processes every `interval` seconds, forever, unless `rounds`
+    is given.
+
+    A process that fails within `min_uptime` seconds of starting is replaced
+    after a delay, starting at `backoff` seconds and doubling with each
+    failure in a row, up to `max_backoff` seconds, so that a process that
+    can't start (say, because the database is down) isn't restarted in a
+    tight loop.
+    """
+
+    processes = [spawn(spec) for spec in specs]
+    started = [clock() for _ in specs]
+    failures = [0 for _ in specs]
+    restart_at: List[Optional[float]] = [None for _ in specs]
+
+    checked = 0
+    while rounds is None or checked < rounds:
+        time.sleep(interval)
+        checked += 1
+
+        for i, process in enumerate(processes):
+            now = clock()
+
+            waiting_until = restart_at[i]
+            if waiting_until is None:
+                if process.is_alive():
+                    continue
+
+                process.join()
+                if process.exitcode != 0:
+                    logger.warning('process %d exited with code %s; replacing it', i, process.exitcode)
+                else:
+                    logger.info('process %d exited; replacing it', i)
+
+                if process.exitcode != 0 and now - started[i] < min_uptime:
+                    failures[i] += 1
+                else:
+                    failures[i] = 0
+
+                if failures[i]:
+                    delay = min(max_backoff, backoff * 2 ** (failures[i] - 1))
+                    logger.warning('process %d has failed %d times in a row; waiting %.0fs', i, failures[i], delay)
+                    restart_at[i] = now + delay
+                    continue
+
+            elif now < waiting_until:
+                continue
+
+            restart_at[i] = None
+            processes[i] = spawn(specs[i])
+            started[i] = now
+
+    return processes
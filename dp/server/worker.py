@@ -2,24 +2,77 @@ import logging
 import pathlib
 import select
 import json
+from typing import Dict, List, NamedTuple, Optional, Tuple, TYPE_CHECKING
 
 import psycopg2  # type: ignore
 import psycopg2.extensions  # type: ignore
 
 from dp.run import find_area, load_area
+from dp.area_index import AreaIndex
+from dp.server.costs import AreaCosts, AuditBudgets, Lane
+from dp.data.student import ParsedStudent
 from dp.server.audit import audit
+from dp.server.pool import RecyclePolicy
+from dp.server.fingerprint import SKIP_UNCHANGED, area_digest, input_fingerprint, reuse_result
+
+if TYPE_CHECKING:  # pragma: no cover
+    import multiprocessing
 
 logger = logging.getLogger(__name__)
 
+# the raw and parsed student data for each distinct `input_data` in a batch
+StudentCache = Dict[str, Tuple[Dict, ParsedStudent]]
+
 
-def wrapper(*, area_root: str) -> None:
+def wrapper(
+    *,
+    area_root: str,
+    area_cache: Optional[str] = None,
+    batch_size: int = 1,
+    lane: Lane = Lane.Any,
+    heavy_threshold: float = 60.0,
+    budgets: Optional[AuditBudgets] = None,
+    results: Optional['multiprocessing.Queue'] = None,
+    area_index: Optional[AreaIndex] = None,
+    recycle: Optional[RecyclePolicy] = None,
+) -> None:
     try:
-        worker(area_root=pathlib.Path(area_root))
+        worker(
+            area_root=pathlib.Path(area_root),
+            area_cache=pathlib.Path(area_cache) if area_cache else None,
+            batch_size=batch_size,
+            lane=lane,
+            heavy_threshold=heavy_threshold,
+            budgets=budgets,
+            results=results,
+            area_index=area_index,
+            recycle=recycle,
+        )
     except KeyboardInterrupt:
         pass
 
 
-def worker(*, area_root: pathlib.Path) -> None:
+def worker(
+    *,
+    area_root: pathlib.Path,
+    area_cache: Optional[pathlib.Path] = None,
+    batch_size: int = 1,
+    lane: Lane = Lane.Any,
+    heavy_threshold: float = 60.0,
+    budgets: Optional[AuditBudgets] = None,
+    results: Optional['multiprocessing.Queue'] = None,
+    area_index: Optional[AreaIndex] = None,
+    recycle: Optional[RecyclePolicy] = None,
+) -> None:
+    # measure this worker's growth from what it inherited from the master
+    if recycle is not None:
+        recycle.start()
+
+    # the index may have been built before this process was forked
+    if area_index is None:
+        area_index = AreaIndex.build(area_root)
+    area_costs = AreaCosts()
+
     logger.info('connect')
 
     # empty string means "use the environment variables"
@@ -30,7 +83,24 @@ def worker(*, area_root: pathlib.Path) -> None:
 
     with conn.cursor() as curs:
         # process any already-existing items
-        process_queue(curs=curs, area_root=area_root)
+        process_queue(
+            curs=curs,
+            area_root=area_root,
+            area_index=area_index,
+            area_cache=area_cache,
+            batch_size=batch_size,
+            lane=lane,
+            area_costs=area_costs,
+            heavy_threshold=heavy_threshold,
+            budgets=budgets,
+            results=results,
+            recycle=recycle,
+        )
+
+    if recycle is not None and recycle.should_recycle():
+        logger.info('exiting for a fresh worker after %d jobs, having grown by %.0fMB', recycle.jobs, recycle.growth_mb())
+        conn.close()
+        return
 
     with conn.cursor() as curs:
         channel = 'dp_queue_update'
@@ -51,10 +121,67 @@ def worker(*, area_root: pathlib.Path) -> None:
                 notify = conn.notifies.pop(0)
                 logger.info(f"NOTIFY: {notify.pid}, channel={notify.channel}, payload={notify.payload!r}")
 
-                process_queue(curs=curs, area_root=area_root)
+                process_queue(
+                    curs=curs,
+                    area_root=area_root,
+                    area_index=area_index,
+                    area_cache=area_cache,
+                    batch_size=batch_size,
+                    lane=lane,
+                    area_costs=area_costs,
+                    heavy_threshold=heavy_threshold,
+                    budgets=budgets,
+                    results=results,
+                    recycle=recycle,
+                )
+
+            if recycle is not None and recycle.should_recycle():
+                logger.info('exiting for a fresh worker after %d jobs, having grown by %.0fMB', recycle.jobs, recycle.growth_mb())
+                break
+
+    conn.close()
+
+
+class QueueJob(NamedTuple):
+    queue_id: int
+    run_id: int
+    student_id: str
+    area_catalog: str
+    area_code: str
+    input_data: str
+    expires_at: Optional[str]
+    link_only: bool
 
+    def area_id(self) -> str:
+        return self.area_catalog + '/' + self.area_code
+
+
+def process_queue(
+    *,
+    curs: psycopg2.extensions.cursor,
+    area_root: pathlib.Path,
+    area_index: Optional[AreaIndex] = None,
+    area_cache: Optional[pathlib.Path] = None,
+    batch_size: int = 1,
+    lane: Lane = Lane.Any,
+    area_costs: Optional[AreaCosts] = None,
+    heavy_threshold: float = 60.0,
+    budgets: Optional[AuditBudgets] = None,
+    results: Optional['multiprocessing.Queue'] = None,
+    recycle: Optional[RecyclePolicy] = None,
+) -> None:
+    # split the queue into lanes by how long each area is expected to take
+    skip_codes: List[str] = []
+    prefer_codes: List[str] = []
+    if lane is not Lane.Any and area_costs is not None:
+        area_costs.refresh_if_stale(curs)
+        heavy_codes = area_costs.heavy_codes(threshold=heavy_threshold)
+
+        if lane is Lane.Light:
+            skip_codes = heavy_codes
+        elif lane is Lane.Heavy:
+            prefer_codes = heavy_codes
 
-def process_queue(*, curs: psycopg2.extensions.cursor, area_root: pathlib.Path) -> None:
     # loop until the queue is empty
     while True:
         curs.execute('BEGIN;')
@@ -62,67 +189,159 @@ def process_queue(*, curs: psycopg2.extensions.cursor, area_root: pathlib.Path)
         curs.execute('''
             DELETE
             FROM public.queue
-            WHERE id = (
+            WHERE id IN (
                 SELECT id
                 FROM public.queue
-                ORDER BY priority DESC, ts
+                WHERE NOT (area_code = ANY(%(skip_codes)s))
+                ORDER BY priority DESC, area_code = ANY(%(prefer_codes)s) DESC, ts
                     FOR UPDATE
                         SKIP LOCKED
-                LIMIT 1
+                LIMIT %(batch_size)s
             )
             RETURNING id, run, student_id, area_catalog, area_code, input_data::text, expires_at, link_only;
-        ''')
+        ''', {"batch_size": batch_size, "skip_codes": skip_codes, "prefer_codes": prefer_codes})
 
-        # fetch the next available queued item
-        row = curs.fetchone()
+        # fetch the next available queued items
+        rows = curs.fetchall()
 
         # if there are no more, return to waiting
-        if row is None:
+        if not rows:
             curs.execute('COMMIT;')
             break
 
         try:
-            queue_id, run_id, student_id, area_catalog, area_code, input_data, expires_at, link_only = row
-        except ValueError as exc:
+            jobs = [QueueJob(*row) for row in rows]
+        except TypeError as exc:
             curs.execute('COMMIT;')
             logger.exception('unexpected exception: wrong number of items in tuple from queue table - %s', exc)
             break
 
-        area_id = area_catalog + '/' + area_code
-        try:
-            logger.info(f'[q={queue_id}] begin  {student_id}::{area_id}')
-
-            catalog_int = int(area_catalog.split('-')[0])
+        # group each student's jobs together, so that we only need to parse
+        # their data once. The whole batch is committed at once, so the order
+        # within a batch doesn't matter otherwise.
+        first_seen: Dict[str, int] = {}
+        for i, job in enumerate(jobs):
+            first_seen.setdefault(job.student_id, i)
+        jobs.sort(key=lambda j: first_seen[j.student_id])
 
-            area_file = find_area(root=area_root, area_catalog=catalog_int, area_code=area_code)
-            if not area_file:
-                logger.error('could not find area spec for %s at or below catalog %s (%s), under %s', area_code, area_catalog, catalog_int, area_root)
+        students: StudentCache = {}
+        completed: List[QueueJob] = []
+        for job in jobs:
+            if len(jobs) == 1:
+                if process_job(curs=curs, job=job, students=students, area_root=area_root, area_index=area_index, area_cache=area_cache, budgets=budgets, results=results):
+                    completed.append(job)
                 continue
 
-            area_spec = load_area(area_file)
-
-            # run the audit
-            audit(
-                curs=curs,
-                student=json.loads(input_data),
-                area_spec=area_spec,
-                area_catalog=area_catalog,
-                area_code=area_code,
-                run_id=run_id,
-                expires_at=expires_at,
-                link_only=link_only,
+            # if one job fails, don't lose the results of the others
+            curs.execute('SAVEPOINT job;')
+            if process_job(curs=curs, job=job, students=students, area_root=area_root, area_index=area_index, area_cache=area_cache, budgets=budgets, results=results):
+                curs.execute('RELEASE SAVEPOINT job;')
+                completed.append(job)
+            else:
+                curs.execute('ROLLBACK TO SAVEPOINT job;')
+
+        # once the audits are done, commit the queue's DELETE
+        curs.execute('COMMIT;')
+
+        for job in completed:
+            logger.info(f'[q={job.queue_id}] commit {job.student_id}::{job.area_id()}')
+
+        # leave the rest of the queue for the other workers, and this
+        # worker's replacement
+        if recycle is not None:
+            recycle.record(len(jobs))
+            if recycle.should_recycle():
+                return
+
+    logger.info('queue is empty')
+
+
+def process_job(
+    *,
+    curs: psycopg2.extensions.cursor,
+    job: QueueJob,
+    students: StudentCache,
+    area_root: pathlib.Path,
+    area_index: Optional[AreaIndex] = None,
+    area_cache: Optional[pathlib.Path] = None,
+    budgets: Optional[AuditBudgets] = None,
+    results: Optional['multiprocessing.Queue'] = None,
+) -> bool:
+    area_id = job.area_id()
+
+    try:
+        logger.info(f'[q={job.queue_id}] begin  {job.student_id}::{area_id}')
+
+        catalog_int = int(job.area_catalog.split('-')[0])
+
+        area_file = find_area(root=area_root, area_catalog=catalog_int, area_code=job.area_code, index=area_index)
+        if not area_file:
+            logger.error('could not find area spec for %s at or below catalog %s (%s), under %s', job.area_code, job.area_catalog, catalog_int, area_root)
+            return True
+
+        area_spec = load_area(area_file, cache_dir=area_cache)
+
+        # each student's data is only parsed once per batch
+        cached = students.get(job.input_data, None)
+        if cached is None:
+            student = json.loads(job.input_data)
+            cached = students[job.input_data] = (student, ParsedStudent.parse(student))
+        student, parsed_student = cached
+
+        time_limit = budgets.time_limit(job.area_code) if budgets is not None else None
+
+        # if nothing that the audit depends on has changed since the active
+        # result was computed, link that result to this run instead
+        fingerprint = input_fingerprint(
+            student=student,
+            area_catalog=job.area_catalog,
+            area_code=job.area_code,
+            area_digest=area_digest(area_file),
+            time_limit=time_limit,
+        )
+
+        if SKIP_UNCHANGED and not job.link_only:
+            reused_id = reuse_result(
+                curs,
+                fingerprint=fingerprint,
+                student=student,
+                student_id=job.student_id,
+                area_catalog=job.area_catalog,
+                area_code=job.area_code,
+                run_id=job.run_id,
+                expires_at=job.expires_at,
             )
 
-            # once the audit is done, commit the queue's DELETE
-            curs.execute('COMMIT;')
+            if reused_id is not None:
+                logger.info(f'[q={job.queue_id}] unchanged {job.student_id}::{area_id}; reused result {reused_id}')
+                return True
 
-            logger.info(f'[q={queue_id}] commit {student_id}::{area_id}')
+        # run the audit
+        audit(
+            curs=curs,
+            student=student,
+            parsed_student=parsed_student,
+            area_spec=area_spec,
+            area_catalog=job.area_catalog,
+            area_code=job.area_code,
+            run_id=job.run_id,
+            expires_at=job.expires_at,
+            link_only=job.link_only,
+            time_limit=time_limit,
+            results=results,
+            input_fingerprint=fingerprint,
+        )
 
-        except Exception as exc:
-            # commit the deletion, just so it doesn't endlessly re-run itself
-            curs.execute('COMMIT;')
+        # if a statement failed, the rest of the transaction can't be used
+        # until it is rolled back
+        if curs.connection.get_transaction_status() == psycopg2.extensions.TRANSACTION_STATUS_INERROR:
+            logger.error(f'[q={job.queue_id}] error  {job.student_id}::{area_id}; the transaction was aborted')
+            return False
 
-            # log the exception
-            logger.error(f'[q={queue_id}] error  {student_id}::{area_id}; %s', exc)
+        return True
 
-    logger.info('queue is empty')
+    except Exception as exc:
+        # the deletion is still committed, just so it doesn't endlessly re-run itself
+        logger.error(f'[q={job.queue_id}] error  {job.student_id}::{area_id}; %s', exc)
+
+        return False
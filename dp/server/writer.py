@@ -0,0 +1,581 @@
+from typing import Any, Dict, List, Optional, Sequence, TYPE_CHECKING
+import datetime
+import hashlib
+import logging
+import json
+import pickle
+import queue
+import time
+import io
+
+import attr
+
+if TYPE_CHECKING:  # pragma: no cover
+    import multiprocessing
+    import psycopg2.extensions  # type: ignore  # noqa: F401
+
+logger = logging.getLogger(__name__)
+
+
+@attr.s(frozen=True, slots=True, kw_only=True, auto_attribs=True)
+class ResultRow:
+    """
+    A finished audit, ready to be stored in the `result` table. Workers build
+    these and hand them to the writer, so that they can start on the next
+    audit right away.
+    """
+
+    student_id: str
+    area_code: str
+    catalog: str
+    run: int
+    input_data: str
+    expires_at: Optional[str]
+    link_only: bool
+    result_version: int
+    iterations: int
+    duration: str
+    per_iteration: str
+    rank: str
+    max_rank: str
+    result: str
+    result_hash: str
+    input_fingerprint: Optional[str]
+    ok: bool
+    ts: str
+    gpa: str
+    claimed_courses: str
+    status: str
+    student_classification: Optional[str]
+    student_class: Optional[str]
+    student_name: Optional[str]
+    student_name_sort: Optional[str]
+
+    @staticmethod
+    def finished_now() -> str:
+        # the time that the computation was finished, rather than the time
+        # that the row is written
+        return datetime.datetime.now(datetime.timezone.utc).isoformat()
+
+
+def result_hash(result: Dict[str, Any]) -> str:
+    """
+    Hashes a result document, independent of the order of its keys, so that
+    identical results can be found by comparing their hashes instead of the
+    whole documents.
+
+    >>> result_hash({'a': 1, 'b': [2, 3]}) == result_hash({'b': [2, 3], 'a': 1})
+    True
+    >>> result_hash({'a': 1}) == result_hash({'a': 2})
+    False
+    """
+    canonical = json.dumps(result, sort_keys=True, separators=(',', ':'))
+    return hashlib.sha256(canonical.encode('utf-8')).hexdigest()
+
+
+def student_columns(student: Dict) -> Dict[str, Optional[str]]:
+    """
+    The columns of a result that come from the student's data, rather than
+    from the audit.
+
+    >>> student_columns({'stnum': '1', 'classification': 'SR', 'class': 'None', 'name': 'A B', 'name_sort': ''})['student_class'] is None
+    True
+    """
+    return dict(
+        input_data=json.dumps(student),
+        student_classification=student["classification"],
+        student_class=student["class"] if student["class"] != "None" else None,
+        student_name=student["name"] or None,
+        student_name_sort=student["name_sort"] or None,
+    )
+
+
+# The columns that are copied into the staging table, in order. `seq` keeps
+# the order that the audits finished in, for the revision numbers.
+STAGED_COLUMNS = ('seq', *(a.name for a in attr.fields(ResultRow)))
+
+
+def copy_field(value: Any) -> str:
+    """
+    Formats a value for COPY's CSV format. Quoted values are always strings,
+    even if they're empty, and an unquoted empty value is NULL.
+
+    >>> [copy_field(v) for v in (None, '', 'say "hi" now', True, 3)]
+    ['', '""', '"say ""hi"" now"', 'true', '3']
+    """
+    if value is None:
+        return ''
+    if value is True:
+        return 'true'
+    if value is False:
+        return 'false'
+    if isinstance(value, int):
+        return str(value)
+
+    text = str(value).replace('"', '""')
+    return f'"{text}"'
+
+
+def copy_rows(rows: Sequence[ResultRow]) -> io.StringIO:
+    buffer = io.StringIO()
+
+    for seq, row in enumerate(rows):
+        values = (seq, *attr.astuple(row, recurse=False))
+        buffer.write(','.join(copy_field(v) for v in values))
+        buffer.write('\n')
+
+    buffer.seek(0)
+    return buffer
+
+
+class ResultSpool:
+    """
+    A file of the results that the writer has taken off the queue, but not
+    yet stored. The workers have already removed these audits from the
+    database's queue, so if the writer dies, its replacement stores them from
+    here instead of losing them.
+
+    >>> import tempfile, os
+    >>> path = os.path.join(tempfile.mkdtemp(), 'results.spool')
+    >>> spool = ResultSpool(path)
+    >>> spool.record('a'); spool.record('b')
+    >>> ResultSpool(path).recover()
+    ['a', 'b']
+    >>> spool.clear()
+    >>> ResultSpool(path).recover()
+    []
+    """
+
+    __slots__ = ('path', 'file')
+
+    def __init__(self, path: str) -> None:
+        self.path = path
+        self.file = open(path, 'ab')
+
+    def record(self, row: Any) -> None:
+        pickle.dump(row, self.file)
+        # hand it to the OS, so that it outlives this process
+        self.file.flush()
+
+    def clear(self) -> None:
+        self.file.truncate(0)
+        self.file.flush()
+
+    def recover(self) -> List[Any]:
+        rows: List[Any] = []
+
+        with open(self.path, 'rb') as infile:
+            while True:
+                try:
+                    rows.append(pickle.load(infile))
+                except EOFError:
+                    break
+                except (pickle.UnpicklingError, AttributeError, ValueError) as exc:
+                    # the writer died part-way through recording this row
+                    logger.warning('ignoring a partly-recorded result in %s: %s', self.path, exc)
+                    break
+
+        return rows
+
+
+@attr.s(slots=True, kw_only=True, auto_attribs=True)
+class ResultWriter:
+    """
+    Collects finished audits and stores them in batches: each batch is
+    copied into a temporary staging table, and then the old results are
+    deactivated and the new ones inserted with one statement each, instead of
+    three statements for every audit.
+
+    Within a batch, the audits are applied in the order that they finished
+    in, so a student's newest result for an area is the active one.
+
+    A batch that fails is retried `retries` times, and then stored one row
+    at a time, so that only the rows that can't be stored are dropped. Until
+    they are stored, the pending rows are also kept in the `spool`, if there
+    is one.
+    """
+
+    curs: 'psycopg2.extensions.cursor'
+    batch_size: int = 50
+    retries: int = 2
+    retry_delay: float = 1.0
+    pending: List[ResultRow] = attr.ib(factory=list)
+    prepared: bool = False
+    spool: Optional[ResultSpool] = None
+
+    def add(self, row: ResultRow) -> None:
+        if self.spool is not None:
+            self.spool.record(row)
+
+        self.pending.append(row)
+
+        if len(self.pending) >= self.batch_size:
+            self.flush()
+
+    def prepare(self) -> None:
+        if self.prepared:
+            return
+
+        # The staging table takes its column types from `result`, so that
+        # the insert below doesn't need any casts.
+        self.curs.execute("""
+            CREATE TEMPORARY TABLE IF NOT EXISTS result_staging AS
+            SELECT
+                0::int AS seq, student_id, area_code, catalog, run, input_data, expires_at,
+                link_only, result_version, iterations, duration, per_iteration, rank,
+                max_rank, result, result_hash, input_fingerprint, ok, ts, gpa, claimed_courses, status,
+                student_classification, student_class, student_name, student_name_sort
+            FROM result
+            WITH NO DATA
+        """)
+
+        self.prepared = True
+
+    def flush(self) -> int:
+        if not self.pending:
+            return 0
+
+        rows, self.pending = self.pending, []
+
+        self.prepare()
+
+        stored = self.store(rows)
+
+        # every row has now either been stored or logged
+        if self.spool is not None:
+            self.spool.clear()
+
+        return stored
+
+    def store(self, rows: Sequence[ResultRow]) -> int:
+        for attempt in range(self.retries + 1):
+            try:
+                self.store_batch(rows)
+            except Exception as exc:
+                logger.warning('could not store %d results (attempt %d of %d): %s', len(rows), attempt + 1, self.retries + 1, exc)
+                if attempt < self.retries:
+                    time.sleep(self.retry_delay * 2 ** attempt)
+                continue
+
+            logger.info('stored %d results', len(rows))
+            return len(rows)
+
+        # store them one at a time instead, so that a single bad row doesn't
+        # lose the rest of the batch
+        return self.store_each(rows)
+
+    def store_batch(self, rows: Sequence[ResultRow]) -> None:
+        self.curs.execute('BEGIN;')
+        try:
+            self.curs.execute('TRUNCATE result_staging;')
+
+            columns = ', '.join(STAGED_COLUMNS)
+            self.curs.copy_expert(f"COPY result_staging ({columns}) FROM STDIN WITH (FORMAT csv)", copy_rows(rows))
+
+            self.apply()
+
+            self.curs.execute('COMMIT;')
+        except Exception:
+            self.curs.execute('ROLLBACK;')
+            raise
+
+    def store_each(self, rows: Sequence[ResultRow]) -> int:
+        stored = 0
+
+        for row in rows:
+            # if the ROLLBACK fails too, the connection is gone; the error
+            # stops the writer, and the master starts a new one
+            self.curs.execute('BEGIN;')
+            try:
+                insert_result(self.curs, row)
+                self.curs.execute('COMMIT;')
+            except Exception as exc:
+                self.curs.execute('ROLLBACK;')
+                logger.error('could not store the result for %s in %s/%s from run %s: %s', row.student_id, row.catalog, row.area_code, row.run, exc)
+                continue
+
+            stored += 1
+
+        logger.info('stored %d of %d results one at a time', stored, len(rows))
+        return stored
+
+    def apply(self) -> None:
+        # if an audit found the same result as the active one, only record
+        # that it was re-checked, along with the inputs and timings of the
+        # new audit, so that the row matches its fingerprint. This only applies when the student/area is
+        # audited once in the batch; otherwise, the revisions are numbered
+        # as usual below.
+        self.curs.execute("""
+            WITH unchanged AS (
+                UPDATE result
+                SET ts = s.ts, run = s.run, expires_at = s.expires_at, input_fingerprint = s.input_fingerprint,
+                    input_data = s.input_data, iterations = s.iterations, duration = s.duration,
+                    per_iteration = s.per_iteration, gpa = s.gpa,
+                    student_classification = s.student_classification, student_class = s.student_class,
+                    student_name = s.student_name, student_name_sort = s.student_name_sort
+                FROM result_staging s
+                WHERE NOT s.link_only
+                    AND result.student_id = s.student_id
+                    AND result.catalog = s.catalog
+                    AND result.area_code = s.area_code
+                    AND result.is_active = true
+                    AND result.result_hash = s.result_hash
+                    AND NOT EXISTS (
+                        SELECT 1
+                        FROM result_staging other
+                        WHERE other.student_id = s.student_id
+                            AND other.area_code = s.area_code
+                            AND NOT other.link_only
+                            AND other.seq <> s.seq
+                    )
+                RETURNING s.seq
+            )
+            DELETE FROM result_staging
+            WHERE seq IN (SELECT seq FROM unchanged)
+        """)
+
+        # delete any old copies of these exact results
+        self.curs.execute("""
+            DELETE FROM result
+            USING result_staging s
+            WHERE NOT s.link_only
+                AND result.student_id = s.student_id
+                AND result.catalog = s.catalog
+                AND result.area_code = s.area_code
+                AND result.result_hash = s.result_hash
+        """)
+
+        # deactivate all existing records
+        self.curs.execute("""
+            UPDATE result
+            SET is_active = false
+            FROM (SELECT DISTINCT student_id, area_code FROM result_staging WHERE NOT link_only) s
+            WHERE result.student_id = s.student_id
+                AND result.area_code = s.area_code
+                AND result.is_active = true
+        """)
+
+        # number the new revisions after the existing ones, in the order
+        # that the audits finished, and only activate the newest of each
+        self.curs.execute("""
+            INSERT INTO result (
+                student_id, area_code, catalog, run, input_data, expires_at, link_only,
+                result_version, iterations, duration, per_iteration, rank, max_rank,
+                result, result_hash, input_fingerprint, ok, ts, gpa, claimed_courses, status, is_active, revision,
+                student_classification, student_class, student_name, student_name_sort
+            )
+            SELECT
+                s.student_id, s.area_code, s.catalog, s.run, s.input_data, s.expires_at, s.link_only,
+                s.result_version, s.iterations, s.duration, s.per_iteration, s.rank, s.max_rank,
+                s.result, s.result_hash, s.input_fingerprint, s.ok, s.ts, s.gpa, s.claimed_courses, s.status,
+                NOT s.link_only AND s.seq = max(s.seq) FILTER (WHERE NOT s.link_only) OVER same_area,
+                coalesce(latest.revision, 0) + row_number() OVER (same_area ORDER BY s.seq),
+                s.student_classification, s.student_class, s.student_name, s.student_name_sort
+            FROM result_staging s
+                LEFT JOIN (
+                    SELECT student_id, area_code, max(revision) AS revision
+                    FROM result
+                    WHERE (student_id, area_code) IN (SELECT student_id, area_code FROM result_staging)
+                    GROUP BY student_id, area_code
+                ) latest ON latest.student_id = s.student_id AND latest.area_code = s.area_code
+            WINDOW same_area AS (PARTITION BY s.student_id, s.area_code)
+            ORDER BY s.seq
+        """)
+
+
+def insert_result(curs: 'psycopg2.extensions.cursor', row: ResultRow) -> int:
+    """
+    Stores a single result, with one statement for each step that the
+    batched writer does for the whole batch. Returns the id of the row.
+    """
+    params = attr.asdict(row, recurse=False)
+
+    if not row.link_only:
+        # if nothing has changed since the last audit, only record that it
+        # was checked again, along with the inputs and timings of this audit
+        curs.execute("""
+            UPDATE result
+            SET ts = clock_timestamp(), run = %(run)s, expires_at = %(expires_at)s, input_fingerprint = %(input_fingerprint)s,
+                input_data = %(input_data)s, iterations = %(iterations)s, duration = interval %(duration)s,
+                per_iteration = interval %(per_iteration)s, gpa = %(gpa)s,
+                student_classification = %(student_classification)s, student_class = %(student_class)s,
+                student_name = %(student_name)s, student_name_sort = %(student_name_sort)s
+            WHERE student_id = %(student_id)s
+                AND catalog = %(catalog)s
+                AND area_code = %(area_code)s
+                AND is_active = true
+                AND result_hash = %(result_hash)s
+            RETURNING id
+        """, params)
+
+        unchanged = curs.fetchone()
+        if unchanged is not None:
+            return unchanged[0]
+
+        # delete any old copies of this exact result
+        curs.execute("""
+            DELETE FROM result
+            WHERE student_id = %(student_id)s
+                AND catalog = %(catalog)s
+                AND area_code = %(area_code)s
+                AND result_hash = %(result_hash)s
+        """, params)
+
+        # deactivate all existing records
+        curs.execute("""
+            UPDATE result
+            SET is_active = false
+            WHERE
+                student_id = %(student_id)s
+                AND area_code = %(area_code)s
+                AND is_active = true
+        """, params)
+
+    # we use clock_timestamp() instead of now() here, because
+    # now() is the start time of the transaction, and we instead
+    # want the time when the computation was finished.
+    # see https://stackoverflow.com/a/24169018
+    curs.execute("""
+        INSERT INTO result (
+            student_id,
+            area_code,
+            catalog,
+            run,
+            input_data,
+            expires_at,
+            link_only,
+            result_version,
+            iterations,
+            duration,
+            per_iteration,
+            rank,
+            max_rank,
+            result,
+            result_hash,
+            input_fingerprint,
+            ok,
+            ts,
+            gpa,
+            claimed_courses,
+            status,
+            is_active,
+            revision,
+            student_classification,
+            student_class,
+            student_name,
+            student_name_sort
+        )
+        VALUES (
+            %(student_id)s,
+            %(area_code)s,
+            %(catalog)s,
+            %(run)s,
+            %(input_data)s,
+            %(expires_at)s,
+            %(link_only)s,
+            %(result_version)s,
+            %(iterations)s,
+            interval %(duration)s,
+            interval %(per_iteration)s,
+            %(rank)s,
+            %(max_rank)s,
+            %(result)s::jsonb,
+            %(result_hash)s,
+            %(input_fingerprint)s,
+            %(ok)s,
+            clock_timestamp(),
+            %(gpa)s,
+            %(claimed_courses)s::jsonb,
+            %(status)s,
+            NOT %(link_only)s,
+            coalesce((SELECT max(revision) FROM result WHERE student_id = %(student_id)s AND area_code = %(area_code)s), 0) + 1,
+            %(student_classification)s,
+            %(student_class)s,
+            %(student_name)s,
+            %(student_name_sort)s
+        )
+        RETURNING id
+    """, params)
+
+    result_id: int = curs.fetchone()[0]
+
+    return result_id
+
+
+def writer_wrapper(*, results: 'multiprocessing.Queue', batch_size: int = 50, max_delay: float = 2.0, spool_path: Optional[str] = None) -> None:
+    try:
+        writer(results=results, batch_size=batch_size, max_delay=max_delay, spool_path=spool_path)
+    except KeyboardInterrupt:
+        pass
+
+
+def writer(*, results: 'multiprocessing.Queue', batch_size: int = 50, max_delay: float = 2.0, spool_path: Optional[str] = None) -> None:
+    """
+    Stores the results that the audit workers put on the `results` queue,
+    at least every `max_delay` seconds, until it receives a None.
+
+    If `spool_path` is given, first stores whatever a previous writer left
+    in that spool.
+    """
+    import psycopg2  # type: ignore
+    import psycopg2.extensions  # type: ignore
+
+    logger.info('connect')
+
+    # empty string means "use the environment variables"
+    conn = psycopg2.connect('', application_name='degreepath-writer')
+    conn.set_isolation_level(psycopg2.extensions.ISOLATION_LEVEL_AUTOCOMMIT)
+
+    logger.info('connected')
+
+    spool = ResultSpool(spool_path) if spool_path else None
+
+    with conn.cursor() as curs:
+        result_writer = ResultWriter(curs=curs, batch_size=batch_size, spool=spool)
+
+        if spool is not None:
+            recover(spool, writer=result_writer)
+
+        drain(results, writer=result_writer, max_delay=max_delay)
+
+
+def recover(spool: ResultSpool, *, writer: ResultWriter) -> int:
+    """
+    Stores the rows that a previous writer took off the queue, but died
+    before storing.
+    """
+    rows = spool.recover()
+    if not rows:
+        return 0
+
+    logger.warning('storing %d results left behind by the previous writer', len(rows))
+
+    # they're already in the spool, which is cleared once they're stored
+    writer.pending.extend(rows)
+    return writer.flush()
+
+
+def drain(results: 'multiprocessing.Queue', *, writer: ResultWriter, max_delay: float = 2.0) -> None:
+    oldest: Optional[float] = None
+
+    while True:
+        timeout = max_delay if oldest is None else max(0.0, oldest + max_delay - time.monotonic())
+
+        try:
+            row: Optional[ResultRow] = results.get(timeout=timeout)
+        except queue.Empty:
+            writer.flush()
+            oldest = None
+            continue
+
+        if row is None:
+            writer.flush()
+            return
+
+        if oldest is None:
+            oldest = time.monotonic()
+
+        writer.add(row)
+
+        if not writer.pending:
+            oldest = None
@@ -1,5 +1,5 @@
 import attr
-from typing import Optional, Union, TYPE_CHECKING
+from typing import Optional, Union, FrozenSet, TYPE_CHECKING
 import logging
 
 from ..base import BaseConditionalRule, Solution, Rule
@@ -17,6 +17,16 @@ class ConditionalSolution(Solution, BaseConditionalRule):
     when_true: Union[Rule, Solution]
     when_false: Optional[Union[Rule, Solution]]
 
+    def claimable_clbids(self) -> Optional[FrozenSet[str]]:
+        if self.condition.result is True and isinstance(self.when_true, Solution):
+            return self.when_true.claimable_clbids()
+
+        elif self.condition.result is False and self.when_false and isinstance(self.when_false, Solution):
+            return self.when_false.claimable_clbids()
+
+        else:
+            return frozenset()
+
     def audit(self, *, ctx: 'RequirementContext') -> ConditionalResult:
         logger.debug('auditing conditional rule %s', self.path)
 
@@ -1,10 +1,13 @@
 import attr
-from typing import Tuple, Union, TYPE_CHECKING
+from typing import Dict, Hashable, List, Tuple, Union, Optional, FrozenSet, Set, cast, TYPE_CHECKING
+from decimal import Decimal
 import logging
 
-from ..base.bases import Rule, Solution, Result
+from ..base.bases import Rule, Solution, Result, optimistic_rank_of_item
 from ..base.count import BaseCountRule
 from ..result.count import CountResult
+from ..matching import first_matching
+from .course import CourseSolution
 
 if TYPE_CHECKING:  # pragma: no cover
     from ..context import RequirementContext
@@ -18,8 +21,21 @@ class CountSolution(Solution, BaseCountRule):
     # reason: type narrowing
     items: Tuple[Union[Rule, Solution, Result], ...]
 
+    # the items are course rules, to be assigned courses by matching when
+    # this solution is audited; see audit_by_matching
+    by_matching: bool = False
+    match_all: bool = False
+
     @staticmethod
-    def from_rule(*, rule: 'CountRule', count: int, items: Tuple[Union[Rule, Solution, Result], ...], overridden: bool = False) -> 'CountSolution':
+    def from_rule(
+        *,
+        rule: 'CountRule',
+        count: int,
+        items: Tuple[Union[Rule, Solution, Result], ...],
+        overridden: bool = False,
+        by_matching: bool = False,
+        match_all: bool = False,
+    ) -> 'CountSolution':
         return CountSolution(
             count=count,
             items=items,
@@ -27,8 +43,41 @@ class CountSolution(Solution, BaseCountRule):
             at_most=rule.at_most,
             path=rule.path,
             overridden=overridden,
+            by_matching=by_matching,
+            match_all=match_all,
         )
 
+    def optimistic_rank(self, *, ctx: 'RequirementContext') -> Tuple[Decimal, bool]:
+        if self.overridden:
+            return Decimal(1), True
+
+        if self.by_matching:
+            return self.optimistic_rank_from(item_bounds=[r.optimistic_rank(ctx=ctx) for r in self.items])
+
+        return self.optimistic_rank_from(item_bounds=[optimistic_rank_of_item(r, ctx=ctx) for r in self.items])
+
+    def claimable_clbids(self) -> Optional[FrozenSet[str]]:
+        if self.overridden:
+            return frozenset()
+
+        # the matching depends on the claims on every course that the rules
+        # could match
+        if self.by_matching:
+            return None
+
+        clbids: Set[str] = set()
+        for r in self.items:
+            if not isinstance(r, Solution):
+                continue
+
+            child_clbids = r.claimable_clbids()
+            if child_clbids is None:
+                return None
+
+            clbids.update(child_clbids)
+
+        return frozenset(clbids)
+
     def audit(self, *, ctx: 'RequirementContext') -> CountResult:
         if self.overridden:
             return CountResult.from_solution(
@@ -38,8 +87,76 @@ class CountSolution(Solution, BaseCountRule):
                 overridden=self.overridden,
             )
 
-        results = tuple(r.audit(ctx=ctx) if isinstance(r, Solution) else r for r in self.items)
+        if self.by_matching:
+            return self.audit_by_matching(ctx=ctx)
+
+        results = tuple(ctx.audit_with_cache(r) if isinstance(r, Solution) else r for r in self.items)
         matched_items = tuple(item for sol in results for item in sol.matched())
         audit_results = tuple(a.audit_and_resolve(data=matched_items, ctx=ctx) for a in self.audit_clauses)
 
         return CountResult.from_solution(solution=self, items=results, audit_results=audit_results)
+
+    def audit_by_matching(self, *, ctx: 'RequirementContext') -> CountResult:
+        """
+        Assigns the unclaimed courses to the course rules by bipartite
+        matching, instead of trying each combination of rules and each
+        product of their solutions, and audits the result.
+
+        By default, only completed courses are matched, and only `count` of
+        the rules, which finds the solution that the enumeration would have
+        passed with first. With `match_all`, in-progress courses are matched
+        too, and as many rules as possible, which finds the highest rank.
+
+        If there aren't enough courses to go around, the matched rules are
+        audited before the unmatched ones, so that the unmatched rules report
+        their courses as claimed.
+        """
+
+        options: List[List[CourseSolution]] = []
+        candidates: List[List[Hashable]] = []
+        lookup: List[Dict[Hashable, CourseSolution]] = []
+
+        for rule in self.items:
+            assert isinstance(rule, Rule)
+            rule_options = [cast(CourseSolution, s) for s in rule.solutions(ctx=ctx)]
+            rule_options = [s for s in rule_options if s.overridden or s.matched_course is not None]
+
+            # prefer completed courses, like the audit loop prefers passing results
+            rule_options.sort(key=lambda s: s.matched_course is not None and s.matched_course.is_in_progress)
+
+            keyed: Dict[Hashable, CourseSolution] = {}
+            for s in rule_options:
+                key: Hashable
+                if not self.match_all and s.matched_course is not None and s.matched_course.is_in_progress:
+                    continue
+                elif s.overridden or s.matched_course is None:
+                    key = (rule.path,)
+                elif s.allow_claimed:
+                    # allow_claimed claims aren't recorded, so they don't compete
+                    key = (rule.path, s.matched_course.clbid)
+                elif ctx.has_claim(clbid=s.matched_course.clbid):
+                    continue
+                else:
+                    key = s.matched_course.clbid
+
+                keyed.setdefault(key, s)
+
+            options.append(rule_options)
+            candidates.append(list(keyed.keys()))
+            lookup.append(keyed)
+
+        matching = first_matching(candidates, limit=None if self.match_all else self.count)
+
+        chosen: Dict[int, CourseSolution] = {i: lookup[i][key] for i, key in matching.items()}
+        if len(chosen) < self.count and not self.match_all:
+            for i, rule_options in enumerate(options):
+                if i not in chosen and rule_options:
+                    chosen[i] = rule_options[0]
+
+        audited: Dict[int, Result] = {}
+        for i in sorted(chosen, key=lambda i: (i not in matching, i)):
+            audited[i] = ctx.audit_with_cache(chosen[i])
+
+        results = tuple(audited.get(i, r) for i, r in enumerate(self.items))
+
+        return CountResult.from_solution(solution=self, items=results, audit_results=tuple())
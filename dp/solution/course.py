@@ -1,5 +1,6 @@
 import attr
-from typing import List, Optional, TYPE_CHECKING
+from typing import List, Optional, Tuple, FrozenSet, TYPE_CHECKING
+from decimal import Decimal
 import logging
 
 from ..base import Solution, BaseCourseRule
@@ -64,5 +65,20 @@ class CourseSolution(Solution, BaseCourseRule):
         logger.debug('%r exists, and is available [at %s]', self.matched_course, self.path)
         return CourseResult.from_solution(solution=self, claim_attempt=claim, overridden=False)
 
+    def optimistic_rank(self, *, ctx: 'RequirementContext') -> Tuple[Decimal, bool]:
+        if self.overridden or self.inserted or self.optional:
+            return Decimal(1), True
+
+        if self.matched_course is None:
+            return Decimal(0), False
+
+        return Decimal(1), True
+
+    def claimable_clbids(self) -> Optional[FrozenSet[str]]:
+        if self.overridden or self.matched_course is None:
+            return frozenset()
+
+        return frozenset([self.matched_course.clbid])
+
     def all_courses(self, ctx: 'RequirementContext') -> List['CourseInstance']:
         return list(ctx.find_courses(rule=self, from_claimed=self.from_claimed))
@@ -1,5 +1,5 @@
 import attr
-from typing import Optional, TYPE_CHECKING
+from typing import Optional, FrozenSet, TYPE_CHECKING
 import logging
 
 from ..base import Solution, BaseProficiencyRule
@@ -32,6 +32,12 @@ class ProficiencySolution(Solution, BaseProficiencyRule):
             overridden=True,
         )
 
+    def claimable_clbids(self) -> Optional[FrozenSet[str]]:
+        if self.overridden or not isinstance(self.course, CourseSolution):
+            return frozenset()
+
+        return self.course.claimable_clbids()
+
     def audit(self, *, ctx: 'RequirementContext') -> ProficiencyResult:
         if self.overridden:
             return ProficiencyResult.overridden_from_solution(solution=self)
@@ -1,5 +1,6 @@
 import attr
-from typing import List, Sequence, Tuple, Optional, cast, TYPE_CHECKING
+from typing import List, Sequence, Tuple, Optional, FrozenSet, cast, TYPE_CHECKING
+from decimal import Decimal
 import logging
 
 from ..base import Solution, BaseQueryRule
@@ -114,6 +115,35 @@ class QuerySolution(Solution, BaseQueryRule):
             failed_claims=collected_result.failed_claims,
         )
 
+    def optimistic_rank(self, *, ctx: 'RequirementContext') -> Tuple[Decimal, bool]:
+        if self.overridden:
+            return Decimal(1), True
+
+        # the claimed courses aren't known until the audit happens
+        if self.source is QuerySource.Claimed:
+            return super().optimistic_rank(ctx=ctx)
+
+        # at best, every course in the output will be claimed successfully
+        bounds = [a.optimistic_rank(self.output, ctx=ctx) for a in self.assertions]
+
+        rank = cast(Decimal, sum(r for r, _ in bounds))
+        may_pass = all(p for _, p in bounds)
+
+        return rank, may_pass
+
+    def claimable_clbids(self) -> Optional[FrozenSet[str]]:
+        if self.overridden:
+            return frozenset()
+
+        # a query against the claimed courses depends on every claim
+        if self.source is QuerySource.Claimed:
+            return None
+
+        if self.source is QuerySource.Courses:
+            return frozenset(c.clbid for c in cast(Sequence['CourseInstance'], self.output))
+
+        return frozenset()
+
     def collect_courses(self, ctx: 'RequirementContext') -> AuditResult:
         global debug
         if debug is None:
@@ -166,7 +196,7 @@ class QuerySolution(Solution, BaseQueryRule):
 
         output: List['CourseInstance'] = ctx.all_claimed()
         if self.where:
-            output = [item for item in output if self.where.apply(item)]
+            output = ctx.filter_matching(self.where, output)
 
         if self.excluded_clbids:
             output = [c for c in output if c.clbid not in self.excluded_clbids]
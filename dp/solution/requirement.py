@@ -1,8 +1,9 @@
 import attr
-from typing import Optional, Union, TYPE_CHECKING
+from typing import Optional, Union, Tuple, FrozenSet, TYPE_CHECKING
+from decimal import Decimal
 import logging
 
-from ..base import BaseRequirementRule, Solution, RuleState, Rule
+from ..base import BaseRequirementRule, Solution, RuleState, Rule, optimistic_rank_of_item
 from ..result.requirement import RequirementResult
 
 if TYPE_CHECKING:  # pragma: no cover
@@ -36,6 +37,23 @@ class RequirementSolution(Solution, BaseRequirementRule):
 
         return self.result.state()
 
+    def optimistic_rank(self, *, ctx: 'RequirementContext') -> Tuple[Decimal, bool]:
+        if self.overridden:
+            return Decimal(1), True
+
+        if self.is_audited or self.result is None:
+            return Decimal(0), False
+
+        child_rank, may_pass = optimistic_rank_of_item(self.result, ctx=ctx)
+
+        return child_rank + 1 if may_pass else child_rank, may_pass
+
+    def claimable_clbids(self) -> Optional[FrozenSet[str]]:
+        if self.overridden or not isinstance(self.result, Solution):
+            return frozenset()
+
+        return self.result.claimable_clbids()
+
     def audit(self, *, ctx: 'RequirementContext') -> RequirementResult:
         logger.debug('auditing requirement %s', self.path)
 
@@ -1,54 +1,138 @@
-from typing import Optional, Dict, List, TYPE_CHECKING
+import attr
+from typing import Dict, FrozenSet, List, Optional, Sequence, Set, Tuple, TypeVar, TYPE_CHECKING
 from decimal import Decimal
 import logging
+import enum
 
 from .status import WAIVED_AND_DONE
 
 if TYPE_CHECKING:  # pragma: no cover
-    from .claim import Claim  # noqa: F401
     from .base import Result, Rule  # noqa: F401
     from .context import RequirementContext
 
+    R = TypeVar('R', bound='Rule')
+
 logger = logging.getLogger(__name__)
 
 
-def find_best_solution(*, rule: 'Rule', ctx: 'RequirementContext', merge_claims: bool = False) -> Optional['Result']:
+@attr.s(slots=True, kw_only=True, auto_attribs=True)
+class SearchBound:
+    """
+    Tracks the best rank that the audit loop has seen so far, so that the
+    top-level rule can skip generating solutions which cannot beat it.
+
+    A solution is only skipped if it can neither out-rank the best result
+    nor possibly pass, because the audit loop always takes a passing result.
+    """
+
+    best_rank: Optional[Decimal] = None
+
+    # any rank that is added to the result after the solution is audited,
+    # like the common major requirements
+    extra_rank: Decimal = Decimal(0)
+
+    # the number of solutions (or groups of solutions) that were skipped
+    skipped: int = 0
+
+    def record(self, rank: Decimal) -> None:
+        if self.best_rank is None or rank > self.best_rank:
+            self.best_rank = rank
+
+    def can_improve(self, *, rank: Decimal, may_pass: bool) -> bool:
+        if self.best_rank is None or may_pass:
+            return True
+
+        return rank + self.extra_rank > self.best_rank
+
+
+@enum.unique
+class SolutionOrder(enum.Enum):
+    """
+    The order in which to generate the solutions of a rule.
+
+    "Path" generates them in the order of the specification, which is what
+    the `--print-only` iteration numbers refer to. "Promising" tries the
+    combinations that are most likely to pass first, so that the audit loop
+    can stop at a passing solution sooner. Both generate the same solutions.
+    """
+
+    Path = "path"
+    Promising = "promising"
+
+
+def order_by_coverage(rules: Sequence['R'], *, ctx: 'RequirementContext') -> Tuple['R', ...]:
+    """
+    Orders the rules greedily, so that each rule matches the most items that
+    none of the rules before it match. Ties keep their original order.
+
+    Because `itertools.combinations` walks its input in order, the first
+    combination of any size is then the one that covers the most items, and
+    so has the least contention for claims between its children.
+    """
+
+    remaining: List['R'] = list(rules)
+    matches: Dict['R', Set] = {r: set(r.all_matches(ctx=ctx)) for r in remaining}
+
+    covered: Set = set()
+    ordered: List['R'] = []
+
+    while remaining:
+        best_i = max(range(len(remaining)), key=lambda i: (len(matches[remaining[i]] - covered), -i))
+        best = remaining.pop(best_i)
+        covered |= matches[best]
+        ordered.append(best)
+
+    return tuple(ordered)
+
+
+def find_best_solution(
+    *,
+    rule: 'Rule',
+    ctx: 'RequirementContext',
+    merge_claims: bool = False,
+    uncontested_paths: FrozenSet[Tuple[str, ...]] = frozenset(),
+) -> Optional['Result']:
     logger.debug('solving rule: start; at %s', rule.path)
 
     best_result: Optional['Result'] = None
     best_result_index: Optional[int] = None
     best_rank: Decimal = Decimal(0)
 
-    claims: Dict[str, List['Claim']] = dict()
+    # Each solution is audited against its own set of claims; we roll back
+    # to the empty checkpoint between solutions instead of making a new
+    # context for each one.
+    inner_ctx = ctx.with_empty_claims()
+    if uncontested_paths:
+        inner_ctx.uncontested_paths = inner_ctx.uncontested_paths | uncontested_paths
+    checkpoint = inner_ctx.checkpoint()
+
+    for this_index, s in enumerate(rule.solutions(ctx=inner_ctx)):
+        inner_ctx.rollback(checkpoint)
+
+        this_result = s.audit(ctx=inner_ctx)
+        this_rank, _this_max_rank = this_result.rank()
+        this_status = this_result.status()
+
+        if best_result is None:
+            best_result = this_result
+            best_rank = this_rank
+            best_result_index = this_index
+
+        if this_rank > best_rank:
+            best_result = this_result
+            best_rank = this_rank
+            best_result_index = this_index
+
+        if this_status in WAIVED_AND_DONE:
+            best_result = this_result
+            best_rank = this_rank
+            best_result_index = this_index
+            break
+
     if merge_claims:
-        claims = ctx.claims
-
-    with ctx.fresh_claims():
-        for this_index, s in enumerate(rule.solutions(ctx=ctx)):
-            inner_ctx = ctx.with_empty_claims()
-
-            this_result = s.audit(ctx=inner_ctx)
-            this_rank, _this_max_rank = this_result.rank()
-            this_status = this_result.status()
-
-            if best_result is None:
-                best_result = this_result
-                best_rank = this_rank
-                best_result_index = this_index
-
-            if this_rank > best_rank:
-                best_result = this_result
-                best_rank = this_rank
-                best_result_index = this_index
-
-            if this_status in WAIVED_AND_DONE:
-                best_result = this_result
-                best_rank = this_rank
-                best_result_index = this_index
-                break
-
-    if merge_claims and inner_ctx:
-        ctx.set_claims({**claims, **inner_ctx.claims})
+        for claims in inner_ctx.claims.values():
+            for claim in claims:
+                ctx.record_claim(claim)
 
     logger.debug('solving rule: done; at %s solved: rank %s, iteration %s', rule.path, best_rank, best_result_index)
 
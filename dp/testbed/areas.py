@@ -7,6 +7,8 @@ import os
 import yaml
 import tqdm  # type: ignore
 
+from dp.area_index import AreaIndex
+
 from .sqlite import sqlite_connect, sqlite_cursor, sqlite_transaction, Connection
 
 
@@ -14,11 +16,15 @@ def load_areas(args: argparse.Namespace, areas_to_load: Sequence[Dict]) -> Dict[
     root_env = os.getenv('AREA_ROOT')
     assert root_env
     area_root = pathlib.Path(root_env)
+    area_index = AreaIndex.build(area_root)
 
     with sqlite_connect(args.db) as conn, sqlite_transaction(conn):
         print(f'loading {len(areas_to_load):,} areas...')
         area_specs = {}
         for record in tqdm.tqdm(areas_to_load):
+            if not area_index.has(catalog=record['catalog'], code=record['code']):
+                continue
+
             specinfo = load_area(conn, area_root, record['catalog'], record['code'])
 
             if specinfo is None:
@@ -0,0 +1,49 @@
+from dp.area_index import AreaIndex
+from dp.run import find_area
+
+
+def make_areas(root, layout):
+    for catalog, codes in layout.items():
+        (root / catalog).mkdir(exist_ok=True)
+        for code in codes:
+            (root / catalog / f"{code}.yaml").write_text("result: {course: AAA 101}\n")
+
+
+def test_area_index_matches_glob(tmp_path):
+    make_areas(tmp_path, {
+        "2017-18": ["100", "200"],
+        "2019-20": ["100"],
+        "2021-22": ["100", "300"],
+    })
+
+    index = AreaIndex.build(tmp_path)
+
+    for catalog in range(2015, 2024):
+        for code in ("100", "200", "300", "400"):
+            expected = find_area(root=tmp_path, area_catalog=catalog, area_code=code)
+            assert find_area(root=tmp_path, area_catalog=catalog, area_code=code, index=index) == expected
+
+    assert index.has(catalog="2019-20", code="100") is True
+    assert index.has(catalog="2019-20", code="200") is False
+
+
+def test_area_index_refreshes(tmp_path):
+    make_areas(tmp_path, {"2017-18": ["100"]})
+
+    index = AreaIndex.build(tmp_path, max_age=0)
+    assert index.find(area_catalog=2019, area_code="200") is None
+
+    make_areas(tmp_path, {"2018-19": ["200"]})
+    assert index.find(area_catalog=2019, area_code="200") == tmp_path / "2018-19" / "200.yaml"
+
+
+def test_area_index_files(tmp_path):
+    make_areas(tmp_path, {
+        "2017-18": ["100", "200"],
+        "2019-20": ["100"],
+    })
+
+    index = AreaIndex.build(tmp_path)
+
+    assert sorted(f.relative_to(tmp_path).as_posix() for f in index.files()) == ["2017-18/100.yaml", "2017-18/200.yaml", "2019-20/100.yaml"]
+    assert [f.relative_to(tmp_path).as_posix() for f in index.files(since="2018-19")] == ["2019-20/100.yaml"]
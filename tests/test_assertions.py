@@ -4,6 +4,7 @@ from dp.context import RequirementContext
 from dp.data.clausable import Clausable, ClausableIdentifier
 from dp.predicate_clause import Predicate
 from dp.constants import Constants
+from dp.data.course import course_from_str
 import logging
 import pytest
 
@@ -135,3 +136,28 @@ def test_ranges_lte(caplog):
     x = Assertion.load({"assert": {"count(courses)": {"$lte": 5}}}, c=c, ctx=ctx, data_type=DataType.Course, path=['$'])
     result = x.input_size_range(maximum=7)
     assert list(result) == [0, 1, 2, 3, 4, 5]
+
+
+def test_course_clause_cache(caplog):
+    caplog.set_level(logging.DEBUG)
+
+    c = Constants(matriculation_year=2000)
+    transcript = [course_from_str("CSCI 121", clbid="0"), course_from_str("ASIAN 121", clbid="1")]
+    ctx = RequirementContext().with_transcript(transcript)
+
+    x = Assertion.load({"assert": {"count(subjects)": {"$gte": 2}}}, c=c, ctx=ctx, data_type=DataType.Course, path=['$'])
+
+    first = x.audit_and_resolve(tuple(transcript), ctx=ctx)
+    assert first.ok() is True
+    assert len(ctx.clause_cache) == 1
+
+    # the same courses are only aggregated once
+    second = x.audit_and_resolve(tuple(transcript), ctx=ctx)
+    assert second == first
+    assert len(ctx.clause_cache) == 1
+
+    # but order matters, because it changes which courses are reported
+    x.audit_and_resolve(tuple(reversed(transcript)), ctx=ctx)
+    assert len(ctx.clause_cache) == 2
+
+    assert len(ctx.with_transcript(transcript).clause_cache) == 0
@@ -0,0 +1,69 @@
+from dp.data.course import course_from_str
+from dp.area import AreaOfStudy
+from dp.constants import Constants
+from dp.context import RequirementContext
+from dp.solution.query import QuerySolution
+
+c = Constants(matriculation_year=2000)
+
+
+def load_query_solution(ctx: RequirementContext) -> QuerySolution:
+    area = AreaOfStudy.load(c=c, specification={
+        "result": {
+            "from": "courses",
+            "where": {"subject": {"$eq": "DEPT"}},
+            "assert": {"count(courses)": {"$gte": 2}},
+        },
+    })
+
+    solution = next(area.result.solutions(ctx=ctx))
+    assert isinstance(solution, QuerySolution)
+
+    return solution
+
+
+def test_audit_cache_reuses_results_and_claims() -> None:
+    transcript = [course_from_str("DEPT 101", clbid="0"), course_from_str("DEPT 102", clbid="1")]
+    ctx = RequirementContext().with_transcript(transcript)
+    solution = load_query_solution(ctx)
+
+    assert solution.claimable_clbids() == frozenset(["0", "1"])
+
+    first = ctx.audit_with_cache(solution)
+    assert first.is_ok() is True
+    first_claims = {clbid: [cl.claimed_by for cl in claims] for clbid, claims in ctx.claims.items()}
+
+    fresh_ctx = ctx.with_empty_claims()
+    second = fresh_ctx.audit_with_cache(solution)
+    second_claims = {clbid: [cl.claimed_by for cl in claims] for clbid, claims in fresh_ctx.claims.items()}
+
+    assert second is first
+    assert second_claims == first_claims
+
+
+def test_audit_cache_respects_prior_claims() -> None:
+    transcript = [course_from_str("DEPT 101", clbid="0"), course_from_str("DEPT 102", clbid="1")]
+    ctx = RequirementContext().with_transcript(transcript)
+    solution = load_query_solution(ctx)
+
+    first = ctx.audit_with_cache(solution)
+    assert first.is_ok() is True
+
+    conflicted_ctx = ctx.with_empty_claims()
+    conflicted_ctx.make_claim(course=transcript[0], path=('$', 'other'))
+
+    second = conflicted_ctx.audit_with_cache(solution)
+
+    assert second is not first
+    assert second.is_ok() is False
+
+
+def test_audit_cache_is_reset_per_transcript() -> None:
+    transcript = [course_from_str("DEPT 101", clbid="0"), course_from_str("DEPT 102", clbid="1")]
+    ctx = RequirementContext().with_transcript(transcript)
+    solution = load_query_solution(ctx)
+
+    ctx.audit_with_cache(solution)
+    assert len(ctx.audit_cache) == 1
+    assert len(ctx.with_empty_claims().audit_cache) == 1
+    assert len(ctx.with_transcript(transcript).audit_cache) == 0
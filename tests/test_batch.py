@@ -0,0 +1,101 @@
+from typing import List
+from http.server import BaseHTTPRequestHandler, HTTPServer
+import threading
+import json
+
+import pytest
+
+from dp.server.batch import QueueRow, queue_students, student_rows, get_student, make_http
+
+
+def make_student(stnum: str) -> dict:
+    return {
+        'stnum': stnum,
+        'catalog': '2019',
+        'areas': [{'code': '140', 'kind': 'major'}, {'code': '150', 'kind': 'major'}],
+    }
+
+
+def test_student_rows_skips_queued_and_blocked_audits():
+    student = make_student('1')
+    unparsed = json.dumps(student)
+
+    rows = student_rows(student=student, unparsed_json=unparsed, queued_items=set(), blocked_items=set())
+    assert sorted(r.area_code for r in rows) == ['140', '150']
+    assert all(r.area_catalog == '2019-20' and r.input_data == unparsed for r in rows)
+
+    rows = student_rows(student=student, unparsed_json=unparsed, queued_items={('1', '140')}, blocked_items=set())
+    assert [r.area_code for r in rows] == ['150']
+
+    rows = student_rows(student=student, unparsed_json=unparsed, queued_items=set(), blocked_items={('1', '150')})
+    assert [r.area_code for r in rows] == ['140']
+
+    rows = student_rows(student=student, unparsed_json=unparsed, queued_items=set(), blocked_items=set(), area_code_filter='150')
+    assert [r.area_code for r in rows] == ['150']
+
+
+def test_queue_students_stores_in_batches():
+    def fetch(student_id: str) -> List[QueueRow]:
+        if student_id == 'bad':
+            raise ValueError('no such student')
+        return [QueueRow(student_id=student_id, area_catalog='2019-20', area_code=code, input_data='{}') for code in ['140', '150']]
+
+    stored: List[List[QueueRow]] = []
+    student_ids = [str(i) for i in range(5)] + ['bad']
+
+    total, failed = queue_students(student_ids, fetch=fetch, store=lambda rows: stored.append(list(rows)), concurrency=3, batch_size=4)
+
+    assert total == 10
+    assert failed == ['bad']
+    assert [len(batch) for batch in stored] == [4, 4, 2]
+    assert sorted(r.student_id for batch in stored for r in batch) == sorted([str(i) for i in range(5)] * 2)
+
+
+@pytest.fixture
+def student_server():
+    requests: List[str] = []
+
+    class Handler(BaseHTTPRequestHandler):
+        def do_GET(self) -> None:
+            requests.append(self.path)
+
+            # fail the first request, to exercise the retries
+            if len(requests) == 1:
+                self.send_response(503)
+                self.send_header('Content-Length', '0')
+                self.end_headers()
+                return
+
+            body = json.dumps(make_student('1')).encode('utf-8')
+            self.send_response(200)
+            self.send_header('Content-Type', 'application/json')
+            self.send_header('Content-Length', str(len(body)))
+            self.end_headers()
+            self.wfile.write(body)
+
+        def log_message(self, *args: object) -> None:
+            pass
+
+    server = HTTPServer(('127.0.0.1', 0), Handler)
+    thread = threading.Thread(target=server.serve_forever, daemon=True)
+    thread.start()
+
+    try:
+        yield f'http://127.0.0.1:{server.server_port}/student', requests
+    finally:
+        server.shutdown()
+        server.server_close()
+
+
+def test_get_student_retries(student_server):
+    pytest.importorskip('urllib3')
+
+    url, requests = student_server
+    http = make_http(concurrency=2, retries=3, backoff=0)
+
+    student, text = get_student(http, '1', url=url)
+
+    assert student['stnum'] == '1'
+    assert json.loads(text) == student
+    assert len(requests) == 2
+    assert requests[-1] == '/student?stnum=1'
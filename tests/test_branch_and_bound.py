@@ -0,0 +1,157 @@
+from dp.data.student import Student
+from dp.data.course import course_from_str
+from dp.area import AreaOfStudy
+from dp.audit import audit, Arguments, ResultMsg
+from dp.constants import Constants
+from dp.context import RequirementContext
+from dp.solve import SearchBound
+from decimal import Decimal
+
+c = Constants(matriculation_year=2000)
+
+
+def overlapping_area() -> AreaOfStudy:
+    # both requirements want the same courses, so they can't be solved independently
+    query = {
+        "from": "courses",
+        "where": {"level": {"$eq": 100}},
+        "assert": {"count(subjects)": {"$gte": 3}},
+    }
+
+    return AreaOfStudy.load(c=c, specification={
+        "result": {"all": [
+            {"requirement": "A"},
+            {"requirement": "B"},
+        ]},
+        "requirements": {
+            "A": {"result": query},
+            "B": {"result": query},
+        },
+    })
+
+
+def run_audit(area: AreaOfStudy, student: Student, *, prune: bool) -> ResultMsg:
+    messages = [msg for msg in audit(area=area, student=student, args=Arguments(prune=prune)) if isinstance(msg, ResultMsg)]
+    assert len(messages) == 1
+    return messages[0]
+
+
+def test_pruning_keeps_the_best_result() -> None:
+    area = overlapping_area()
+    transcript = [course_from_str(f"{subject} 101", clbid=subject) for subject in ("AAA", "BBB", "CCC", "DDD")]
+    student = Student.load(dict(courses=transcript))
+
+    pruned = run_audit(area, student, prune=True)
+    exhaustive = run_audit(area, student, prune=False)
+
+    assert pruned.result.is_ok() is False
+    assert pruned.result.rank() == exhaustive.result.rank()
+    assert pruned.result.status() == exhaustive.result.status()
+    assert pruned.result.to_dict() == exhaustive.result.to_dict()
+    assert pruned.total_iters < exhaustive.total_iters
+
+
+def test_pruning_keeps_passing_results() -> None:
+    area = overlapping_area()
+    transcript = [course_from_str(f"{subject} 101", clbid=subject) for subject in ("AAA", "BBB", "CCC", "DDD", "EEE", "FFF")]
+    student = Student.load(dict(courses=transcript))
+
+    pruned = run_audit(area, student, prune=True)
+    exhaustive = run_audit(area, student, prune=False)
+
+    assert pruned.result.is_ok() is True
+    assert pruned.result.to_dict() == exhaustive.result.to_dict()
+
+
+def test_search_bound() -> None:
+    bound = SearchBound()
+    assert bound.can_improve(rank=Decimal(0), may_pass=False) is True
+
+    bound.record(Decimal(3))
+    bound.record(Decimal(2))
+    assert bound.best_rank == Decimal(3)
+
+    assert bound.can_improve(rank=Decimal(3), may_pass=False) is False
+    assert bound.can_improve(rank=Decimal(3), may_pass=True) is True
+    assert bound.can_improve(rank=Decimal('3.5'), may_pass=False) is True
+
+    bound.extra_rank = Decimal(1)
+    assert bound.can_improve(rank=Decimal(3), may_pass=False) is True
+
+
+def test_optimistic_rank_of_rules() -> None:
+    area = overlapping_area()
+    transcript = [course_from_str(f"{subject} 101", clbid=subject) for subject in ("AAA", "BBB")]
+    ctx = RequirementContext().with_transcript(transcript)
+
+    # two requirements, each with one assertion, and each with a boost
+    rank, may_pass = area.result.optimistic_rank(ctx=ctx)
+    assert rank == Decimal(4)
+    assert may_pass is True
+
+    # with only two subjects, no solution of "A" can pass
+    req_a = area.result.items[0]
+    for solution in req_a.solutions(ctx=ctx):
+        rank, may_pass = solution.optimistic_rank(ctx=ctx)
+        assert may_pass is False
+        assert rank < Decimal(2)
+
+
+def test_iteration_budget_returns_the_best_result_so_far() -> None:
+    area = overlapping_area()
+    transcript = [course_from_str(f"{subject} 101", clbid=subject) for subject in ("AAA", "BBB", "CCC", "DDD")]
+    student = Student.load(dict(courses=transcript))
+
+    args = Arguments(prune=False, max_iterations=2)
+    messages = [msg for msg in audit(area=area, student=student, args=args) if isinstance(msg, ResultMsg)]
+    assert len(messages) == 1
+
+    truncated = messages[0]
+    assert truncated.truncated is True
+    assert truncated.total_iters == 2
+    assert truncated.result.is_ok() is False
+
+    exhaustive = run_audit(area, student, prune=False)
+    assert exhaustive.truncated is False
+    assert exhaustive.total_iters > 2
+
+
+def test_budgets_do_not_flag_passing_results() -> None:
+    area = overlapping_area()
+    transcript = [course_from_str(f"{subject} 101", clbid=subject) for subject in ("AAA", "BBB", "CCC", "DDD", "EEE", "FFF")]
+    student = Student.load(dict(courses=transcript))
+
+    args = Arguments(max_iterations=10_000, time_limit=60.0)
+    messages = [msg for msg in audit(area=area, student=student, args=args) if isinstance(msg, ResultMsg)]
+    assert len(messages) == 1
+    assert messages[0].truncated is False
+    assert messages[0].result.is_ok() is True
+
+
+def test_pruning_audits_every_limited_transcript() -> None:
+    # the limit splits the transcript into one with BBB 301 and one with
+    # BBB 101; pruning the first must not stop the second from being audited
+    area = AreaOfStudy.load(c=c, specification={
+        "limit": [{"at_most": 1, "where": {"subject": {"$eq": "BBB"}}}],
+        "result": {"all": [{"requirement": "A"}, {"requirement": "B"}, {"requirement": "C"}, {"requirement": "D"}]},
+        "requirements": {
+            "A": {"result": {"course": "AAA 301"}},
+            "B": {"result": {"from": "courses", "where": {"level": {"$eq": 300}}, "assert": {"count(courses)": {"$gte": 1}}}},
+            "C": {"result": {"course": "AAA 201"}},
+            "D": {"result": {"from": "courses", "where": {"subject": {"$eq": "BBB"}}, "assert": {"count(courses)": {"$gte": 1}}}},
+        },
+    })
+
+    transcript = [
+        course_from_str("BBB 301", clbid="0"),
+        course_from_str("BBB 101", clbid="1"),
+        course_from_str("AAA 301", clbid="2"),
+        course_from_str("AAA 301", clbid="3"),
+    ]
+    student = Student.load(dict(courses=transcript))
+
+    pruned = run_audit(area, student, prune=True)
+    exhaustive = run_audit(area, student, prune=False)
+
+    assert pruned.result.rank() == exhaustive.result.rank()
+    assert pruned.result.status() == exhaustive.result.status()
@@ -0,0 +1,88 @@
+from dp.context import RequirementContext
+from dp.data.course import course_from_str
+
+
+def test_rollback_undoes_claims_after_checkpoint() -> None:
+    course_a = course_from_str('DEPT 101', clbid='0')
+    course_b = course_from_str('DEPT 102', clbid='1')
+
+    ctx = RequirementContext(multicountable={'DEPT 101': [('%A',), ('%B',)]}).with_transcript([course_a, course_b])
+
+    ctx.make_claim(course=course_a, path=('$', '%A'))
+    checkpoint = ctx.checkpoint()
+
+    ctx.make_claim(course=course_b, path=('$', '%A'))
+    ctx.make_claim(course=course_a, path=('$', '%B'))
+    assert len(ctx.claims['0']) == 2
+    assert ctx.has_claim(clbid='1') is True
+
+    ctx.rollback(checkpoint)
+
+    assert [c.claimed_by for c in ctx.claims['0']] == [('$', '%A')]
+    assert '1' not in ctx.claims
+    assert ctx.all_claimed() == [course_a]
+
+    ctx.rollback(0)
+    assert ctx.all_claimed() == []
+    assert ctx.checkpoint() == 0
+
+
+def test_failed_and_unrecorded_claims_are_not_logged() -> None:
+    course = course_from_str('DEPT 101', clbid='0')
+    ctx = RequirementContext().with_transcript([course])
+
+    ctx.make_claim(course=course, path=('$', '%A'))
+    assert ctx.make_claim(course=course, path=('$', '%B')).failed is True
+    assert ctx.make_claim(course=course, path=('$', '%C'), allow_claimed=True).failed is False
+
+    assert ctx.checkpoint() == 1
+
+
+def test_with_empty_claims_starts_a_new_log() -> None:
+    course = course_from_str('DEPT 101', clbid='0')
+    ctx = RequirementContext().with_transcript([course])
+    ctx.make_claim(course=course, path=('$', '%A'))
+
+    fresh = ctx.with_empty_claims()
+    assert fresh.checkpoint() == 0
+
+    fresh.make_claim(course=course, path=('$', '%A'))
+    assert ctx.checkpoint() == 1
+
+
+def test_claimed_mask_tracks_claimed_courses() -> None:
+    course_a = course_from_str('DEPT 101', clbid='0')
+    course_b = course_from_str('DEPT 102', clbid='1')
+    ctx = RequirementContext().with_transcript([course_a, course_b])
+
+    mask_a = ctx.clbid_mask(['0'])
+    mask_b = ctx.clbid_mask(['1'])
+    assert mask_a & mask_b == 0
+    assert ctx.claimed_mask == 0
+
+    checkpoint = ctx.checkpoint()
+    ctx.make_claim(course=course_a, path=('$', '%A'))
+
+    assert ctx.claimed_mask == mask_a
+    assert ctx.has_claim(clbid='0') is True
+    assert ctx.has_claim(clbid='1') is False
+
+    ctx.rollback(checkpoint)
+    assert ctx.claimed_mask == 0
+    assert ctx.has_claim(clbid='0') is False
+
+
+def test_claimed_mask_covers_courses_outside_the_transcript() -> None:
+    course = course_from_str('DEPT 101', clbid='0')
+    ctx = RequirementContext()
+
+    assert ctx.clbid_mask(['0']) == 0
+
+    ctx.make_claim(course=course, path=('$', '%A'))
+    assert ctx.has_claim(clbid='0') is True
+    assert ctx.make_claim(course=course, path=('$', '%B')).failed is True
+
+    # the claims carry over into the new transcript's bitmask
+    limited = ctx.with_transcript([course_from_str('DEPT 102', clbid='1')])
+    assert limited.has_claim(clbid='0') is True
+    assert limited.has_claim(clbid='1') is False
@@ -0,0 +1,73 @@
+from dp.area import AreaOfStudy
+from dp.data.student import Student
+from dp.data.course import course_from_str
+from dp.constants import Constants
+from dp.limit import LimitSet
+from dp.context import RequirementContext
+from dp.ncr import count_subsets_reaching, count_subsets_within, count_minimal_subsets_reaching, iterate_minimal_subsets_reaching
+from decimal import Decimal
+import itertools
+
+c = Constants(matriculation_year=2000)
+
+
+def test_subset_counting():
+    values = [Decimal('1'), Decimal('0.5'), Decimal('0.25'), Decimal('1'), Decimal('0')]
+    subsets = [combo for n in range(0, len(values) + 1) for combo in itertools.combinations(values, n)]
+
+    for target in [Decimal(0), Decimal('0.25'), Decimal(1), Decimal('1.5'), Decimal(3), Decimal(5)]:
+        assert count_subsets_reaching(values, target) == sum(1 for s in subsets if s and sum(s) >= target)
+        assert count_subsets_within(values, target) == sum(1 for s in subsets if sum(s) <= target)
+
+
+def test_minimal_subsets():
+    values = [Decimal('1'), Decimal('0.5'), Decimal('0.25'), Decimal('1'), Decimal('0')]
+    subsets = [combo for n in range(1, len(values) + 1) for combo in itertools.combinations(range(len(values)), n)]
+
+    for target in [Decimal('0.25'), Decimal(1), Decimal('1.5'), Decimal(2), Decimal('2.75'), Decimal(3)]:
+        expected = [
+            s for s in subsets
+            if sum(values[i] for i in s) >= target
+            and all(sum(values[i] for i in s if i != j) < target for j in s)
+        ]
+
+        assert list(iterate_minimal_subsets_reaching(values, target)) == expected
+        assert count_minimal_subsets_reaching(values, target) == len(expected)
+
+
+def test_estimate_sum_of_credits_is_exact():
+    area = AreaOfStudy.load(c=c, specification={
+        "result": {
+            "from": "courses",
+            "assert": {"sum(credits)": {"$gte": 2}},
+        },
+    })
+
+    transcript = [
+        course_from_str("AAA 101", clbid="0"),
+        course_from_str("BBB 101", clbid="1", credits='0.5'),
+        course_from_str("CCC 101", clbid="2", credits='0.25'),
+        course_from_str("DDD 101", clbid="3"),
+    ]
+    student = Student.load(dict(courses=transcript))
+
+    solutions = list(area.solutions(student=student, exceptions=[]))
+    assert area.estimate(student=student, exceptions=[]) == len(solutions)
+
+
+def test_estimate_limits_is_exact():
+    limits = LimitSet.load([
+        {"at_most": 1, "where": {"subject": {"$eq": "AAA"}}},
+        {"at_most": '1.5 credits', "where": {"subject": {"$eq": "BBB"}}},
+    ], c=c, ctx=RequirementContext())
+
+    transcript = [
+        course_from_str("AAA 101", clbid="0"),
+        course_from_str("AAA 102", clbid="1"),
+        course_from_str("BBB 101", clbid="2"),
+        course_from_str("BBB 102", clbid="3", credits='0.5'),
+        course_from_str("BBB 103", clbid="4", credits='0.5'),
+        course_from_str("CCC 101", clbid="5"),
+    ]
+
+    assert limits.estimate(transcript) == len(list(limits.limited_transcripts(transcript)))
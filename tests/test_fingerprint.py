@@ -0,0 +1,94 @@
+from typing import Any, Dict, List, Optional, Tuple
+import re
+
+from dp.server.fingerprint import input_fingerprint, reuse_result, auditor_version, area_digest
+from dp.server.writer import student_columns
+
+
+class FakeCursor:
+    def __init__(self, row: Optional[Tuple[int]]) -> None:
+        self.row = row
+        self.statements: List[str] = []
+        self.params: List[Any] = []
+
+    def execute(self, statement: str, params: Any = None) -> None:
+        self.statements.append(statement)
+        self.params.append(params)
+
+    def fetchone(self) -> Optional[Tuple[int]]:
+        return self.row
+
+
+def fingerprint(**kwargs: Any) -> str:
+    inputs = dict(
+        student={'stnum': '100', 'courses': [{'clbid': '1', 'course': 'DEPT 101'}], 'exceptions': []},
+        area_catalog='2019-20',
+        area_code='140',
+        area_digest='abc',
+        time_limit=None,
+        version='1',
+    )
+    inputs.update(kwargs)
+    return input_fingerprint(**inputs)
+
+
+def test_fingerprint_changes_with_each_input():
+    base = fingerprint()
+
+    assert base == fingerprint()
+    assert base != fingerprint(student={'stnum': '100', 'courses': [], 'exceptions': []})
+    assert base != fingerprint(student={'stnum': '100', 'courses': [{'clbid': '1', 'course': 'DEPT 101'}], 'exceptions': [{'area_code': '140'}]})
+    assert base != fingerprint(area_catalog='2020-21')
+    assert base != fingerprint(area_digest='abd')
+    assert base != fingerprint(time_limit=30.0)
+    assert base != fingerprint(version='2')
+
+
+def test_auditor_version_is_stable():
+    assert auditor_version() == auditor_version()
+    assert len(auditor_version()) == 64
+
+
+def test_area_digest(tmp_path):
+    area_file = tmp_path / '140.yaml'
+    area_file.write_text('name: Area\n')
+    first = area_digest(area_file)
+
+    area_file.write_text('name: Other Area\n')
+    assert area_digest(area_file) != first
+
+    assert area_digest(tmp_path / 'missing.yaml') == ''
+
+
+STUDENT = {'stnum': '100', 'classification': 'SR', 'class': '2020', 'name': 'Student, A', 'name_sort': 'student a', 'courses': []}
+
+
+def test_reuse_result():
+    curs = FakeCursor(row=(12,))
+    reused = reuse_result(curs, fingerprint='f', student=STUDENT, student_id='100', area_catalog='2019-20', area_code='140', run_id=5, expires_at=None)
+
+    assert reused == 12
+    assert curs.params[0]['run'] == 5
+    assert curs.params[0]['fingerprint'] == 'f'
+
+    curs = FakeCursor(row=None)
+    assert reuse_result(curs, fingerprint='f', student=STUDENT, student_id='100', area_catalog='2019-20', area_code='140', run_id=5, expires_at=None) is None
+
+
+def test_reused_results_only_differ_by_run():
+    def fresh_row(run: int) -> Dict[str, Any]:
+        return dict(run=run, expires_at=None, input_fingerprint='f', **student_columns(STUDENT))
+
+    # an older row, whose student columns were stored from a differently-
+    # formatted copy of the same data
+    stored = dict(fresh_row(run=4), input_data='{"stnum":"100"}', student_name=None)
+
+    curs = FakeCursor(row=(12,))
+    reuse_result(curs, fingerprint='f', student=STUDENT, student_id='100', area_catalog='2019-20', area_code='140', run_id=5, expires_at=None)
+
+    # apply the update's assignments to the stored row
+    assignments = re.findall(r'(\w+) = %\((\w+)\)s', curs.statements[0].split('WHERE')[0])
+    stored.update({column: curs.params[0][key] for column, key in assignments})
+
+    fresh = fresh_row(run=4)
+    assert {k for k in fresh if stored[k] != fresh[k]} == {'run'}
@@ -2,6 +2,7 @@ from dp.area import AreaOfStudy
 from dp.data.student import Student
 from dp.data.course import course_from_str
 from dp.constants import Constants
+import dp.rule.query
 import pytest
 import io
 import yaml
@@ -47,8 +48,10 @@ def __get_data(spec):
     return (area, transcript)
 
 
-def test_solution_count_exact(caplog):
+def test_solution_count_exact(caplog, monkeypatch):
     caplog.set_level(logging.DEBUG, logger='dp.rule.given.rule')
+    # nothing else wants these courses, so they would be collapsed into one combination per size
+    monkeypatch.setattr(dp.rule.query, 'COLLAPSE_UNCONTESTED', False)
 
     area, transcript = __get_data("""
         result:
@@ -90,8 +93,10 @@ def test_solution_count_lessthan(caplog):
         """)
 
 
-def test_solution_count_greaterthan_1(caplog):
+def test_solution_count_greaterthan_1(caplog, monkeypatch):
     caplog.set_level(logging.DEBUG, logger='dp.rule.given.rule')
+    # nothing else wants these courses, so they would be collapsed into one combination per size
+    monkeypatch.setattr(dp.rule.query, 'COLLAPSE_UNCONTESTED', False)
     area, transcript = __get_data("""
         result:
             from: courses
@@ -2,6 +2,7 @@ from dp.area import AreaOfStudy
 from dp.data.student import Student
 from dp.data.course import course_from_str
 from dp.constants import Constants
+import dp.rule.query
 import pytest  # type: ignore
 import io
 import yaml
@@ -10,8 +11,10 @@ import logging
 c = Constants(matriculation_year=2000)
 
 
-def test_global_limits(caplog):
+def test_global_limits(caplog, monkeypatch):
     caplog.set_level(logging.DEBUG)
+    # nothing else wants these courses, so they would be collapsed into one combination per size
+    monkeypatch.setattr(dp.rule.query, 'COLLAPSE_UNCONTESTED', False)
 
     test_data = io.StringIO("""
         limit:
@@ -34,3 +34,28 @@ def test_equivalence():
     assert check_equivalence(range_func(2), range_func(3), repeat=2)
     assert check_equivalence(range_func(3), range_func(2, 7), repeat=0)
     assert check_equivalence(range_func(3), range_func(2, 7), repeat=4)
+
+
+def test_equivalence_with_a_small_cache():
+    expected = list(itertools.product(range(2), range(3), range(4)))
+    assert list(lazy_product(range_func(2), range_func(3), range_func(4), cache_limit=0)) == expected
+    assert list(lazy_product(range_func(2), range_func(3), range_func(4), cache_limit=3)) == expected
+    assert check_equivalence(range_func(2), range_func(0), range_func(4))
+
+
+def test_factors_are_only_generated_once():
+    calls = []
+
+    def factor(n):
+        def func():
+            calls.append(n)
+            return range(n)
+        return func
+
+    assert len(list(lazy_product(factor(2), factor(3), factor(4)))) == 24
+    assert calls == [2, 3, 4]
+
+    calls.clear()
+    assert len(list(lazy_product(factor(2), factor(3), factor(4), cache_limit=3))) == 24
+    assert calls == [2, 3, 4, 4, 4, 4, 4, 4]
+
@@ -2,6 +2,7 @@ from dp.area import AreaOfStudy
 from dp.data.student import Student
 from dp.data.course import course_from_str
 from dp.constants import Constants
+from dp.audit import audit, Arguments, ResultMsg
 import io
 import yaml
 
@@ -71,3 +72,111 @@ def test_limit__at_most_1_credit():
         frozenset((course_3,)),
         frozenset(()),
     ])
+
+
+def test_limit__keeps_courses_that_fit():
+    test_data = io.StringIO("""
+        limit:
+          - at_most: 2
+            where: {number: {$eq: 201}}
+          - at_most: 1
+            where: {subject: {$eq: ABC}}
+
+        result:
+          from: courses
+          assert: {count(courses): {$gte: 1}}
+    """)
+
+    area = AreaOfStudy.load(specification=yaml.load(stream=test_data, Loader=yaml.SafeLoader), c=c)
+
+    course_1 = course_from_str("BIO 201", clbid="1")
+    course_2 = course_from_str("ABC 101", clbid="2")
+    course_3 = course_from_str("ABC 201", clbid="3")
+    transcript = [course_1, course_2, course_3]
+
+    # both 201-level courses fit within the first limit, and no other rule
+    # wants them, so it never drops either of them; only the second limit
+    # has to pick among its courses
+    transcripts = list(area.limit.limited_transcripts(transcript, contested=frozenset()))
+
+    assert transcripts == [
+        (course_1,),
+        (course_1, course_2),
+        (course_1, course_3),
+    ]
+
+    assert area.limit.estimate(transcript, contested=frozenset()) == len(transcripts)
+
+    # if another rule might want them, it tries leaving them out, too
+    transcripts = list(area.limit.limited_transcripts(transcript, contested=frozenset(["1"])))
+
+    assert transcripts == [
+        (),
+        (course_1,),
+        (course_2,),
+        (course_3,),
+        (course_1, course_2),
+        (course_1, course_3),
+    ]
+
+    assert area.limit.estimate(transcript, contested=frozenset(["1"])) == len(transcripts)
+    assert list(area.limit.limited_transcripts(transcript)) == transcripts
+
+
+def test_limit__leaves_fitting_courses_for_other_rules():
+    test_data = io.StringIO("""
+        result:
+          all:
+            - requirement: A
+            - requirement: B
+
+        requirements:
+          A:
+            result:
+              from: courses
+              where: {level: {$eq: 300}}
+              limit:
+                - at_most: 1
+                  where: {level: {$eq: 300}}
+              assert: {count(courses): {$gte: 2}}
+          B:
+            result:
+              from: courses
+              where: {subject: {$eq: CCC}}
+              assert: {count(courses): {$gte: 1}}
+    """)
+
+    area = AreaOfStudy.load(specification=yaml.load(stream=test_data, Loader=yaml.SafeLoader), c=c)
+    student = Student.load(dict(courses=[course_from_str("CCC 301", clbid="1")]))
+
+    messages = [msg for msg in audit(area=area, student=student, args=Arguments()) if isinstance(msg, ResultMsg)]
+    result = messages[0].result
+
+    # A can't pass either way, so B should get the course
+    assert result.rank()[0] == 2
+    assert result.result.items[1].result.is_ok() is True
+
+
+def test_limit__fitting_courses_can_change_the_claims():
+    test_data = io.StringIO("""
+        result:
+          from: courses
+          where: {subject: {$eq: AAA}}
+          limit:
+            - at_most: 1
+              where: {level: {$eq: 200}}
+          assert: {count(courses): {$gte: 1}}
+    """)
+
+    area = AreaOfStudy.load(specification=yaml.load(stream=test_data, Loader=yaml.SafeLoader), c=c)
+    student = Student.load(dict(courses=[course_from_str("AAA 201", clbid="0"), course_from_str("AAA 101", clbid="1")]))
+
+    messages = [msg for msg in audit(area=area, student=student, args=Arguments()) if isinstance(msg, ResultMsg)]
+    result = messages[0].result
+
+    # Both courses fit within the limit, and no other rule wants them, so
+    # the query sees the whole transcript and claims the first course in it.
+    # Trying the subsets of the limited courses first, as this used to do,
+    # found the transcript without AAA 201 first, and claimed AAA 101 instead.
+    assert result.is_ok() is True
+    assert sorted(result.keyed_claims().keys()) == ["0"]
@@ -0,0 +1,49 @@
+from dp.run import load_area
+import dp.run
+
+
+def test_load_area_cache(tmp_path):
+    area_file = tmp_path / "area.yaml"
+    area_file.write_text("name: Test\nresult: {course: AAA 101}\n", encoding="utf-8")
+    cache_dir = tmp_path / "cache"
+
+    uncached = load_area(area_file)
+    first = load_area(area_file, cache_dir=cache_dir)
+    assert first == uncached
+    assert len(list(cache_dir.glob("*.pickle"))) == 1
+
+    # other processes start with an empty in-memory cache, and read from disk
+    dp.run._parsed_areas.clear()
+    second = load_area(area_file, cache_dir=cache_dir)
+    assert second == first
+
+    # each caller gets its own copy
+    second['name'] = 'Changed'
+    assert load_area(area_file, cache_dir=cache_dir)['name'] == 'Test'
+
+    # changing the file changes the key
+    area_file.write_text("name: Other\nresult: {course: AAA 101}\n", encoding="utf-8")
+    assert load_area(area_file, cache_dir=cache_dir)['name'] == 'Other'
+    assert len(list(cache_dir.glob("*.pickle"))) == 2
+
+
+def test_load_area_missing(tmp_path):
+    spec = load_area(tmp_path / "ABC.yaml", cache_dir=tmp_path / "cache")
+    assert spec['type'] == 'error'
+    assert spec['code'] == 'ABC'
+
+
+def test_preloaded_areas_are_used_without_a_cache_dir(tmp_path, monkeypatch):
+    area_file = tmp_path / "area.yaml"
+    area_file.write_text("name: Test\nresult: {course: AAA 101}\n", encoding="utf-8")
+    broken_file = tmp_path / "broken.yaml"
+    broken_file.write_text("name: [Test\n", encoding="utf-8")
+
+    dp.run._parsed_areas.clear()
+    assert dp.run.preload_areas([area_file, broken_file, tmp_path / "missing.yaml"]) == 1
+
+    def fail(source: bytes) -> dict:
+        raise AssertionError('the spec should not be parsed again')
+
+    monkeypatch.setattr(dp.run, 'parse_area', fail)
+    assert load_area(area_file)['name'] == 'Test'
@@ -0,0 +1,88 @@
+from dp.area import AreaOfStudy
+from dp.audit import audit, Arguments, ResultMsg
+from dp.data.student import Student
+from dp.data.course import course_from_str
+from dp.constants import Constants
+from dp.context import RequirementContext
+import dp.rule.count
+
+c = Constants(matriculation_year=2000)
+
+
+def course_area() -> AreaOfStudy:
+    # "Core" can only use DEPT courses, and "Other" can only use OTHR courses,
+    # so each of them is independent of the other
+    return AreaOfStudy.load(c=c, specification={
+        "result": {"all": [{"requirement": "Core"}, {"requirement": "Other"}]},
+        "requirements": {
+            "Core": {"result": {"count": 3, "of": [
+                {"course": "DEPT 101"},
+                {"course": "DEPT 101"},
+                {"course": "DEPT 102"},
+                {"course": "DEPT 103"},
+                {"course": "DEPT 102"},
+            ]}},
+            "Other": {"result": {"count": 1, "of": [
+                {"course": "OTHR 101"},
+                {"course": "OTHR 102"},
+            ]}},
+        },
+    })
+
+
+def run_audit(area: AreaOfStudy, student: Student) -> ResultMsg:
+    messages = [msg for msg in audit(area=area, student=student, args=Arguments()) if isinstance(msg, ResultMsg)]
+    assert len(messages) == 1
+    return messages[0]
+
+
+def test_matching_finds_the_same_result_as_enumeration(monkeypatch):
+    transcript = [
+        course_from_str("DEPT 101", clbid="0"),
+        course_from_str("DEPT 102", clbid="1"),
+        course_from_str("DEPT 101", clbid="2"),
+        course_from_str("DEPT 102", clbid="3"),
+        course_from_str("OTHR 102", clbid="4"),
+    ]
+    student = Student.load(dict(courses=transcript))
+
+    matched = run_audit(course_area(), student)
+
+    monkeypatch.setattr(dp.rule.count, 'SOLVE_BY_MATCHING', False)
+    enumerated = run_audit(course_area(), student)
+
+    assert matched.result.is_ok() is True
+    assert matched.result.to_dict() == enumerated.result.to_dict()
+
+
+def test_matching_keeps_the_rank_of_a_failing_result(monkeypatch):
+    transcript = [
+        course_from_str("DEPT 101", clbid="0"),
+        course_from_str("DEPT 103", clbid="1", in_progress=True),
+        course_from_str("OTHR 103", clbid="2"),
+    ]
+    student = Student.load(dict(courses=transcript))
+
+    matched = run_audit(course_area(), student)
+
+    monkeypatch.setattr(dp.rule.count, 'SOLVE_BY_MATCHING', False)
+    enumerated = run_audit(course_area(), student)
+
+    assert matched.result.is_ok() is False
+    assert matched.result.rank() == enumerated.result.rank()
+    assert matched.result.status() == enumerated.result.status()
+
+
+def test_matching_is_only_used_for_uncontested_rules():
+    area = course_area()
+    transcript = [course_from_str("DEPT 101", clbid="0"), course_from_str("DEPT 102", clbid="1")]
+
+    ctx = RequirementContext().with_transcript(transcript)
+    core = area.result.items[0].result
+    assert isinstance(core, dp.rule.count.CountRule)
+
+    assert core.can_solve_by_matching(ctx=ctx) is False
+
+    ctx.uncontested_paths = frozenset([core.path])
+    assert core.can_solve_by_matching(ctx=ctx) is True
+    assert core.estimate(ctx=ctx) == 2
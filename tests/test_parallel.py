@@ -0,0 +1,77 @@
+from dp.data.student import Student
+from dp.data.course import course_from_str
+from dp.area import AreaOfStudy
+from dp.audit import audit, Arguments, ResultMsg
+from dp.constants import Constants
+from dp.parallel import ShardResult, reduce_shards
+from decimal import Decimal
+
+c = Constants(matriculation_year=2000)
+
+
+def overlapping_area() -> AreaOfStudy:
+    query = {
+        "from": "courses",
+        "where": {"level": {"$eq": 100}},
+        "assert": {"count(subjects)": {"$gte": 3}},
+    }
+
+    return AreaOfStudy.load(c=c, specification={
+        "result": {"all": [
+            {"requirement": "A"},
+            {"requirement": "B"},
+        ]},
+        "requirements": {
+            "A": {"result": query},
+            "B": {"result": query},
+        },
+    })
+
+
+def run_audit(area: AreaOfStudy, student: Student, *, workers: int) -> ResultMsg:
+    args = Arguments(workers=workers, prune=False)
+    messages = [msg for msg in audit(area=area, student=student, args=args) if isinstance(msg, ResultMsg)]
+    assert len(messages) == 1
+    return messages[0]
+
+
+def test_parallel_audit_matches_sequential_audit() -> None:
+    area = overlapping_area()
+    transcript = [course_from_str(f"{subject} 101", clbid=subject) for subject in ("AAA", "BBB", "CCC", "DDD")]
+    student = Student.load(dict(courses=transcript))
+
+    sequential = run_audit(area, student, workers=1)
+    parallel = run_audit(area, student, workers=3)
+
+    assert parallel.best_i == sequential.best_i
+    assert parallel.iters == sequential.iters
+    assert parallel.result.to_dict() == sequential.result.to_dict()
+
+
+def test_parallel_audit_stops_at_first_passing_solution() -> None:
+    area = overlapping_area()
+    transcript = [course_from_str(f"{subject} 101", clbid=subject) for subject in ("AAA", "BBB", "CCC", "DDD", "EEE", "FFF")]
+    student = Student.load(dict(courses=transcript))
+
+    sequential = run_audit(area, student, workers=1)
+    parallel = run_audit(area, student, workers=2)
+
+    assert parallel.result.is_ok() is True
+    assert parallel.best_i == sequential.best_i
+    assert parallel.result.to_dict() == sequential.result.to_dict()
+
+
+def make_shard(shard: int, *, rank: int, best_i: int, passed: bool = False) -> ShardResult:
+    return ShardResult(shard=shard, result=None, rank=Decimal(rank), best_i=best_i, passed=passed, iters=1, total_iters=1)
+
+
+def test_reduce_shards() -> None:
+    # without a passing solution, the earliest of the highest-ranked solutions wins
+    shards = [make_shard(0, rank=2, best_i=5), make_shard(1, rank=2, best_i=2), make_shard(2, rank=1, best_i=3)]
+    assert reduce_shards(shards) is shards[1]
+
+    # otherwise, the earliest passing solution wins
+    shards = [make_shard(0, rank=3, best_i=9, passed=True), make_shard(1, rank=2, best_i=4, passed=True), make_shard(2, rank=5, best_i=1)]
+    assert reduce_shards(shards) is shards[1]
+
+    assert reduce_shards([]) is None
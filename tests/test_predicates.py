@@ -60,3 +60,23 @@ def test_load_predicate_constant_expands_to_several_nested():
     assert isinstance(c, Predicate)
 
     assert list(c.expected) == ['piano', 'saxophone', 'jazz saxophone']
+
+
+def test_predicate_masks():
+    c = Constants(matriculation_year=2000)
+
+    transcript = [course_from_str("CSCI 121", clbid="0"), course_from_str("ASIAN 121", clbid="1"), course_from_str("CSCI 251", clbid="2")]
+    ctx = RequirementContext().with_transcript(transcript)
+
+    x = load_predicate({"subject": {"$eq": "CSCI"}}, c=c, ctx=ctx, mode=DataType.Course)
+
+    assert ctx.predicate_mask(x) == 0b101
+    assert x in ctx.predicate_masks
+    assert ctx.filter_matching(x, transcript) == [transcript[0], transcript[2]]
+
+    # courses which are not in the transcript are checked directly
+    outside = course_from_str("CSCI 300", clbid="3")
+    assert ctx.filter_matching(x, [outside, transcript[1]]) == [outside]
+
+    # the masks belong to a single transcript
+    assert len(ctx.with_transcript(transcript).predicate_masks) == 0
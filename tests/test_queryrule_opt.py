@@ -1,5 +1,8 @@
 from dp.data.course import course_from_str
-from dp.rule.query import iterate_item_set, QueryRule
+from dp.data.student import Student
+from dp.rule.query import iterate_item_set, estimate_item_set, QueryRule
+from dp.area import AreaOfStudy
+from dp.audit import audit, Arguments, ResultMsg
 from dp.constants import Constants
 from dp.context import RequirementContext
 from decimal import Decimal
@@ -70,14 +73,109 @@ def test_count_credits_optimizations_2():
         'assert': {'sum(credits)': {'$gte': 1}},
     })
 
-    results = list(iterate_item_set(courses, rule=rule))
+    results = list(iterate_item_set(courses, rule=rule, contested=frozenset()))
 
+    # any one course is enough, so only the single courses are tried, and
+    # then every course in case the others have all been claimed
     assert results == [
         tuple([courses[0]]),
         tuple([courses[1]]),
         tuple([courses[2]]),
+        tuple([courses[0], courses[1], courses[2]]),
+    ]
+
+
+def test_count_credits_only_tries_minimal_combinations():
+    ctx = RequirementContext()
+
+    courses = [
+        course_from_str('A 101', credits=Decimal('1')),
+        course_from_str('B 101', credits=Decimal('0.5')),
+        course_from_str('C 101', credits=Decimal('0.25')),
+        course_from_str('D 101', credits=Decimal('0.5')),
+    ]
+
+    rule = QueryRule.load(path=[], c=c, ctx=ctx, data={
+        'from': 'courses',
+        'assert': {'sum(credits)': {'$gte': '1.5'}},
+    })
+
+    results = list(iterate_item_set(courses, rule=rule, contested=frozenset()))
+
+    assert results == [
+        tuple([courses[0], courses[1]]),
+        tuple([courses[0], courses[3]]),
+        tuple([courses[0], courses[1], courses[2], courses[3]]),
+    ]
+    assert estimate_item_set(courses, rule=rule, contested=frozenset()) == len(results)
+
+    # if another rule could claim one of the courses, every combination that
+    # reaches the credits is tried, as is the case when contested courses aren't known
+    results = list(iterate_item_set(courses, rule=rule, contested=frozenset([courses[1].clbid])))
+    assert len(results) == 6
+    assert estimate_item_set(courses, rule=rule, contested=frozenset([courses[1].clbid])) == len(results)
+    assert list(iterate_item_set(courses, rule=rule)) == results
+
+
+def test_count_credits_keeps_every_combination_when_other_rules_claim_courses():
+    area = AreaOfStudy.load(c=c, specification={
+        'result': {'all': [{'requirement': 'A'}, {'requirement': 'B'}, {'requirement': 'C'}]},
+        'requirements': {
+            'A': {'result': {'count': 1, 'of': [
+                {'from': 'courses', 'where': {'level': {'$eq': 100}}, 'assert': {'sum(credits)': {'$gte': 1}}},
+                {'from': 'courses', 'where': {'level': {'$eq': 100}}, 'assert': {'sum(credits)': {'$gte': 2}}},
+            ]}},
+            'B': {'result': {'count': 'all', 'of': [{'course': 'BBB 301'}]}},
+            'C': {'result': {'from': 'courses', 'where': {'level': {'$eq': 100}}, 'assert': {'sum(credits)': {'$gte': 1}}}},
+        },
+    })
+
+    student = Student.load(dict(courses=[
+        course_from_str('AAA 101', clbid='0', credits=Decimal('1')),
+        course_from_str('AAA 103', clbid='1', credits=Decimal('1')),
+        course_from_str('AAA 103', clbid='3', credits=Decimal('0.5')),
+        course_from_str('BBB 103', clbid='5', credits=Decimal('1')),
+    ]))
+
+    messages = [msg for msg in audit(area=area, student=student, args=Arguments()) if isinstance(msg, ResultMsg)]
+
+    # A and C both want the same courses, so only trying A's minimal
+    # combinations would leave it with less than it could claim
+    assert messages[0].result.rank()[0] == Decimal('4.75')
+
+
+def test_count_courses_collapses_uncontested_courses():
+    ctx = RequirementContext()
+
+    courses = [
+        course_from_str('A 101', clbid='a'),
+        course_from_str('B 101', clbid='b'),
+        course_from_str('C 101', clbid='c'),
+        course_from_str('D 101', clbid='d'),
+    ]
+
+    rule = QueryRule.load(path=[], c=c, ctx=ctx, data={
+        'from': 'courses',
+        'assert': {'count(courses)': {'$gte': 2}},
+    })
+
+    # only "B 101" can be claimed by another rule, so A, C, and D are interchangeable
+    results = list(iterate_item_set(courses, rule=rule, contested=frozenset(['b'])))
+
+    assert results == [
         tuple([courses[0], courses[1]]),
         tuple([courses[0], courses[2]]),
-        tuple([courses[1], courses[2]]),
         tuple([courses[0], courses[1], courses[2]]),
+        tuple([courses[0], courses[2], courses[3]]),
+        tuple([courses[0], courses[1], courses[2], courses[3]]),
     ]
+
+    assert estimate_item_set(courses, rule=rule, contested=frozenset(['b'])) == len(results)
+
+    filtered_rule = QueryRule.load(path=[], c=c, ctx=ctx, data={
+        'from': 'courses',
+        'all': [{'assert': {'count(courses)': {'$gte': 2}}, 'where': {'subject': {'$eq': 'A'}}}],
+    })
+
+    # the filter on the assertion tells the courses apart
+    assert len(list(iterate_item_set(courses, rule=filtered_rule, contested=frozenset(['b'])))) == 11
@@ -0,0 +1,289 @@
+from typing import Any, List, Optional, Tuple
+import csv
+import io
+import queue
+
+import pytest
+
+from dp.area import AreaOfStudy
+from dp.audit import audit, Arguments, ResultMsg
+from dp.constants import Constants
+from dp.data.course import course_from_str
+from dp.data.student import Student
+from dp.server.writer import ResultRow, ResultWriter, ResultSpool, STAGED_COLUMNS, copy_rows, drain, insert_result, recover, result_hash
+
+
+class FakeCursor:
+    def __init__(self) -> None:
+        self.statements: List[str] = []
+        self.copied: List[Tuple[str, str]] = []
+
+    def execute(self, statement: str, params: Any = None) -> None:
+        self.statements.append(' '.join(statement.split()))
+
+    def fetchone(self) -> Optional[Tuple[int]]:
+        # only the insert returns a row; nothing is ever unchanged
+        return (1,) if self.statements[-1].startswith('INSERT') else None
+
+    def copy_expert(self, statement: str, file: Any) -> None:
+        self.statements.append('COPY')
+        self.copied.append((statement, file.read()))
+
+
+def make_row(student_id: str = '100', **kwargs: Any) -> ResultRow:
+    values = dict(
+        student_id=student_id,
+        area_code='140',
+        catalog='2019-20',
+        run=1,
+        input_data='{"name": "A \\"B\\" C"}',
+        expires_at=None,
+        link_only=False,
+        result_version=1,
+        iterations=3,
+        duration='10ms',
+        per_iteration='3.3ms',
+        rank='5',
+        max_rank='6',
+        result='{"ok": false}',
+        result_hash='0' * 64,
+        input_fingerprint=None,
+        ok=False,
+        ts='2020-01-01T00:00:00+00:00',
+        gpa='3.5',
+        claimed_courses='{}',
+        status='pending-current',
+        student_classification='SR',
+        student_class='2020',
+        student_name='Name, With\nNewline',
+        student_name_sort='',
+    )
+    values.update(kwargs)
+    return ResultRow(**values)
+
+
+def test_flush_copies_the_batch_and_applies_it():
+    curs = FakeCursor()
+    writer = ResultWriter(curs=curs, batch_size=10)
+
+    writer.add(make_row('100'))
+    writer.add(make_row('200'))
+    assert curs.statements == []
+
+    assert writer.flush() == 2
+    assert writer.pending == []
+
+    kinds = [s.split()[0] for s in curs.statements]
+    assert kinds == ['CREATE', 'BEGIN;', 'TRUNCATE', 'COPY', 'WITH', 'DELETE', 'UPDATE', 'INSERT', 'COMMIT;']
+
+    # the staging table is only created once per connection
+    writer.add(make_row('300'))
+    writer.flush()
+    kinds = [s.split()[0] for s in curs.statements]
+    assert kinds.count('CREATE') == 1
+    assert len(curs.copied) == 2
+
+
+class FailingCursor(FakeCursor):
+    def __init__(self, *, failures: int) -> None:
+        super().__init__()
+        self.failures = failures
+
+    def copy_expert(self, statement: str, file: Any) -> None:
+        if self.failures > 0:
+            self.failures -= 1
+            raise ValueError('no')
+        super().copy_expert(statement, file)
+
+
+def test_failed_batches_are_retried():
+    curs = FailingCursor(failures=1)
+    writer = ResultWriter(curs=curs, retry_delay=0)
+    writer.add(make_row('100'))
+    writer.add(make_row('200'))
+
+    assert writer.flush() == 2
+    assert curs.statements.count('ROLLBACK;') == 1
+    assert curs.statements.count('COMMIT;') == 1
+    assert len(curs.copied) == 1
+
+
+def test_failed_batches_are_stored_one_row_at_a_time():
+    curs = FailingCursor(failures=3)
+    writer = ResultWriter(curs=curs, retries=2, retry_delay=0)
+    writer.add(make_row('100'))
+    writer.add(make_row('200'))
+
+    assert writer.flush() == 2
+    assert curs.copied == []
+    assert curs.statements.count('ROLLBACK;') == 3
+
+    # each row is stored in its own transaction
+    last_rollback = len(curs.statements) - curs.statements[::-1].index('ROLLBACK;')
+    kinds = [s.split()[0] for s in curs.statements[last_rollback:]]
+    assert [k for k in kinds if k in ('BEGIN;', 'INSERT', 'COMMIT;')] == ['BEGIN;', 'INSERT', 'COMMIT;'] * 2
+
+
+def test_rows_that_cannot_be_stored_are_logged(caplog):
+    class BadRowCursor(FailingCursor):
+        def execute(self, statement: str, params: Any = None) -> None:
+            super().execute(statement, params)
+            if params is not None and params['student_id'] == 'bad' and statement.strip().startswith('INSERT'):
+                raise ValueError('bad row')
+
+    curs = BadRowCursor(failures=3)
+    writer = ResultWriter(curs=curs, retry_delay=0)
+    writer.add(make_row('100'))
+    writer.add(make_row('bad'))
+    writer.add(make_row('300'))
+
+    assert writer.flush() == 2
+    assert curs.statements.count('COMMIT;') == 2
+    assert curs.statements[-1] == 'COMMIT;'
+    assert 'could not store the result for bad in 2019-20/140 from run 1: bad row' in caplog.text
+
+
+# the columns that describe one audit of an unchanged result, rather than the result itself
+AUDIT_COLUMNS = (
+    'ts', 'run', 'expires_at', 'input_fingerprint', 'input_data', 'iterations', 'duration', 'per_iteration', 'gpa',
+    'student_classification', 'student_class', 'student_name', 'student_name_sort',
+)
+
+
+def test_unchanged_results_take_the_new_audits_inputs():
+    class UnchangedCursor(FakeCursor):
+        def fetchone(self) -> Optional[Tuple[int]]:
+            return (7,)
+
+    curs = UnchangedCursor()
+    assert insert_result(curs, make_row()) == 7
+    assert len(curs.statements) == 1
+    assert all(f'{column} = ' in curs.statements[0] for column in AUDIT_COLUMNS)
+
+    curs = FakeCursor()
+    ResultWriter(curs=curs).apply()
+    assert curs.statements[0].startswith('WITH unchanged')
+    assert all(f'{column} = s.{column}' in curs.statements[0] for column in AUDIT_COLUMNS)
+
+
+def test_the_spool_holds_the_rows_until_they_are_stored(tmp_path):
+    path = str(tmp_path / 'results.spool')
+    curs = FakeCursor()
+    writer = ResultWriter(curs=curs, batch_size=10, spool=ResultSpool(path))
+
+    writer.add(make_row('100'))
+    writer.add(make_row('200'))
+    assert ResultSpool(path).recover() == [make_row('100'), make_row('200')]
+
+    writer.flush()
+    assert ResultSpool(path).recover() == []
+
+
+def test_a_new_writer_stores_what_the_last_one_left(tmp_path):
+    class LostConnectionCursor(FakeCursor):
+        closed = False
+
+        def execute(self, statement: str, params: Any = None) -> None:
+            if self.closed:
+                raise ValueError('connection already closed')
+            super().execute(statement, params)
+
+        def copy_expert(self, statement: str, file: Any) -> None:
+            self.closed = True
+            raise ValueError('server closed the connection unexpectedly')
+
+    path = str(tmp_path / 'results.spool')
+
+    writer = ResultWriter(curs=LostConnectionCursor(), retry_delay=0, spool=ResultSpool(path))
+    writer.add(make_row('100'))
+    writer.add(make_row('200'))
+
+    # the writer dies without storing its rows
+    with pytest.raises(ValueError):
+        writer.flush()
+
+    curs = FakeCursor()
+    replacement = ResultWriter(curs=curs, spool=ResultSpool(path))
+    assert recover(ResultSpool(path), writer=replacement) == 2
+
+    (_statement, data), = curs.copied
+    assert [line[1] for line in csv.reader(io.StringIO(data))] == ['100', '200']
+    assert ResultSpool(path).recover() == []
+
+
+def test_copied_rows_round_trip():
+    rows = [make_row('100'), make_row('200', expires_at='2020-02-02', link_only=True, student_class=None)]
+
+    parsed = list(csv.reader(copy_rows(rows)))
+
+    assert len(parsed) == 2
+    assert all(len(line) == len(STAGED_COLUMNS) for line in parsed)
+
+    first = dict(zip(STAGED_COLUMNS, parsed[0]))
+    assert first['seq'] == '0'
+    assert first['input_data'] == '{"name": "A \\"B\\" C"}'
+    assert first['student_name'] == 'Name, With\nNewline'
+    assert first['link_only'] == 'false'
+
+    second = dict(zip(STAGED_COLUMNS, parsed[1]))
+    assert second['seq'] == '1'
+    assert second['link_only'] == 'true'
+    assert second['expires_at'] == '2020-02-02'
+
+
+def test_nulls_are_distinct_from_empty_strings():
+    text = copy_rows([make_row(student_class=None)]).read()
+
+    # NULL is an unquoted empty value; an empty string is quoted
+    assert ',,' in text
+    assert ',""\n' in text
+
+
+def test_drain_flushes_full_batches_and_the_remainder():
+    curs = FakeCursor()
+    writer = ResultWriter(curs=curs, batch_size=2)
+
+    results: queue.Queue = queue.Queue()
+    for stnum in ['1', '2', '3', '4', '5']:
+        results.put(make_row(stnum))
+    results.put(None)
+
+    drain(results, writer=writer, max_delay=60)
+
+    assert [len(list(csv.reader(io.StringIO(data)))) for _, data in curs.copied] == [2, 2, 1]
+    assert writer.pending == []
+
+
+def test_drain_flushes_after_the_delay():
+    class StopCursor(FakeCursor):
+        def copy_expert(self, statement: str, file: Any) -> None:
+            super().copy_expert(statement, file)
+            # end the loop once the partial batch has been stored
+            results.put(None)
+
+    curs = StopCursor()
+    writer = ResultWriter(curs=curs, batch_size=100)
+
+    results: queue.Queue = queue.Queue()
+    results.put(make_row('1'))
+
+    drain(results, writer=writer, max_delay=0.01)
+
+    assert len(curs.copied) == 1
+
+
+def test_repeated_audits_have_the_same_hash():
+    def run_audit() -> ResultMsg:
+        area = AreaOfStudy.load(c=Constants(matriculation_year=2000), specification={
+            "result": {"count": 1, "of": [{"course": "DEPT 101"}, {"course": "DEPT 102"}]},
+        })
+        transcript = [course_from_str("DEPT 101", clbid="0")]
+        student = Student.load(dict(courses=transcript))
+        messages = [msg for msg in audit(area=area, student=student, args=Arguments()) if isinstance(msg, ResultMsg)]
+        return messages[0]
+
+    first = run_audit().result.to_dict()
+    second = run_audit().result.to_dict()
+
+    assert result_hash(first) == result_hash(second)
+    assert result_hash(first) != result_hash({**first, "truncated": True})
@@ -0,0 +1,62 @@
+from dp.area import AreaOfStudy
+from dp.audit import audit, Arguments, ResultMsg
+from dp.data.student import Student
+from dp.data.course import course_from_str
+from dp.constants import Constants
+from dp.solve import SolutionOrder
+from collections import Counter
+
+c = Constants(matriculation_year=2000)
+
+
+def run_audit(area: AreaOfStudy, student: Student, *, order: SolutionOrder) -> ResultMsg:
+    messages = [msg for msg in audit(area=area, student=student, args=Arguments(solution_order=order)) if isinstance(msg, ResultMsg)]
+    assert len(messages) == 1
+    return messages[0]
+
+
+def test_promising_order_finds_a_passing_solution_sooner():
+    area = AreaOfStudy.load(c=c, specification={"result": {"any": [
+        {"from": "courses", "where": {"subject": {"$eq": "DEPT"}}, "assert": {"count(courses)": {"$gte": 3}}},
+        {"from": "courses", "where": {"level": {"$eq": 100}}, "assert": {"count(courses)": {"$gte": 1}}},
+    ]}})
+
+    transcript = [course_from_str("DEPT 101", clbid="0"), course_from_str("DEPT 102", clbid="1"), course_from_str("OTHR 101", clbid="2")]
+    student = Student.load(dict(courses=transcript))
+
+    by_path = run_audit(area, student, order=SolutionOrder.Path)
+    promising = run_audit(area, student, order=SolutionOrder.Promising)
+
+    assert by_path.result.is_ok() is True
+    assert promising.result.is_ok() is True
+    assert by_path.total_iters == 2
+    assert promising.total_iters == 1
+
+
+def test_promising_order_generates_the_same_solutions():
+    area = AreaOfStudy.load(c=c, specification={
+        "result": {
+            "from": "courses",
+            "assert": {"sum(credits)": {"$gte": 2}},
+        },
+    })
+
+    transcript = [
+        course_from_str("AAA 101", clbid="0", credits='0.25'),
+        course_from_str("BBB 101", clbid="1", credits='0.5'),
+        course_from_str("CCC 101", clbid="2"),
+        course_from_str("DDD 101", clbid="3", credits='1.5'),
+    ]
+    student = Student.load(dict(courses=transcript))
+
+    def outputs(order: SolutionOrder) -> list:
+        return [
+            tuple(course.clbid for course in sol.solution.output)
+            for sol in area.solutions(student=student, exceptions=[], order=order)
+        ]
+
+    by_path = outputs(SolutionOrder.Path)
+    promising = outputs(SolutionOrder.Promising)
+
+    assert Counter(by_path) == Counter(promising)
+    assert promising[0] == ("2", "3")
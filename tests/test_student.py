@@ -1,4 +1,7 @@
 from dp.data.music import MusicMediums
+from dp.data.student import Student, ParsedStudent, load_transcript
+from dp.exception import CourseCreditOverride, CourseSubjectOverride, ExceptionAction
+from decimal import Decimal
 
 
 def test_musicmediums_load_multi_ppm():
@@ -15,3 +18,56 @@ def test_musicmediums_load_multi_ppm_trims():
     })
 
     assert m.ppm == tuple(['saxophone', 'jazz saxophone'])
+
+
+def course_row(s, *, clbid, schedid='1', grade_code='B', name=None):
+    subject, number = s.split(' ')
+
+    return {
+        "attributes": [], "clbid": clbid, "course": s, "course_type": "SE", "credits": '1.00', "crsid": s,
+        "flag_gpa": True, "flag_in_progress": False, "flag_incomplete": False, "flag_repeat": False,
+        "flag_stolaf": True, "gereqs": [], "grade_code": grade_code, "grade_option": "grade", "grade_points": '3.00',
+        "institution_short": "STOLAF", "level": int(number) // 100 * 100, "name": name or s, "number": number,
+        "schedid": schedid, "section": "", "sub_type": "", "subject": subject, "term": "1", "transcript_code": "", "year": "2000",
+    }
+
+
+def test_parsed_student_matches_a_fresh_load():
+    data = {
+        "stnum": "123",
+        "courses": [
+            course_row("CSCI 121", clbid="0"),
+            course_row("CSCI 121", clbid="0", schedid="2"),
+            course_row("ASIAN 121", clbid="1", grade_code="F"),
+            course_row("MUSIC 101", clbid="2", name="Private Lessons"),
+        ],
+    }
+
+    overrides = [
+        CourseCreditOverride(path=('$',), type=ExceptionAction.CourseCredits, clbid="0", credits=Decimal('0.5')),
+        CourseSubjectOverride(path=('$',), type=ExceptionAction.CourseSubject, clbid="1", subject="CSCI"),
+    ]
+    credits_overrides = {"name=Private Lessons": '0.25'}
+
+    parsed = ParsedStudent.parse(data)
+
+    for args in [dict(), dict(overrides=overrides, credits_overrides=credits_overrides)]:
+        student = parsed.for_area(code='100', **args)
+        assert student == Student.load(data, code='100', **args)
+
+        load_args = dict(overrides=args.get('overrides', []), credits_overrides=args.get('credits_overrides', {}))
+        expected = sorted(load_transcript(data['courses'], **load_args), key=lambda c: c.sort_order())
+        expected_with_failed = sorted(load_transcript(data['courses'], include_failed=True, **load_args), key=lambda c: c.sort_order())
+        assert list(student.courses) == expected
+        assert list(student.courses_with_failed) == expected_with_failed
+
+    student = parsed.for_area(code='100', overrides=overrides, credits_overrides=credits_overrides)
+    clbids = {c.clbid: c for c in student.courses_with_failed}
+    assert set(clbids.keys()) == {"0", "0:2", "1", "2"}
+    assert clbids["0"].credits == Decimal('0.5')
+    assert clbids["0:2"].credits == Decimal('0.5')
+    assert clbids["1"].subject == "CSCI"
+    assert clbids["2"].credits == Decimal('0.25')
+
+    # unaffected courses are shared between areas
+    assert parsed.for_area().courses[0] is parsed.for_area().courses[0]
@@ -0,0 +1,120 @@
+from typing import Any, Dict, List
+
+from dp.server.pool import RecyclePolicy, supervise, rss_mb
+
+
+def test_recycle_after_jobs():
+    policy = RecyclePolicy(max_jobs=3)
+    assert policy.should_recycle() is False
+
+    policy.record(2)
+    assert policy.should_recycle() is False
+
+    policy.record(1)
+    assert policy.should_recycle() is True
+
+
+def test_recycle_after_memory():
+    policy = RecyclePolicy(max_rss_mb=100)
+    assert policy.should_recycle(rss=lambda: 99.0) is False
+    assert policy.should_recycle(rss=lambda: 100.0) is True
+
+    # the memory that a worker starts with doesn't count towards the limit
+    policy = RecyclePolicy(max_rss_mb=100)
+    policy.start(rss=lambda: 500.0)
+    assert policy.should_recycle(rss=lambda: 599.0) is False
+    assert policy.should_recycle(rss=lambda: 600.0) is True
+
+    assert RecyclePolicy().should_recycle(rss=lambda: 1e9) is False
+    assert rss_mb() > 0
+
+
+class FakeProcess:
+    def __init__(self, spec: Dict[str, Any]) -> None:
+        self.spec = spec
+        self.alive = True
+        self.exitcode = None
+
+    def is_alive(self) -> bool:
+        return self.alive
+
+    def join(self) -> None:
+        pass
+
+
+def test_supervise_replaces_exited_workers():
+    spawned: List[FakeProcess] = []
+
+    def spawn(spec: Dict[str, Any]) -> FakeProcess:
+        process = FakeProcess(spec)
+        spawned.append(process)
+
+        # the first worker exits right away
+        if len(spawned) == 1:
+            process.alive = False
+            process.exitcode = 0
+
+        return process
+
+    processes = supervise([{'lane': 'a'}, {'lane': 'b'}], spawn=spawn, interval=0, rounds=2)
+
+    assert len(spawned) == 3
+    assert [p.spec['lane'] for p in processes] == ['a', 'b']
+    assert processes[0] is spawned[2]
+    assert all(p.is_alive() for p in processes)
+
+
+def test_supervise_backs_off_from_failing_workers():
+    ticks = [-1.0]
+
+    def clock() -> float:
+        # each check of a process takes one second
+        ticks[0] += 1
+        return ticks[0]
+
+    spawned_at: List[float] = []
+
+    def spawn(spec: Dict[str, Any]) -> FakeProcess:
+        spawned_at.append(ticks[0])
+        process = FakeProcess(spec)
+
+        # the first four workers fail right away; the next one stays up
+        if len(spawned_at) <= 4:
+            process.alive = False
+            process.exitcode = 1
+
+        return process
+
+    supervise([{}], spawn=spawn, interval=0, rounds=30, min_uptime=10, backoff=2, max_backoff=8, clock=clock)
+
+    # each failure doubles the wait, up to the limit
+    assert spawned_at == [-1, 3, 8, 17, 26]
+
+
+def test_supervise_replaces_long_running_workers_right_away():
+    ticks = [-1.0]
+
+    def clock() -> float:
+        ticks[0] += 1
+        return ticks[0]
+
+    class CrashingProcess(FakeProcess):
+        # each worker crashes after running for twelve seconds
+        def __init__(self, spec: Dict[str, Any]) -> None:
+            super().__init__(spec)
+            self.crashes_at = ticks[0] + 12
+
+        def is_alive(self) -> bool:
+            self.alive = ticks[0] < self.crashes_at
+            self.exitcode = None if self.alive else 1
+            return self.alive
+
+    spawned_at: List[float] = []
+
+    def spawn(spec: Dict[str, Any]) -> FakeProcess:
+        spawned_at.append(ticks[0])
+        return CrashingProcess(spec)
+
+    supervise([{}], spawn=spawn, interval=0, rounds=30, min_uptime=10, backoff=2, clock=clock)
+
+    assert spawned_at == [-1, 11, 23]